@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""Backtests signal providers on local price history before their signals are copied.
+
+Signals are read from a JSON lines file, one {"time": ..., "provider": ..., "message": ...} object per line, and
+parsed with ParseSignal. Every signal is simulated on the M1 bars or ticks of its symbol, read from
+<data>/<SYMBOL>.csv or <data>/<SYMBOL>.parquet:
+
+    CSV files are sorted by time and memory-mapped, the first bar of a signal is found by binary search so that
+    only the bars a trade is open for are read. Columns are time,open,high,low,close (bid prices, extra columns
+    are ignored) or time,bid,ask for ticks with a header line. Times are epoch seconds or ISO dates, ex:
+    2021-03-04 10:15 or 2021.03.04 10:15, in UTC.
+    Parquet files need pyarrow and are streamed in batches, skipping the row groups that end before the signal.
+
+Pending orders fill when the price touches their entry before --expiry hours, market orders at the next bar.
+Signals of symbols without a specification in symbols.json, ex: "BUY NOW", are counted as unknown and skipped.
+Each take profit is a separate leg, closed at its take profit or at the stop loss, the stop loss first when a
+bar reaches both. Symbols are simulated in parallel processes, then every provider's trades are sized in time
+order from its running balance with the bot's position size logic to build its equity curve.
+
+Usage:
+    python backtest.py signals.jsonl --data history [--balance 10000] [--risk-factor 0.01] [--spread 1.0]
+                       [--expiry 72] [--workers 4] [--output backtest]
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from prettytable import PrettyTable
+
+from config import LoadConfig
+from signals import ParseSignal
+from sizing import CalculateTradeInformation, PipSize, PipValue, RoundVolume
+
+# the bot's config file, which sets the symbols recognized in signals, and its symbol specifications
+CONFIG_FILE = os.environ.get('CONFIG_FILE', 'config.json')
+SYMBOLS_FILE = os.environ.get('SYMBOLS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbols.json'))
+
+
+def ParseTime(value) -> float:
+    """Returns epoch seconds from epoch seconds or an ISO date, ex: 2021-03-04 10:15 or 2021.03.04 10:15 in UTC."""
+
+    if(isinstance(value, (int, float))):
+        return float(value)
+
+    value = value.strip()
+
+    try:
+        return float(value)
+
+    except ValueError:
+        # MetaTrader exports separate the date with dots
+        if(value[4:5] == '.'):
+            value = value.replace('.', '-', 2)
+
+        date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+        if(date.tzinfo is None):
+            date = date.replace(tzinfo=timezone.utc)
+
+        return date.timestamp()
+
+
+class PriceFile:
+    """Time sorted CSV file of bars or ticks, memory-mapped and searched by time without loading it."""
+
+    def __init__(self, path: str, spread: float) -> None:
+        self.path = path
+        self.spread = spread
+
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # an optional header names the columns, ticks are recognized by their bid and ask columns
+        header = self._map.readline().decode().strip().lower().split(',')
+        self.start = 0
+        self.ticks = False
+
+        try:
+            ParseTime(header[0])
+
+        except ValueError:
+            self.start = self._map.tell()
+            self.ticks = 'bid' in header
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def seek(self, start: float) -> int:
+        """Returns the offset of the first line at or after a time, by binary search over the line starts."""
+
+        low, high = self.start, len(self._map)
+
+        while low < high:
+            middle = (low + high) // 2
+
+            # moves to the start of the line that contains the middle byte
+            lineStart = max(self._map.rfind(b'\n', self.start, middle) + 1, self.start)
+            lineEnd = self._map.find(b'\n', lineStart)
+            lineEnd = len(self._map) if lineEnd == -1 else lineEnd
+            line = self._map[lineStart:lineEnd].strip()
+
+            # every line before low is earlier than the time, every line from high onwards is not
+            if(line and ParseTime(line.split(b',', 1)[0].decode()) < start):
+                low = lineEnd + 1
+            else:
+                high = lineStart
+
+        return low
+
+    def bars(self, start: float):
+        """Yields (time, open, high, low, close, spread) bid prices from a time onwards."""
+
+        offset = self.seek(start)
+
+        while offset < len(self._map):
+            lineEnd = self._map.find(b'\n', offset)
+            lineEnd = len(self._map) if lineEnd == -1 else lineEnd
+            fields = self._map[offset:lineEnd].decode().strip().split(',')
+            offset = lineEnd + 1
+
+            if(len(fields) < 3):
+                continue
+
+            if(self.ticks):
+                bid, ask = float(fields[1]), float(fields[2])
+                yield ParseTime(fields[0]), bid, bid, bid, bid, ask - bid
+
+            else:
+                yield ParseTime(fields[0]), float(fields[1]), float(fields[2]), float(fields[3]), float(fields[4]), self.spread
+
+    def price(self, time: float) -> float:
+        """Returns the first close at or after a time, or None after the end of the file."""
+
+        return next((bar[4] for bar in self.bars(time)), None)
+
+
+class ParquetPriceFile:
+    """Parquet file of bars or ticks streamed in batches, skipping the row groups that end before a time."""
+
+    def __init__(self, path: str, spread: float) -> None:
+        try:
+            import pyarrow.parquet
+
+        except ImportError:
+            raise SystemExit('Reading Parquet price files needs pyarrow: pip install pyarrow')
+
+        self.path = path
+        self.spread = spread
+        self._file = pyarrow.parquet.ParquetFile(path)
+
+        names = self._file.schema_arrow.names
+        self.ticks = 'bid' in names
+        self.columns = ['time', 'bid', 'ask'] if self.ticks else ['time', 'open', 'high', 'low', 'close']
+        self.timeColumn = names.index('time')
+
+    def close(self) -> None:
+        return
+
+    def bars(self, start: float):
+        """Yields (time, open, high, low, close, spread) bid prices from a time onwards."""
+
+        for rowGroup in range(self._file.num_row_groups):
+            statistics = self._file.metadata.row_group(rowGroup).column(self.timeColumn).statistics
+
+            if(statistics is not None and statistics.has_min_max and Timestamp(statistics.max) < start):
+                continue
+
+            for batch in self._file.iter_batches(columns=self.columns, row_groups=[rowGroup]):
+                columns = [batch.column(name).to_numpy(zero_copy_only=False) for name in self.columns]
+                times = columns[0]
+
+                if(times.dtype.kind == 'M'):
+                    times = times.astype('datetime64[ns]').astype('int64') / 1e9
+
+                for row in range(len(times)):
+                    if(times[row] < start):
+                        continue
+
+                    if(self.ticks):
+                        bid, ask = float(columns[1][row]), float(columns[2][row])
+                        yield float(times[row]), bid, bid, bid, bid, ask - bid
+
+                    else:
+                        yield float(times[row]), float(columns[1][row]), float(columns[2][row]), float(columns[3][row]), float(columns[4][row]), self.spread
+
+    def price(self, time: float) -> float:
+        """Returns the first close at or after a time, or None after the end of the file."""
+
+        return next((bar[4] for bar in self.bars(time)), None)
+
+
+def Timestamp(value) -> float:
+    """Converts a Parquet statistic, a number or a naive UTC datetime, to epoch seconds."""
+
+    if(isinstance(value, datetime)):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+    return float(value)
+
+
+def OpenPriceFile(directory: str, symbol: str, spread: float):
+    """Opens the CSV or Parquet price file of a symbol, or returns None when there is none."""
+
+    for extension, fileType in [('.csv', PriceFile), ('.parquet', ParquetPriceFile)]:
+        path = os.path.join(directory, symbol + extension)
+
+        if(os.path.exists(path)):
+            return fileType(path, spread)
+
+    return None
+
+
+def SimulateTrade(trade: dict, time: float, bars, expiry: float) -> dict:
+    """Simulates the entry, stop loss and take profits of a trade on the bars that follow its signal.
+
+    Arguments:
+        trade: trade returned by ParseSignal
+        time: epoch seconds of the signal
+        bars: iterator of (time, open, high, low, close, spread) bid prices from the signal onwards
+        expiry: seconds a pending order waits for its entry price
+
+    Returns:
+        a dictionary with the fill time and price and the exit time, price and outcome of every take profit leg
+    """
+
+    side = 1 if trade['OrderType'].startswith('Buy') else -1
+    result = {'Status': 'Expired', 'FillTime': None, 'FillPrice': None, 'Legs': []}
+    legs = None
+
+    for barTime, barOpen, high, low, close, spread in bars:
+        # buys open at the ask and close at the bid, sells the other way round
+        openSpread = spread if side == 1 else 0
+        closeSpread = 0 if side == 1 else spread
+
+        if(legs is None):
+            if(barTime - time > expiry):
+                return result
+
+            entry = trade['Entry']
+
+            if(entry == 'NOW'):
+                fill = barOpen + openSpread
+
+            elif(trade['OrderType'] in ['Buy Limit', 'Sell Stop'] and low + openSpread <= entry):
+                fill = min(entry, barOpen + openSpread)
+
+            elif(trade['OrderType'] in ['Buy Stop', 'Sell Limit'] and high + openSpread >= entry):
+                fill = max(entry, barOpen + openSpread)
+
+            else:
+                continue
+
+            result.update(Status='Filled', FillTime=barTime, FillPrice=fill)
+            legs = [{'TP': takeProfit, 'ExitTime': None, 'ExitPrice': None, 'Outcome': None} for takeProfit in trade['TP']]
+            result['Legs'] = legs
+            fillBar = True
+
+        else:
+            fillBar = False
+
+        exitHigh, exitLow = high + closeSpread, low + closeSpread
+
+        for leg in legs:
+            if(leg['Outcome'] is not None):
+                continue
+
+            stopped = exitLow <= trade['StopLoss'] if side == 1 else exitHigh >= trade['StopLoss']
+            target = exitHigh >= leg['TP'] if side == 1 else exitLow <= leg['TP']
+
+            # the stop loss is assumed to be hit first when a bar reaches both, and gaps over it fill at the open
+            if(stopped):
+                gapped = (barOpen + closeSpread - trade['StopLoss']) * side < 0 and not fillBar
+                leg.update(Outcome='SL', ExitTime=barTime, ExitPrice=barOpen + closeSpread if gapped else trade['StopLoss'])
+
+            elif(target):
+                leg.update(Outcome='TP', ExitTime=barTime, ExitPrice=leg['TP'])
+
+        if(all(leg['Outcome'] is not None for leg in legs)):
+            return result
+
+    # legs still open at the end of the data are closed at the last price
+    for leg in legs or []:
+        if(leg['Outcome'] is None):
+            leg.update(Outcome='Open', ExitTime=barTime, ExitPrice=close + closeSpread)
+
+    return result
+
+
+def BacktestSymbol(job: tuple) -> list:
+    """Simulates every signal of one symbol, in a worker process.
+
+    Arguments:
+        job: tuple of the symbol, the data directory, the spread in prices, the expiry in seconds and a list of
+             (index, time, trade) signals
+
+    Returns:
+        a list of (index, simulation) pairs
+    """
+
+    symbol, directory, spread, expiry, signals = job
+    prices = OpenPriceFile(directory, symbol, spread)
+
+    if(prices is None):
+        return [(index, {'Status': 'NoData', 'Legs': []}) for index, time, trade in signals]
+
+    try:
+        return [(index, SimulateTrade(trade, time, prices.bars(time), expiry)) for index, time, trade in signals]
+
+    finally:
+        prices.close()
+
+
+class Converter:
+    """Converts pip values to the account currency with the price history of the currency pairs."""
+
+    def __init__(self, directory: str, currency: str) -> None:
+        self.directory = directory
+        self.currency = currency
+        self.files = {}
+
+    def rate(self, currency: str, time: float) -> float:
+        """Returns the value of one unit of a currency in the account currency at a time."""
+
+        if(currency == self.currency):
+            return 1.0
+
+        for symbol, inverse in [(currency + self.currency, False), (self.currency + currency, True)]:
+            if(symbol not in self.files):
+                self.files[symbol] = OpenPriceFile(self.directory, symbol, 0)
+
+            if(self.files[symbol] is not None):
+                price = self.files[symbol].price(time)
+
+                if(price):
+                    return 1 / price if inverse else price
+
+        raise Exception(f'No {currency}{self.currency} or {self.currency}{currency} price history to convert the pip value')
+
+    def pipValue(self, specification: dict, entry: float, time: float) -> float:
+        """Returns the value of one pip for one lot in the account currency, like PipValue without live prices."""
+
+        try:
+            return PipValue(specification, None, self.currency, entry)
+
+        except Exception:
+            return specification['contractSize'] * specification['pipSize'] * self.rate(specification['profitCurrency'], time)
+
+    def close(self) -> None:
+        for prices in self.files.values():
+            if(prices is not None):
+                prices.close()
+
+
+def BuildEquity(signals: list, simulations: dict, specifications: dict, converter: Converter, balance: float, riskFactor: float) -> dict:
+    """Sizes one provider's filled trades in time order from its running balance and builds its equity curve.
+
+    Arguments:
+        signals: list of (index, time, trade) signals of the provider
+        simulations: simulation of every signal by index
+        specifications: symbol specifications by symbol
+        converter: converts pip values to the account currency
+        balance: starting balance
+        riskFactor: risk factor of every trade
+
+    Returns:
+        a dictionary with the provider's statistics and its equity curve as a list of (time, balance)
+    """
+
+    stats = defaultdict(int, {'Signals': len(signals), 'Start': balance})
+    events = []
+
+    for index, time, trade in signals:
+        simulation = simulations[index]
+        stats[simulation['Status']] += 1
+
+        if(simulation['Status'] == 'Filled'):
+            events.append((simulation['FillTime'], 0, index, None))
+            events.extend((leg['ExitTime'], 1, index, leg) for leg in simulation['Legs'])
+
+    # fills are sized before the exits of the same bar are booked
+    events.sort(key=lambda event: (event[0], event[1]))
+    trades = {index: trade for index, time, trade in signals}
+    sizes = {}
+    curve = [(signals[0][1] if signals else 0, balance)]
+    peak, drawdown, grossProfit, grossLoss = balance, 0.0, 0.0, 0.0
+
+    for time, kind, index, leg in events:
+        trade = trades[index]
+        specification = specifications[trade['Symbol']]
+
+        if(kind == 0):
+            sized = dict(trade, Entry=simulations[index]['FillPrice'], RiskFactor=riskFactor)
+
+            try:
+                CalculateTradeInformation(sized, balance, specification, converter.pipValue(specification, sized['Entry'], time))
+                volume = RoundVolume(sized['PositionSize'] / len(sized['TP']), sized['VolumeStep'])
+
+            except Exception:
+                volume = 0
+
+            sizes[index] = (volume, sized.get('PipValue'))
+
+            if(volume <= 0):
+                stats['TooSmall'] += 1
+
+            continue
+
+        volume, pipValue = sizes[index]
+
+        if(volume <= 0):
+            continue
+
+        side = 1 if trade['OrderType'].startswith('Buy') else -1
+        pips = side * (leg['ExitPrice'] - simulations[index]['FillPrice']) / specification['pipSize']
+        profit = round(pips * pipValue * volume, 2)
+
+        balance += profit
+        stats['Legs'] += 1
+        stats[leg['Outcome'] + ' Legs'] += 1
+
+        if(profit > 0):
+            stats['Wins'] += 1
+            grossProfit += profit
+
+        else:
+            stats['Losses'] += 1
+            grossLoss -= profit
+
+        peak = max(peak, balance)
+        drawdown = max(drawdown, (peak - balance) / peak if peak > 0 else 0)
+        curve.append((time, balance))
+
+    stats.update({
+        'Balance': balance,
+        'Net Profit': balance - stats['Start'],
+        'Return %': (balance / stats['Start'] - 1) * 100,
+        'Win Rate %': stats['Wins'] / stats['Legs'] * 100 if stats['Legs'] else 0,
+        'Profit Factor': grossProfit / grossLoss if grossLoss else float('inf') if grossProfit else 0,
+        'Max Drawdown %': drawdown * 100
+    })
+
+    return {'Stats': dict(stats), 'Curve': curve}
+
+
+def LoadSignals(path: str) -> list:
+    """Reads and parses the signals of a JSON lines file, skipping the messages that are not signals.
+
+    Returns:
+        a list of (index, time, provider, trade) tuples sorted by time, and the number of unparsed messages
+    """
+
+    signals, skipped = [], 0
+    config = LoadConfig(CONFIG_FILE, validate=False)
+
+    with open(path) as file:
+        for line in file:
+            if(not(line.strip())):
+                continue
+
+            entry = json.loads(line)
+
+            try:
+                trade = ParseSignal(entry.get('message') or entry['text'], config)
+
+            except ValueError:
+                trade = {}
+
+            if(not(trade)):
+                skipped += 1
+                continue
+
+            signals.append((len(signals), ParseTime(entry['time']), entry.get('provider', 'unknown'), trade))
+
+    signals.sort(key=lambda signal: signal[1])
+
+    return signals, skipped
+
+
+def Backtest(signals: list, directory: str, balance: float = 10000.0, riskFactor: float = 0.01, currency: str = 'USD',
+             spread: float = 1.0, expiry: float = 72.0, workers: int = None) -> dict:
+    """Simulates the signals on the price history of their symbols and builds every provider's results.
+
+    Arguments:
+        signals: list of (index, time, provider, trade) tuples returned by LoadSignals
+        directory: folder with the <SYMBOL>.csv or <SYMBOL>.parquet price files
+        balance: starting balance of every provider
+        riskFactor: risk factor of every trade
+        currency: account currency
+        spread: spread in pips added to bid bars
+        expiry: hours a pending order waits for its entry price
+        workers: number of processes simulating symbols, defaults to the number of cores
+
+    Returns:
+        a dictionary with the statistics and equity curve of every provider
+    """
+
+    with open(SYMBOLS_FILE) as file:
+        specifications = json.load(file)
+
+    for specification in specifications.values():
+        specification['pipSize'] = PipSize(specification)
+
+    # signals of symbols without a specification can neither be simulated nor sized
+    simulations = {index: {'Status': 'Unknown', 'Legs': []} for index, time, provider, trade in signals if trade['Symbol'] not in specifications}
+    bySymbol = defaultdict(list)
+
+    for index, time, provider, trade in signals:
+        if(index not in simulations):
+            bySymbol[trade['Symbol']].append((index, time, trade))
+
+    jobs = [(symbol, directory, spread * specifications[symbol]['pipSize'], expiry * 3600, symbolSignals) for symbol, symbolSignals in bySymbol.items()]
+
+    # symbols are independent, so each one is simulated in its own process
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        simulations.update(pair for pairs in executor.map(BacktestSymbol, jobs) for pair in pairs)
+
+    byProvider = defaultdict(list)
+
+    for index, time, provider, trade in signals:
+        byProvider[provider].append((index, time, trade))
+
+    converter = Converter(directory, currency)
+
+    try:
+        return {provider: BuildEquity(providerSignals, simulations, specifications, converter, balance, riskFactor) for provider, providerSignals in byProvider.items()}
+
+    finally:
+        converter.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('signals', help='JSON lines file of {"time", "provider", "message"} signals')
+    parser.add_argument('--data', required=True, help='folder with the <SYMBOL>.csv or <SYMBOL>.parquet price files')
+    parser.add_argument('--balance', type=float, default=10000.0, help='starting balance of every provider')
+    parser.add_argument('--risk-factor', type=float, default=0.01, help='risk factor of every trade')
+    parser.add_argument('--currency', default='USD', help='account currency')
+    parser.add_argument('--spread', type=float, default=1.0, help='spread in pips added to bid bars')
+    parser.add_argument('--expiry', type=float, default=72.0, help='hours a pending order waits for its entry price')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, default: number of cores')
+    parser.add_argument('--output', default=None, help='folder that receives an equity curve CSV per provider')
+    args = parser.parse_args()
+
+    signals, skipped = LoadSignals(args.signals)
+    results = Backtest(signals, args.data, args.balance, args.risk_factor, args.currency, args.spread, args.expiry, args.workers)
+
+    table = PrettyTable()
+    table.title = f'Backtest of {len(signals)} signals ({skipped} messages skipped)'
+    table.field_names = ['Provider', 'Signals', 'Filled', 'Expired', 'No Data', 'Unknown', 'Win Rate', 'Profit Factor', 'Net Profit', 'Return', 'Max Drawdown']
+    table.align = 'r'
+    table.align['Provider'] = 'l'
+
+    for provider, result in sorted(results.items(), key=lambda item: -item[1]['Stats']['Net Profit']):
+        stats = result['Stats']
+        table.add_row([
+            provider, stats['Signals'], stats.get('Filled', 0), stats.get('Expired', 0), stats.get('NoData', 0), stats.get('Unknown', 0),
+            '{:.1f} %'.format(stats['Win Rate %']), '{:.2f}'.format(stats['Profit Factor']), '{:,.2f}'.format(stats['Net Profit']),
+            '{:.1f} %'.format(stats['Return %']), '{:.1f} %'.format(stats['Max Drawdown %'])
+        ])
+
+    print(table)
+
+    if(args.output):
+        os.makedirs(args.output, exist_ok=True)
+
+        for provider, result in results.items():
+            path = os.path.join(args.output, 'equity_' + re.sub(r'[^\w.-]+', '_', provider) + '.csv')
+
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['time', 'balance'])
+                writer.writerows((datetime.fromtimestamp(time, timezone.utc).isoformat(), round(balance, 2)) for time, balance in result['Curve'])
+
+        print(f'Equity curves written to {args.output}')
+
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+"""Local stand-in for the parts of the MetaApi SDK used by run.py.
+
+Every RPC call waits for a configurable latency, orders fail at a configurable rate and prices follow a seeded
+random walk that is streamed to the synchronization listeners, so the bot can be exercised without credentials.
+"""
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import time
+
+from metaapi_cloud_sdk.clients.timeoutException import TimeoutException
+
+SYMBOLS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symbols.json')
+
+# mid prices the random walk starts from
+PRICES = {
+    'AUDCAD': 0.9012, 'AUDCHF': 0.6195, 'AUDJPY': 93.512, 'AUDNZD': 1.0921, 'AUDUSD': 0.6652,
+    'CADCHF': 0.6874, 'CADJPY': 103.764, 'CHFJPY': 150.941, 'EURAUD': 1.6225, 'EURCAD': 1.4622,
+    'EURCHF': 1.0051, 'EURGBP': 0.8712, 'EURJPY': 151.716, 'EURNZD': 1.7720, 'EURUSD': 1.0793,
+    'GBPAUD': 1.8624, 'GBPCAD': 1.6784, 'GBPCHF': 1.1537, 'GBPJPY': 174.151, 'GBPNZD': 2.0340,
+    'GBPUSD': 1.2389, 'NZDCAD': 0.8251, 'NZDCHF': 0.5672, 'NZDJPY': 85.623, 'NZDUSD': 0.6091,
+    'USDCAD': 1.3547, 'USDCHF': 0.9313, 'USDJPY': 140.562, 'XAGUSD': 23.512, 'XAUUSD': 1925.50,
+}
+
+
+class FakeTradeException(Exception):
+    """Mirrors the stringCode and numericCode of the SDK's TradeException."""
+
+    def __init__(self, message: str, numericCode: int = 10006, stringCode: str = 'TRADE_RETCODE_REJECT') -> None:
+        super().__init__(message)
+        self.numericCode = numericCode
+        self.stringCode = stringCode
+
+
+class FakeOptions:
+    """Behaviour of the fake MetaApi.
+
+    Arguments:
+        latency: mean seconds of every RPC call, jittered by +/- 50%
+        orderLatency: mean seconds of every order call, defaults to latency
+        connectLatency: seconds spent deploying, connecting and synchronizing an account
+        failureRate: fraction of orders rejected by the broker
+        timeoutRate: fraction of orders that are placed but whose response is lost, raising TimeoutException
+        lateRate: fraction of orders that never get a response and are only placed by the broker after lateDelay seconds
+        lateDelay: seconds after which a late order is placed
+        balance: balance of every account
+        currency: currency of every account
+        spread: spread in pips added around the mid price
+        tickInterval: seconds between streamed price updates
+        volatility: standard deviation of every price step, relative to the price
+        seed: seed of the random generator, for reproducible runs
+    """
+
+    def __init__(self, latency: float = 0.05, orderLatency: float = None, connectLatency: float = 0.1, failureRate: float = 0.0,
+                 timeoutRate: float = 0.0, balance: float = 10000.0, currency: str = 'USD', spread: float = 1.0, tickInterval: float = 1.0,
+                 volatility: float = 0.0002, seed: int = 0, lateRate: float = 0.0, lateDelay: float = 1.0) -> None:
+        self.latency = latency
+        self.orderLatency = latency if orderLatency is None else orderLatency
+        self.connectLatency = connectLatency
+        self.failureRate = failureRate
+        self.timeoutRate = timeoutRate
+        self.lateRate = lateRate
+        self.lateDelay = lateDelay
+        self.balance = balance
+        self.currency = currency
+        self.spread = spread
+        self.tickInterval = tickInterval
+        self.volatility = volatility
+        self.random = random.Random(seed)
+
+
+class FakeMarket:
+    """Random walk prices and symbol specifications shared by every account of a fake MetaApi."""
+
+    def __init__(self, options: FakeOptions) -> None:
+        self.options = options
+
+        with open(SYMBOLS_FILE) as file:
+            self.specifications = json.load(file)
+
+        self.mids = dict(PRICES)
+
+    def step(self) -> None:
+        """Moves every price one step of the random walk."""
+
+        for symbol, mid in self.mids.items():
+            self.mids[symbol] = mid * (1 + self.options.random.gauss(0, self.options.volatility))
+
+        return
+
+    def price(self, symbol: str) -> dict:
+        """Returns the current quote of a symbol in the SDK's format."""
+
+        if(symbol not in self.mids):
+            raise FakeTradeException(f'Symbol {symbol} not found', 10013, 'ERR_SYMBOL_NOT_FOUND')
+
+        specification = self.specifications[symbol]
+        pipSize = specification.get('pipSize') or 10 ** -(specification['digits'] - (1 if specification['digits'] in [3, 5] else 0))
+        mid = self.mids[symbol]
+        half = self.options.spread * pipSize / 2
+        tickValue = specification['tickSize'] * specification['contractSize'] * self.rate(specification['profitCurrency'])
+
+        return {
+            'symbol': symbol,
+            'bid': round(mid - half, specification['digits']),
+            'ask': round(mid + half, specification['digits']),
+            'profitTickValue': tickValue,
+            'lossTickValue': tickValue,
+            'time': time.time()
+        }
+
+    def rate(self, currency: str, account: str = None) -> float:
+        """Returns the value of one unit of a currency in the account currency."""
+
+        account = account or self.options.currency
+
+        if(currency == account):
+            return 1.0
+
+        if(account + currency in self.mids):
+            return 1 / self.mids[account + currency]
+
+        if(currency + account in self.mids):
+            return self.mids[currency + account]
+
+        if('USD' in [currency, account]):
+            raise FakeTradeException(f'No price to convert {currency} to {account}')
+
+        # converts through the US dollar
+        return self.rate(currency, 'USD') * self.rate('USD', account)
+
+
+# result of every successful trade request
+DONE = {'numericCode': 10009, 'stringCode': 'TRADE_RETCODE_DONE'}
+
+
+class FakeRpcConnection:
+    """RPC connection that answers from the fake market and its account's orders after a simulated network latency."""
+
+    def __init__(self, api, account) -> None:
+        self.api = api
+        self.account = account
+        self.options = api.options
+
+    async def _wait(self, latency: float) -> None:
+        await asyncio.sleep(latency * self.options.random.uniform(0.5, 1.5))
+
+    async def connect(self) -> None:
+        return
+
+    async def close(self) -> None:
+        return
+
+    async def wait_synchronized(self, *args, **kwargs) -> None:
+        await self._wait(self.options.connectLatency)
+
+    async def get_server_time(self) -> dict:
+        await self._wait(self.options.latency)
+        return {'time': time.time()}
+
+    async def get_account_information(self) -> dict:
+        await self._wait(self.options.latency)
+        return {'balance': self.options.balance, 'equity': self.options.balance, 'currency': self.options.currency, 'leverage': 100, 'margin': 0}
+
+    async def get_symbol_price(self, symbol: str, *args, **kwargs) -> dict:
+        await self._wait(self.options.latency)
+        return self.api.market.price(symbol)
+
+    async def get_symbol_specification(self, symbol: str) -> dict:
+        await self._wait(self.options.latency)
+
+        if(symbol not in self.api.market.specifications):
+            raise FakeTradeException(f'Symbol {symbol} not found', 10013, 'ERR_SYMBOL_NOT_FOUND')
+
+        return dict(self.api.market.specifications[symbol])
+
+    async def get_orders(self) -> list:
+        await self._wait(self.options.latency)
+        return list(self.account.orders.values())
+
+    async def get_positions(self) -> list:
+        await self._wait(self.options.latency)
+        return list(self.account.positions.values())
+
+    async def get_history_orders_by_time_range(self, start_time, end_time, offset: int = 0, limit: int = 1000) -> dict:
+        await self._wait(self.options.latency)
+        history = [order for order in self.account.history if start_time <= order['doneTime'] < end_time]
+        return {'historyOrders': history[offset:offset + limit], 'synchronizing': False}
+
+    async def _order(self, orderType: str, symbol: str, volume: float, openPrice: float = None, stopLoss: float = None,
+                     takeProfit: float = None, options: dict = None) -> dict:
+        await self._wait(self.options.orderLatency)
+
+        if(self.options.random.random() < self.options.failureRate):
+            raise FakeTradeException('Request rejected')
+
+        # the request reached the broker but its response never arrives, the order is placed later
+        if(self.options.random.random() < self.options.lateRate):
+            task = asyncio.get_running_loop().create_task(self._late(orderType, symbol, volume, openPrice, stopLoss, takeProfit, options))
+            self.account.tasks.add(task)
+            task.add_done_callback(self.account.tasks.discard)
+            await asyncio.Event().wait()
+
+        return await self._place(orderType, symbol, volume, openPrice, stopLoss, takeProfit, options)
+
+    async def _late(self, *arguments) -> None:
+        await asyncio.sleep(self.options.lateDelay)
+        await self._place(*arguments)
+
+    async def _place(self, orderType: str, symbol: str, volume: float, openPrice: float = None, stopLoss: float = None,
+                     takeProfit: float = None, options: dict = None) -> dict:
+        order = {
+            'id': str(next(self.api.ids)), 'type': orderType, 'symbol': symbol, 'volume': volume, 'openPrice': openPrice,
+            'stopLoss': stopLoss, 'takeProfit': takeProfit, 'clientId': (options or {}).get('clientId'),
+            'comment': (options or {}).get('comment')
+        }
+        self.account.received += 1
+
+        # market orders become positions at the current price, pending orders wait for their price
+        if(openPrice is None):
+            price = self.api.market.price(symbol)
+            order.update(type=orderType.replace('ORDER_TYPE', 'POSITION_TYPE'), openPrice=price['ask'] if 'BUY' in orderType else price['bid'])
+            self.account.history.append(dict(order, type=orderType, state='ORDER_STATE_FILLED', doneTime=datetime.datetime.now(datetime.timezone.utc)))
+            self.account.positions[order['id']] = order
+            await self.account.publish('on_position_updated', dict(order))
+
+        else:
+            self.account.orders[order['id']] = order
+            await self.account.publish('on_pending_order_updated', dict(order))
+
+        if(self.options.random.random() < self.options.timeoutRate):
+            raise TimeoutException('Request timed out')
+
+        return dict(DONE, orderId=order['id'], positionId=order['id'] if openPrice is None else None)
+
+    def _find(self, items: dict, itemId: str) -> dict:
+        if(itemId not in items):
+            raise FakeTradeException(f'{itemId} not found', 10013, 'TRADE_RETCODE_INVALID')
+
+        return items[itemId]
+
+    async def modify_position(self, position_id, stop_loss=None, take_profit=None, trailing_stop_loss=None, stop_price_base=None):
+        await self._wait(self.options.orderLatency)
+        position = self._find(self.account.positions, position_id)
+        position.update(stopLoss=stop_loss, takeProfit=take_profit)
+        await self.account.publish('on_position_updated', dict(position))
+        return dict(DONE, positionId=position_id)
+
+    async def close_position(self, position_id, options=None):
+        await self._wait(self.options.orderLatency)
+        self._find(self.account.positions, position_id)
+        await self.account.remove(position_id)
+        return dict(DONE, positionId=position_id)
+
+    async def modify_order(self, order_id, open_price, stop_loss=None, take_profit=None, options=None):
+        await self._wait(self.options.orderLatency)
+        order = self._find(self.account.orders, order_id)
+        order.update(openPrice=open_price, stopLoss=stop_loss, takeProfit=take_profit)
+        await self.account.publish('on_pending_order_updated', dict(order))
+        return dict(DONE, orderId=order_id)
+
+    async def cancel_order(self, order_id):
+        await self._wait(self.options.orderLatency)
+        self._find(self.account.orders, order_id)
+        await self.account.remove(order_id)
+        return dict(DONE, orderId=order_id)
+
+    async def create_market_buy_order(self, symbol, volume, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_BUY', symbol, volume, None, stop_loss, take_profit, options)
+
+    async def create_market_sell_order(self, symbol, volume, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_SELL', symbol, volume, None, stop_loss, take_profit, options)
+
+    async def create_limit_buy_order(self, symbol, volume, open_price, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_BUY_LIMIT', symbol, volume, open_price, stop_loss, take_profit, options)
+
+    async def create_limit_sell_order(self, symbol, volume, open_price, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_SELL_LIMIT', symbol, volume, open_price, stop_loss, take_profit, options)
+
+    async def create_stop_buy_order(self, symbol, volume, open_price, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_BUY_STOP', symbol, volume, open_price, stop_loss, take_profit, options)
+
+    async def create_stop_sell_order(self, symbol, volume, open_price, stop_loss=None, take_profit=None, options=None):
+        return await self._order('ORDER_TYPE_SELL_STOP', symbol, volume, open_price, stop_loss, take_profit, options)
+
+
+class FakeStreamingConnection:
+    """Streaming connection that pushes the random walk prices and the account's orders and positions to its listeners.
+
+    Every tickInterval seconds the prices move, pending orders whose price was reached are filled and positions
+    that reached their stop loss or take profit are closed.
+    """
+
+    def __init__(self, api, account) -> None:
+        self.api = api
+        self.account = account
+        self.listeners = []
+        self.subscriptions = set()
+        self._task = None
+
+    def add_synchronization_listener(self, listener) -> None:
+        self.listeners.append(listener)
+
+    async def connect(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait_synchronized(self, *args, **kwargs) -> None:
+        await asyncio.sleep(self.api.options.connectLatency)
+
+        for listener in self.listeners:
+            await listener.on_account_information_updated('0', {'balance': self.api.options.balance, 'equity': self.api.options.balance,
+                                                                'currency': self.api.options.currency, 'leverage': 100, 'margin': 0})
+            await listener.on_positions_replaced('0', [dict(position) for position in self.account.positions.values()])
+            await listener.on_pending_orders_replaced('0', [dict(order) for order in self.account.orders.values()])
+
+    async def subscribe_to_market_data(self, symbol: str, *args, **kwargs) -> None:
+        self.subscriptions.add(symbol)
+        await self._publish([symbol])
+
+    async def close(self) -> None:
+        if(self._task is not None):
+            self._task.cancel()
+            self._task = None
+
+        if(self in self.account.streams):
+            self.account.streams.remove(self)
+
+    async def _publish(self, symbols) -> None:
+        prices = [self.api.market.price(symbol) for symbol in symbols]
+
+        # like the SDK, every packet is also passed on price by price
+        for listener in self.listeners:
+            await listener.on_symbol_prices_updated('0', prices)
+
+            for price in prices:
+                await listener.on_symbol_price_updated('0', price)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.api.options.tickInterval)
+            self.api.market.step()
+            await self._publish(list(self.subscriptions))
+            await self.account.settle()
+
+
+class FakeAccount:
+    """MetaTrader account that is deployed and connected after connectLatency seconds and keeps its orders and positions."""
+
+    def __init__(self, api, accountId: str) -> None:
+        self.api = api
+        self.id = accountId
+        self.state = 'DEPLOYED'
+        self.orders = {}
+        self.positions = {}
+        self.received = 0
+        self.streams = []
+        self.history = []
+        self.tasks = set()
+
+    async def publish(self, event: str, *args) -> None:
+        """Sends a terminal state event to the listeners of every streaming connection of the account."""
+
+        for stream in self.streams:
+            for listener in stream.listeners:
+                await getattr(listener, event)('0', *args)
+
+    async def remove(self, itemId: str) -> None:
+        """Closes a position or cancels a pending order."""
+
+        if(self.positions.pop(itemId, None) is not None):
+            await self.publish('on_position_removed', itemId)
+
+        elif(itemId in self.orders):
+            self.history.append(dict(self.orders.pop(itemId), state='ORDER_STATE_FILLED', doneTime=datetime.datetime.now(datetime.timezone.utc)))
+            await self.publish('on_pending_order_completed', itemId)
+
+    async def settle(self) -> None:
+        """Fills the pending orders whose price was reached and closes the positions that reached their stop loss or take profit."""
+
+        for order in list(self.orders.values()):
+            price = self.api.market.price(order['symbol'])
+            direction = 1 if 'BUY' in order['type'] else -1
+            current = price['ask'] if direction == 1 else price['bid']
+
+            # limit orders fill at their price or better, stop orders at their price or worse
+            if(((order['openPrice'] - current) if 'LIMIT' in order['type'] else (current - order['openPrice'])) * direction >= 0):
+                await self.remove(order['id'])
+                position = dict(order, type='POSITION_TYPE_BUY' if direction == 1 else 'POSITION_TYPE_SELL')
+                self.positions[position['id']] = position
+                await self.publish('on_position_updated', dict(position))
+
+        for position in list(self.positions.values()):
+            price = self.api.market.price(position['symbol'])
+            direction = 1 if 'BUY' in position['type'] else -1
+            current = price['bid'] if direction == 1 else price['ask']
+
+            if((position['takeProfit'] and (current - position['takeProfit']) * direction >= 0) or (position['stopLoss'] and (position['stopLoss'] - current) * direction >= 0)):
+                await self.remove(position['id'])
+
+    async def deploy(self) -> None:
+        await asyncio.sleep(self.api.options.connectLatency)
+        self.state = 'DEPLOYED'
+
+    async def wait_connected(self) -> None:
+        await asyncio.sleep(self.api.options.connectLatency)
+
+    def get_rpc_connection(self) -> FakeRpcConnection:
+        return FakeRpcConnection(self.api, self)
+
+    def get_streaming_connection(self) -> FakeStreamingConnection:
+        stream = FakeStreamingConnection(self.api, self)
+        self.streams.append(stream)
+        return stream
+
+
+class FakeAccountApi:
+
+    def __init__(self, api) -> None:
+        self.api = api
+        self.accounts = {}
+
+    async def get_account(self, accountId: str) -> FakeAccount:
+        await asyncio.sleep(self.api.options.latency)
+
+        # reconnecting to an account finds its orders again
+        if(accountId not in self.accounts):
+            self.accounts[accountId] = FakeAccount(self.api, accountId)
+
+        return self.accounts[accountId]
+
+
+class FakeMetaApi:
+    """Drop-in replacement of metaapi_cloud_sdk.MetaApi, ex: run.MetaApi = functools.partial(FakeMetaApi, options=FakeOptions())."""
+
+    def __init__(self, token: str = None, opts: dict = None, options: FakeOptions = None) -> None:
+        self.options = options or FakeOptions()
+        self.market = FakeMarket(self.options)
+        self.metatrader_account_api = FakeAccountApi(self)
+        self.ids = itertools.count(1)
+
+    def close(self) -> None:
+        return
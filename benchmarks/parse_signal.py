@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Microbenchmark of the signal parser.
+
+Compares ParseSignal and the batch ParseSignals entry point against the original if/elif parser. Signals in the usual
+layout take the single-pass SIGNAL_PATTERN route and parse about as fast as with the original parser, expect ratios
+slightly above 1x. The runs of the parsers are interleaved and the fastest of each is kept, so that a noisy machine
+affects all of them alike.
+
+Usage:
+    python benchmarks/parse_signal.py [--number 5000] [--repeat 15]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# the parser reads the recognized symbols and the risk factor from the bot's settings
+os.environ.setdefault('RISK_FACTOR', '0.01')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import LoadConfig
+from signals import ParseSignal, ParseSignals
+
+CONFIG = LoadConfig(validate=False)
+
+SIGNALS = [
+    'BUY GBPUSD\nEntry NOW\nSL 1.14336\nTP 1.28930\nTP 1.29845',
+    'BUY LIMIT GBPUSD\nEntry 1.14480\nSL 1.14336\nTP 1.28930',
+    'SELL STOP XAUUSD\nEntry 1805.50\nSL 1812.00\nTP 1795.00\nTP 1785.00',
+    'Sell Limit USDJPY\nEntry 137.250\nSL 137.850\nTP 136.500',
+    'SELL EURUSD\nEntry NOW\nSL 1.02500\nTP 1.01000',
+    'BUY STOP AUDCAD\nEntry 0.90120\nSL 0.89800\nTP 0.90800\nTP 0.91200',
+]
+
+
+def LegacyParseSignal(signal: str) -> dict:
+    """Original parser, kept as the baseline of the benchmark."""
+
+    signal = signal.splitlines()
+    signal = [line.rstrip() for line in signal]
+
+    trade = {}
+
+    if('Buy Limit'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Buy Limit'
+
+    elif('Sell Limit'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Sell Limit'
+
+    elif('Buy Stop'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Buy Stop'
+
+    elif('Sell Stop'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Sell Stop'
+
+    elif('Buy'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Buy'
+
+    elif('Sell'.lower() in signal[0].lower()):
+        trade['OrderType'] = 'Sell'
+
+    else:
+        return {}
+
+    trade['Symbol'] = (signal[0].split())[-1].upper()
+
+    if(trade['Symbol'] not in CONFIG.symbolIndex):
+        return {}
+
+    if(trade['OrderType'] == 'Buy' or trade['OrderType'] == 'Sell'):
+        trade['Entry'] = (signal[1].split())[-1]
+
+    else:
+        trade['Entry'] = float((signal[1].split())[-1])
+
+    trade['StopLoss'] = float((signal[2].split())[-1])
+    trade['TP'] = [float((signal[3].split())[-1])]
+
+    if(len(signal) > 4):
+        trade['TP'].append(float(signal[4].split()[-1]))
+
+    trade['RiskFactor'] = CONFIG.riskFactor
+
+    return trade
+
+
+def Measure(statements: dict, number: int, repeat: int) -> dict:
+    """Returns the number of signals parsed per second by statements that parse every benchmark signal once.
+
+    The statements take turns, so that a slower or faster period of the machine affects all of them alike.
+    """
+
+    seconds = {name: [] for name in statements}
+
+    for _ in range(repeat):
+        for name, statement in statements.items():
+            seconds[name].append(timeit.timeit(statement, number=number))
+
+    return {name: number * len(SIGNALS) / min(times) for name, times in seconds.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=5000, help='number of passes over the benchmark signals per run')
+    parser.add_argument('--repeat', type=int, default=15, help='number of runs of each parser')
+    args = parser.parse_args()
+
+    # both parsers must agree on the signals the original parser understands
+    for signal in SIGNALS:
+        assert ParseSignal(signal, CONFIG) == LegacyParseSignal(signal), signal
+
+    results = Measure({
+        'legacy ParseSignal': lambda: [LegacyParseSignal(signal) for signal in SIGNALS],
+        'ParseSignal': lambda: [ParseSignal(signal, CONFIG) for signal in SIGNALS],
+        'ParseSignals (batch)': lambda: ParseSignals(SIGNALS, CONFIG),
+    }, args.number, args.repeat)
+
+    baseline = results['legacy ParseSignal']
+
+    for name, rate in results.items():
+        print(f'{name:<22} {rate:>12,.0f} parses/s  ({rate / baseline:.2f}x)')
+
+    return
+
+
+if __name__ == '__main__':
+    main()
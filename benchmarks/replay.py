@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Replays signal messages through the bot's real handlers against a local MetaApi stand-in.
+
+Each signal goes through /trade -> PlaceTrade, or /calculate -> CalculateTrade -> /yes with --calculate, on
+fake MetaTrader accounts with configurable latency, failures and prices. Reports the throughput, the latency of
+each signal from the first handler call to the last reply and the bot's per-stage latency histograms.
+
+Signals are read from a file, separated by blank lines or as JSON lines with a "message" or "text" field,
+or generated from the fake market prices when no file is given.
+
+Usage:
+    python benchmarks/replay.py [--signals signals.txt] [--count 200] [--concurrency 10] [--calculate]
+                                [--accounts 1] [--latency 0.05] [--reply-latency 0.0] [--failure-rate 0.0]
+                                [--timeout-rate 0.0] [--risk-guard] [--json]
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# the bot reads its settings from the environment on import
+os.environ.setdefault('RISK_FACTOR', '0.01')
+os.environ.setdefault('TELEGRAM_USER', 'replay')
+os.environ.setdefault('JOURNAL_FILE', os.path.join(tempfile.mkdtemp(), 'journal.db'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_metaapi import PRICES, FakeMetaApi, FakeOptions
+
+# outcome of the trades placed for the signal replayed by the current task
+OUTCOME = contextvars.ContextVar('OUTCOME')
+
+# every replayed signal gets its own chat, like signals sent by different users
+CHAT_IDS = itertools.count(1)
+
+
+class FakeChat:
+
+    def __init__(self, username: str, chatId: int) -> None:
+        self.id = chatId
+        self.username = username
+        self.title = None
+
+
+class FakeMessage:
+    """Telegram message that records the replies and edits of the bot with their time, after a simulated Bot API latency."""
+
+    def __init__(self, text: str, username: str, replies: list, chatId: int = 1, latency: float = 0.0) -> None:
+        self.text = text
+        self.chat = FakeChat(username, chatId)
+        self.date = datetime.datetime.now(datetime.timezone.utc)
+        self.replies = replies
+        self.latency = latency
+
+    async def reply_text(self, text: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.replies.append((time.perf_counter(), text))
+        return self
+
+    async def edit_text(self, text: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.replies.append((time.perf_counter(), text))
+        return self
+
+
+class FakeUpdate:
+
+    def __init__(self, text: str, username: str, replies: list, chatId: int = 1, latency: float = 0.0) -> None:
+        self.effective_message = FakeMessage(text, username, replies, chatId, latency)
+
+
+class FakeContext:
+
+    def __init__(self) -> None:
+        self.user_data = {}
+        self.args = []
+
+
+def LoadSignals(path: str) -> list:
+    """Reads recorded signals, either separated by blank lines or as JSON lines."""
+
+    with open(path) as file:
+        content = file.read()
+
+    if(content.lstrip().startswith('{')):
+        return [entry.get('message') or entry['text'] for entry in map(json.loads, content.splitlines()) if entry]
+
+    return [block.strip() for block in content.split('\n\n') if block.strip()]
+
+
+def GenerateSignals(count: int, seed: int) -> list:
+    """Generates valid signals around the fake market prices, with one to three take profits."""
+
+    generator = random.Random(seed)
+    signals = []
+
+    for _ in range(count):
+        symbol = generator.choice(sorted(PRICES))
+        price = PRICES[symbol]
+        side = generator.choice(['BUY', 'SELL'])
+        kind = generator.choice(['', ' LIMIT', ' STOP'])
+        direction = 1 if side == 'BUY' else -1
+        distance = price * generator.uniform(0.002, 0.01)
+        digits = 2 if price > 1000 else 3 if price > 20 else 5
+
+        # limit orders wait below a buy or above a sell, stop orders the other way round
+        offset = {'': 0, ' LIMIT': -1, ' STOP': 1}[kind] * direction * distance / 2
+        entry = price + offset
+        takeProfits = [entry + direction * distance * (number + 1) for number in range(generator.randint(1, 3))]
+
+        lines = [f'{side}{kind} {symbol}', f"Entry {'NOW' if not kind else round(entry, digits)}", f'SL {round(entry - direction * distance, digits)}']
+        lines += [f'TP {round(takeProfit, digits)}' for takeProfit in takeProfits]
+        signals.append('\n'.join(lines))
+
+    return signals
+
+
+def ObserveTrades(run) -> None:
+    """Wraps run.RecordTrade to collect the account results of every placed trade into OUTCOME."""
+
+    recordTrade = run.RecordTrade
+
+    def record(trade, results, enterTrade):
+        recordTrade(trade, results, enterTrade)
+
+        if(enterTrade):
+            OUTCOME.get().extend(results)
+
+    run.RecordTrade = record
+
+    return
+
+
+async def ReplaySignal(run, signal: str, calculate: bool, replyLatency: float = 0.0) -> dict:
+    """Sends one signal through the conversation handlers and times it until the last reply is delivered."""
+
+    replies = []
+    outcome = []
+    OUTCOME.set(outcome)
+    context = FakeContext()
+    username = os.environ['TELEGRAM_USER']
+    chatId = next(CHAT_IDS)
+    update = functools.partial(FakeUpdate, username=username, replies=replies, chatId=chatId, latency=replyLatency)
+    started = time.perf_counter()
+
+    if(calculate):
+        await run.Calculation_Command(update('/calculate'), context)
+        await run.CalculateTrade(update(signal), context)
+        await run.PlaceTrade(update('/yes'), context)
+
+    else:
+        await run.Trade_Command(update('/trade'), context)
+        await run.PlaceTrade(update(signal), context)
+
+    # the status messages are sent in the background
+    await run.OUTBOX.join(chatId)
+
+    finished = replies[-1][0] if replies else time.perf_counter()
+    orders = [order for result in outcome for order in result['Orders']]
+    entered = bool(orders) and all(result['Error'] is None for result in outcome) and all(order['Error'] is None for order in orders)
+
+    return {'Latency': (finished - started) * 1000, 'Entered': entered, 'Orders': len(orders),
+            'Failed': sum(order['Error'] is not None for order in orders), 'Retried': sum(order['Attempts'] > 1 for order in orders),
+            'Replies': [text for _, text in replies]}
+
+
+def Percentile(values: list, quantile: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+
+async def Replay(args) -> dict:
+    """Starts the bot against the fake MetaApi, replays every signal and summarizes the run."""
+
+    # the risk guard is off unless its limits are set, --risk-guard applies the README's example limits
+    if(args.risk_guard):
+        for name, limit in [('MAX_OPEN_RISK', '0.06'), ('MAX_CURRENCY_RISK', '0.04'), ('MAX_SYMBOL_RISK', '0.03'), ('MAX_DAILY_LOSS', '0.05'), ('MAX_MARGIN_USAGE', '0.5')]:
+            os.environ.setdefault(name, limit)
+
+    if(args.accounts > 1):
+        os.environ['ACCOUNTS'] = json.dumps([{'id': f'replay-{number + 1}'} for number in range(args.accounts)])
+    else:
+        os.environ.setdefault('ACCOUNT_ID', 'replay')
+
+    import run
+
+    options = FakeOptions(latency=args.latency, orderLatency=args.order_latency, connectLatency=args.connect_latency,
+                          failureRate=args.failure_rate, timeoutRate=args.timeout_rate, balance=args.balance, tickInterval=args.tick_interval, seed=args.seed)
+    apis = []
+
+    def metaApi(token: str = None, opts: dict = None) -> FakeMetaApi:
+        # keeps every fake MetaApi to count the orders the broker received
+        apis.append(FakeMetaApi(token, opts, options))
+        return apis[-1]
+
+    run.MetaApi = metaApi
+    ObserveTrades(run)
+
+    signals = LoadSignals(args.signals) if args.signals else GenerateSignals(args.count, args.seed)
+
+    await run.StartBroker(None)
+
+    try:
+        # waits for every account to be synchronized so that connecting is not part of the measurement
+        for manager in run.CONNECTIONS:
+            await manager.get_connection()
+
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def replay(signal: str) -> dict:
+            async with limit:
+                return await ReplaySignal(run, signal, args.calculate, args.reply_latency)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[replay(signal) for signal in signals])
+        elapsed = time.perf_counter() - started
+
+    finally:
+        await run.StopBroker(None)
+
+    latencies = [result['Latency'] for result in results]
+
+    return {
+        'signals': len(signals),
+        'entered': sum(result['Entered'] for result in results),
+        'orders': sum(result['Orders'] for result in results),
+        'failed_orders': sum(result['Failed'] for result in results),
+        'retried_orders': sum(result['Retried'] for result in results),
+        'broker_orders': sum(account.received for api in apis for account in api.metatrader_account_api.accounts.values()),
+        'seconds': elapsed,
+        'signals_per_second': len(signals) / elapsed,
+        'latency_ms': {'p50': Percentile(latencies, 0.5), 'p95': Percentile(latencies, 0.95), 'p99': Percentile(latencies, 0.99), 'max': max(latencies)},
+        'stages_ms': {row[0]: dict(zip(['count', 'p50', 'p95', 'p99'], row[1:])) for row in run.METRICS.summary()},
+        'failures': [result['Replies'][-1] for result in results if not result['Entered']][:args.show_failures]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--signals', help='file with recorded signals, default: generated signals')
+    parser.add_argument('--count', type=int, default=200, help='number of generated signals')
+    parser.add_argument('--concurrency', type=int, default=10, help='number of signals replayed at the same time')
+    parser.add_argument('--calculate', action='store_true', help='replay /calculate -> /yes instead of /trade')
+    parser.add_argument('--accounts', type=int, default=1, help='number of fake MetaTrader accounts')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean seconds of every MetaApi call')
+    parser.add_argument('--order-latency', type=float, default=None, help='mean seconds of every order, default: --latency')
+    parser.add_argument('--reply-latency', type=float, default=0.0, help='seconds Telegram takes to send or edit every reply')
+    parser.add_argument('--connect-latency', type=float, default=0.1, help='seconds to deploy and synchronize an account')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of orders rejected by the broker')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of orders that are placed but time out, which the bot retries')
+    parser.add_argument('--risk-guard', action='store_true', help='apply the risk guard limits of the environment or the example limits of the README')
+    parser.add_argument('--balance', type=float, default=10000.0, help='balance of every account')
+    parser.add_argument('--tick-interval', type=float, default=1.0, help='seconds between streamed prices')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated signals and the fake market')
+    parser.add_argument('--show-failures', type=int, default=3, help='number of failed signals whose last reply is shown')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(Replay(args))
+
+    if(args.json):
+        print(json.dumps(report, indent=2))
+        return
+
+    latency = report['latency_ms']
+    print(f"{report['signals']} signals, {report['entered']} fully entered in {report['seconds']:.2f} s ({report['signals_per_second']:.1f} signals/s)")
+    print(f"{report['orders']} orders, {report['failed_orders']} failed, {report['retried_orders']} retried, {report['broker_orders']} received by the broker")
+    print(f"signal latency: p50 {latency['p50']:.0f} ms  p95 {latency['p95']:.0f} ms  p99 {latency['p99']:.0f} ms  max {latency['max']:.0f} ms")
+    print()
+    print(f"{'stage':<22} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+
+    for stage, row in report['stages_ms'].items():
+        print(f"{stage:<22} {row['count']:>7} {row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f}")
+
+    for failure in report['failures']:
+        print(f'\nfailed: {failure}')
+
+    return
+
+
+if __name__ == '__main__':
+    main()
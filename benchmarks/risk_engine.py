@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Microbenchmark of the vectorized risk engine.
+
+Sizes generated signals for every balance and risk factor with CalculateTradesRisk and with the per-trade
+CalculateTradeInformation path, checks that both agree and compares their speed.
+
+Usage:
+    python benchmarks/risk_engine.py [--signals 500] [--number 5]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+# the parser reads the recognized symbols and the risk factor from the bot's settings
+os.environ.setdefault('RISK_FACTOR', '0.01')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_metaapi import SYMBOLS_FILE, FakeMarket, FakeOptions
+from replay import GenerateSignals
+from config import LoadConfig
+from riskengine import CalculateTradesRisk
+from signals import ParseSignal
+from sizing import CalculateTradeInformation, PipSize, PipValue
+
+CONFIG = LoadConfig(validate=False)
+
+BALANCES = [500, 1000, 2500, 10000, 50000]
+RISK_FACTORS = [0.005, 0.01, 0.02, 0.05]
+
+
+def LoadTrades(count: int) -> tuple:
+    """Parses generated signals and resolves their entry price, specification and pip value."""
+
+    market = FakeMarket(FakeOptions())
+
+    with open(SYMBOLS_FILE) as file:
+        specifications = json.load(file)
+
+    trades, tradeSpecifications, pipValues = [], [], []
+
+    for signal in GenerateSignals(count, 0):
+        trade = ParseSignal(signal, CONFIG)
+        price = market.price(trade['Symbol'])
+        specification = dict(specifications[trade['Symbol']])
+        specification['pipSize'] = PipSize(specification)
+
+        if(trade['Entry'] == 'NOW'):
+            trade['Entry'] = price['bid'] if trade['OrderType'] == 'Buy' else price['ask']
+
+        trades.append(trade)
+        tradeSpecifications.append(specification)
+        pipValues.append(PipValue(specification, price, 'USD', trade['Entry']))
+
+    return trades, tradeSpecifications, pipValues
+
+
+def ScalarRisk(trades: list, specifications: list, pipValues: list) -> list:
+    """Sizes every trade, balance and risk factor one at a time, like CreateTable does."""
+
+    results = []
+
+    for trade, specification, pipValue in zip(trades, specifications, pipValues):
+        for balance in BALANCES:
+            for riskFactor in RISK_FACTORS:
+                sized = dict(trade, RiskFactor=riskFactor)
+                stopLossPips, takeProfitPips = CalculateTradeInformation(sized, balance, specification, pipValue)
+                loss = round(sized['PositionSize'] * sized['PipValue'] * stopLossPips, 2)
+                profit = sum(round((sized['PositionSize'] * sized['PipValue'] * (1 / len(takeProfitPips))) * takeProfit, 2) for takeProfit in takeProfitPips)
+                results.append((sized['PositionSize'], loss, profit))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--signals', type=int, default=500, help='number of generated signals')
+    parser.add_argument('--number', type=int, default=5, help='number of runs of each path')
+    args = parser.parse_args()
+
+    trades, specifications, pipValues = LoadTrades(args.signals)
+
+    # both paths must size every combination the same way
+    risk = CalculateTradesRisk(trades, BALANCES, RISK_FACTORS, specifications, pipValues)
+    vectorized = zip(risk['PositionSize'].ravel(), risk['Loss'].ravel(), risk['TotalProfit'].ravel())
+
+    for expected, actual in zip(ScalarRisk(trades, specifications, pipValues), vectorized):
+        assert expected[0] == actual[0] and expected[1] == actual[1] and abs(expected[2] - actual[2]) < 1e-6, (expected, actual)
+
+    combinations = len(trades) * len(BALANCES) * len(RISK_FACTORS)
+    results = {
+        'CalculateTradeInformation': min(timeit.repeat(lambda: ScalarRisk(trades, specifications, pipValues), number=1, repeat=args.number)),
+        'CalculateTradesRisk': min(timeit.repeat(lambda: CalculateTradesRisk(trades, BALANCES, RISK_FACTORS, specifications, pipValues), number=1, repeat=args.number)),
+    }
+
+    baseline = results['CalculateTradeInformation']
+
+    for name, seconds in results.items():
+        print(f'{name:<26} {combinations / seconds:>12,.0f} sizings/s  ({baseline / seconds:.2f}x)')
+
+    return
+
+
+if __name__ == '__main__':
+    main()
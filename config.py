@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, fields
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+# symbols that can be traded unless SYMBOLS is set
+DEFAULT_SYMBOLS = ('AUDCAD', 'AUDCHF', 'AUDJPY', 'AUDNZD', 'AUDUSD', 'CADCHF', 'CADJPY', 'CHFJPY', 'EURAUD', 'EURCAD', 'EURCHF', 'EURGBP', 'EURJPY', 'EURNZD', 'EURUSD', 'GBPAUD', 'GBPCAD', 'GBPCHF', 'GBPJPY', 'GBPNZD', 'GBPUSD', 'NOW', 'NZDCAD', 'NZDCHF', 'NZDJPY', 'NZDUSD', 'USDCAD', 'USDCHF', 'USDJPY', 'XAGUSD', 'XAUUSD')
+
+
+class ConfigError(Exception):
+    """Raised when the configuration cannot be read or is invalid, with one line per problem."""
+
+
+def ParseList(value: Union[str, list]) -> list:
+    """Reads a comma separated string of the environment or a list of the config file."""
+
+    if(isinstance(value, str)):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    if(isinstance(value, list)):
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    raise ValueError(f'expected a list, got {value!r}')
+
+def ParseBool(value: Union[str, bool]) -> bool:
+    """Reads "true"/"false" of the environment or a boolean of the config file."""
+
+    if(isinstance(value, bool)):
+        return value
+
+    if(isinstance(value, str) and value.strip().lower() in ['true', 'false']):
+        return value.strip().lower() == 'true'
+
+    raise ValueError(f'expected true or false, got {value!r}')
+
+def ParseFloat(value: Union[str, float]) -> float:
+    """Reads a number of the environment or the config file."""
+
+    if(isinstance(value, bool)):
+        raise ValueError(f'expected a number, got {value!r}')
+
+    return float(value)
+
+def ParseAccounts(value: Union[str, list]) -> list:
+    """Reads the JSON list of accounts of the environment or the config file."""
+
+    accounts = json.loads(value) if isinstance(value, str) else value
+
+    if(not(isinstance(accounts, list)) or not(all(isinstance(account, dict) for account in accounts))):
+        raise ValueError('expected a list of accounts, ex: [{"id": "...", "name": "main", "riskFactor": 0.02}]')
+
+    return accounts
+
+
+# every setting of the configuration: field, environment variable and config file key, parser and default
+SETTINGS = [
+    ('users', 'TELEGRAM_USERS', ParseList, []),
+    ('accountId', 'ACCOUNT_ID', str, None),
+    ('accounts', 'ACCOUNTS', ParseAccounts, None),
+    ('riskFactor', 'RISK_FACTOR', ParseFloat, None),
+    ('symbols', 'SYMBOLS', ParseList, list(DEFAULT_SYMBOLS)),
+    ('allowedSymbols', 'ALLOWED_SYMBOLS', ParseList, None),
+    ('maxRisk', 'MAX_RISK', ParseFloat, 0.02),
+    ('notifyChat', 'NOTIFY_CHAT', str, None),
+    ('deployedStates', 'DEPLOYED_STATES', ParseList, ['DEPLOYING', 'DEPLOYED']),
+    ('breakevenAtTp1', 'BREAKEVEN_AT_TP1', ParseBool, False),
+    ('trailingStopPips', 'TRAILING_STOP_PIPS', ParseFloat, 0.0),
+    ('trailingStepPips', 'TRAILING_STEP_PIPS', ParseFloat, 1.0),
+    ('maxOpenRisk', 'MAX_OPEN_RISK', ParseFloat, 0.0),
+    ('maxCurrencyRisk', 'MAX_CURRENCY_RISK', ParseFloat, 0.0),
+    ('maxSymbolRisk', 'MAX_SYMBOL_RISK', ParseFloat, 0.0),
+    ('maxDailyLoss', 'MAX_DAILY_LOSS', ParseFloat, 0.0),
+    ('maxMarginUsage', 'MAX_MARGIN_USAGE', ParseFloat, 0.0),
+]
+
+
+@dataclass(frozen=True)
+class Config:
+    """Settings of the bot that can be changed while it runs.
+
+    A Config is never modified. Reloading builds a new one and swaps it in, so a handler that read the
+    configuration once keeps a consistent view of it until it finishes.
+    """
+
+    # Telegram usernames or chat ids allowed to use the bot
+    users: frozenset
+
+    # MetaTrader accounts that every signal is copied to, each with its id, name, risk factor and broker symbol names
+    accountId: str
+    accounts: tuple
+    riskFactor: float
+
+    # symbols recognized in signals and symbols that copied signals may trade
+    symbols: tuple
+    symbolIndex: frozenset
+    allowedSymbols: frozenset
+
+    # highest risk factor of copied signals and chat id that receives their results
+    maxRisk: float
+    notifyChat: str
+
+    # account states in which the account is not deployed again on connect
+    deployedStates: frozenset
+
+    # position manager rules
+    breakevenAtTp1: bool
+    trailingStopPips: float
+    trailingStepPips: float
+
+    # risk guard limits, 0 disables a limit, which they all are unless they are set
+    maxOpenRisk: float
+    maxCurrencyRisk: float
+    maxSymbolRisk: float
+    maxDailyLoss: float
+    maxMarginUsage: float
+
+    def isAuthorized(self, username: str, chatId: int) -> bool:
+        """Returns whether a Telegram user may use the bot.
+
+        Arguments:
+            username: username of the chat, may be None
+            chatId: id of the chat
+        """
+
+        return (username is not None and username in self.users) or str(chatId) in self.users
+
+    def problems(self) -> list:
+        """Returns the settings that prevent the bot from trading, as a list of messages."""
+
+        problems = []
+
+        if(not(self.users)):
+            problems.append('TELEGRAM_USERS is not set, nobody can use the bot')
+
+        if(not(self.accounts)):
+            problems.append('ACCOUNT_ID or ACCOUNTS is not set')
+
+        ids = [account.get('id') for account in self.accounts]
+
+        for account in self.accounts:
+            if(not(account.get('id'))):
+                problems.append(f"account {account['name']} has no id")
+
+            if(account['riskFactor'] is None):
+                problems.append(f"RISK_FACTOR is not set and account {account['name']} has no riskFactor")
+
+            elif(not(0 < account['riskFactor'] <= 1)):
+                problems.append(f"risk factor of account {account['name']} must be between 0 and 1, got {account['riskFactor']}")
+
+        if(len(set(ids)) != len(ids)):
+            problems.append('ACCOUNTS contains the same account id more than once')
+
+        unknown = self.allowedSymbols - self.symbolIndex
+
+        if(unknown):
+            problems.append(f"ALLOWED_SYMBOLS contains symbols that are not in SYMBOLS: {', '.join(sorted(unknown))}")
+
+        for name in ['maxRisk', 'trailingStopPips', 'maxOpenRisk', 'maxCurrencyRisk', 'maxSymbolRisk', 'maxDailyLoss', 'maxMarginUsage']:
+            if(getattr(self, name) < 0):
+                problems.append(f'{Setting(name)[1]} must not be negative')
+
+        if(self.trailingStepPips <= 0):
+            problems.append('TRAILING_STEP_PIPS must be positive')
+
+        return problems
+
+    def changes(self, other: 'Config') -> list:
+        """Returns the names of the settings that differ in another configuration.
+
+        Arguments:
+            other: configuration to compare with
+        """
+
+        return [Setting(field.name)[1] for field in fields(self) if field.name != 'symbolIndex' and getattr(self, field.name) != getattr(other, field.name)]
+
+
+def Setting(field: str) -> tuple:
+    """Returns the entry of SETTINGS of a field."""
+
+    return next(setting for setting in SETTINGS if setting[0] == field)
+
+def LoadConfig(path: str = None, environ: dict = os.environ, validate: bool = True) -> Config:
+    """Reads the configuration from the environment and an optional JSON file whose keys override it.
+
+    The file is a JSON object with the environment variable names as keys, ex:
+    {"TELEGRAM_USERS": ["alice", "bob"], "RISK_FACTOR": 0.01, "ALLOWED_SYMBOLS": ["EURUSD", "XAUUSD"]}
+
+    Arguments:
+        path: optional path of the config file, ignored when it does not exist
+        environ: environment variables
+        validate: whether settings that prevent the bot from trading are errors, ex: a missing risk factor
+
+    Returns:
+        the configuration
+
+    Raises:
+        ConfigError: when a setting cannot be read or, if validate is set, the configuration is invalid
+    """
+
+    names = {name for _, name, _, _ in SETTINGS}
+    values = {name: environ[name] for name in names if environ.get(name)}
+
+    # a single TELEGRAM_USER is still supported
+    if('TELEGRAM_USERS' not in values and environ.get('TELEGRAM_USER')):
+        values['TELEGRAM_USERS'] = environ['TELEGRAM_USER']
+
+    if(path and os.path.exists(path)):
+        try:
+            with open(path) as file:
+                content = json.load(file)
+
+        except (OSError, ValueError) as error:
+            raise ConfigError(f'Cannot read {path}: {error}')
+
+        if(not(isinstance(content, dict))):
+            raise ConfigError(f'{path} must contain a JSON object')
+
+        unknown = set(content) - names - {'TELEGRAM_USER'}
+
+        if(unknown):
+            raise ConfigError(f"Unknown settings in {path}: {', '.join(sorted(unknown))}")
+
+        if('TELEGRAM_USER' in content):
+            content.setdefault('TELEGRAM_USERS', content.pop('TELEGRAM_USER'))
+
+        values.update(content)
+
+    settings = {}
+    errors = []
+
+    for field, name, parse, default in SETTINGS:
+        try:
+            settings[field] = parse(values[name]) if values.get(name) not in [None, ''] else default
+
+        except (TypeError, ValueError) as error:
+            errors.append(f'{name}: {error}')
+
+    if(errors):
+        raise ConfigError('\n'.join(errors))
+
+    # the single ACCOUNT_ID account is used when no ACCOUNTS are listed
+    accounts = settings['accounts'] if settings['accounts'] is not None else [{'id': settings['accountId']}] if settings['accountId'] else []
+
+    for number, account in enumerate(accounts):
+        accounts[number] = {**account, 'name': account.get('name') or account.get('id'), 'symbols': account.get('symbols') or {}}
+        accounts[number]['riskFactor'] = account['riskFactor'] if account.get('riskFactor') is not None else settings['riskFactor']
+
+    symbols = [symbol.upper() for symbol in settings['symbols']]
+
+    settings.update(
+        users=frozenset(user.lstrip('@') for user in settings['users']),
+        accounts=tuple(accounts),
+        symbols=tuple(symbols),
+        symbolIndex=frozenset(symbols),
+        allowedSymbols=frozenset(symbol.upper() for symbol in (settings['allowedSymbols'] or symbols)),
+        deployedStates=frozenset(settings['deployedStates'])
+    )
+
+    config = Config(**settings)
+
+    if(validate and config.problems()):
+        raise ConfigError('\n'.join(config.problems()))
+
+    return config
+
+
+class ConfigWatcher:
+    """Calls a coroutine function whenever a file is created, modified or removed, checked every interval seconds."""
+
+    def __init__(self, path: str, onChange, interval: float = 5.0) -> None:
+        self.path = path
+        self.onChange = onChange
+        self.interval = interval
+
+        self._stamp = None
+        self._task = None
+
+    async def start(self) -> None:
+        """Starts watching the file in the background."""
+
+        if(self._task is None and self.path and self.interval > 0):
+            self._stamp = self.stamp()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        return
+
+    async def close(self) -> None:
+        """Stops watching the file."""
+
+        if(self._task is not None):
+            self._task.cancel()
+
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+            self._task = None
+
+        return
+
+    def stamp(self) -> tuple:
+        """Returns the modification time and size of the file, or None if it does not exist."""
+
+        try:
+            stat = os.stat(self.path)
+
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _run(self) -> None:
+        """Compares the file's stamp every interval seconds."""
+
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self.stamp()
+
+            if(stamp == self._stamp):
+                continue
+
+            self._stamp = stamp
+
+            try:
+                await self.onChange()
+
+            except Exception as error:
+                logger.error(f'Could not apply the changes of {self.path}: {error}')
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    source TEXT,
+    account TEXT,
+    symbol TEXT,
+    order_type TEXT,
+    message TEXT,
+    trade TEXT,
+    sizing TEXT,
+    orders TEXT,
+    timings TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_time ON journal (time);
+CREATE INDEX IF NOT EXISTS journal_symbol_time ON journal (symbol, time);
+"""
+
+COLUMNS = ['time', 'source', 'account', 'symbol', 'order_type', 'message', 'trade', 'sizing', 'orders', 'timings', 'error']
+
+
+class TradeJournal:
+    """Append-only journal of every parsed, sized and placed trade, stored in SQLite in WAL mode.
+
+    Entries are queued in memory by record() and written in batches by a background task on a worker thread,
+    so the order path never waits for the disk.
+    """
+
+    def __init__(self, path: str, batchSize: int = 100, flushInterval: float = 1.0) -> None:
+        self.path = path
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+
+        self._queue = None
+        self._task = None
+        self._connection = None
+
+    async def start(self) -> None:
+        """Opens the database and starts the background writer."""
+
+        if(self._task is None):
+            self._connection = await asyncio.to_thread(self._open)
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        return
+
+    async def close(self) -> None:
+        """Writes the queued entries and closes the database."""
+
+        if(self._task is None):
+            return
+
+        # the writer flushes everything queued before the sentinel and stops
+        self._queue.put_nowait(None)
+        await self._task
+
+        await asyncio.to_thread(self._connection.close)
+        self._task = None
+        self._queue = None
+
+        return
+
+    def record(self, entry: dict) -> None:
+        """Queues a journal entry without blocking.
+
+        Arguments:
+            entry: dictionary with the source, account, raw message, trade, sizing, orders, timings and error
+        """
+
+        if(self._queue is None):
+            logger.warning('Trade journal is not started, entry dropped')
+            return
+
+        self._queue.put_nowait((
+            entry.get('time', time.time()),
+            entry.get('source'),
+            entry.get('account'),
+            entry.get('symbol'),
+            entry.get('order_type'),
+            entry.get('message'),
+            Serialize(entry.get('trade')),
+            Serialize(entry.get('sizing')),
+            Serialize(entry.get('orders')),
+            Serialize(entry.get('timings')),
+            None if entry.get('error') is None else str(entry['error'])
+        ))
+
+        return
+
+    async def page(self, page: int = 0, pageSize: int = 10, symbol: str = None) -> list:
+        """Returns one page of journal entries, newest first.
+
+        Arguments:
+            page: number of the page, starting at 0
+            pageSize: number of entries per page
+            symbol: optional symbol to filter the entries by
+
+        Returns:
+            a list of dictionaries with the journal columns
+        """
+
+        return await asyncio.to_thread(self._page, page, pageSize, symbol)
+
+    def _open(self) -> sqlite3.Connection:
+        """Opens the database in WAL mode and creates the schema."""
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+
+        return connection
+
+    def _write(self, batch: list) -> None:
+        """Appends a batch of entries in a single transaction."""
+
+        with self._connection:
+            self._connection.executemany(f"INSERT INTO journal ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+
+        return
+
+    def _page(self, page: int, pageSize: int, symbol: str) -> list:
+        """Reads one page of entries with a separate connection, WAL lets it run next to the writer."""
+
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+
+        try:
+            if(symbol):
+                rows = connection.execute('SELECT * FROM journal WHERE symbol = ? ORDER BY time DESC LIMIT ? OFFSET ?', (symbol, pageSize, page * pageSize))
+            else:
+                rows = connection.execute('SELECT * FROM journal ORDER BY time DESC LIMIT ? OFFSET ?', (pageSize, page * pageSize))
+
+            entries = []
+
+            for row in rows:
+                entry = dict(row)
+
+                for column in ['trade', 'sizing', 'orders', 'timings']:
+                    entry[column] = json.loads(entry[column]) if entry[column] else None
+
+                entries.append(entry)
+
+        finally:
+            connection.close()
+
+        return entries
+
+    async def _run(self) -> None:
+        """Writes queued entries in batches until the None sentinel is queued by close()."""
+
+        closing = False
+
+        while not closing:
+            entry = await self._queue.get()
+            batch = [] if entry is None else [entry]
+            closing = entry is None
+            deadline = time.monotonic() + self.flushInterval
+
+            # collects more entries for a short while so that bursts are written in one transaction
+            while not closing and len(batch) < self.batchSize:
+                remaining = deadline - time.monotonic()
+
+                if(remaining <= 0):
+                    break
+
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+                if(entry is None):
+                    closing = True
+                else:
+                    batch.append(entry)
+
+            if(not(batch)):
+                continue
+
+            try:
+                await asyncio.to_thread(self._write, batch)
+
+            except Exception as error:
+                logger.error(f'Could not write {len(batch)} journal entries: {error}')
+
+
+def Serialize(value) -> str:
+    """Serializes a value to JSON, converting exceptions and other objects to strings.
+
+    Arguments:
+        value: value to serialize
+
+    Returns:
+        the JSON text, or None if the value is None
+    """
+
+    if(value is None):
+        return None
+
+    return json.dumps(value, default=str)
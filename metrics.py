@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Rolling window of the latest latencies of one stage, in milliseconds."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, milliseconds: float) -> None:
+        """Adds a latency to the window and to the lifetime count and sum.
+
+        Arguments:
+            milliseconds: latency of the stage
+        """
+
+        self.values.append(milliseconds)
+        self.count += 1
+        self.sum += milliseconds
+
+        return
+
+    def percentiles(self, quantiles: tuple = QUANTILES) -> list:
+        """Returns the nearest-rank percentiles of the window.
+
+        Arguments:
+            quantiles: quantiles between 0 and 1
+
+        Returns:
+            one latency per quantile, or None for each quantile if nothing was observed yet
+        """
+
+        if(not(self.values)):
+            return [None for quantile in quantiles]
+
+        values = sorted(self.values)
+
+        return [values[min(len(values) - 1, int(quantile * len(values)))] for quantile in quantiles]
+
+
+class LatencyMetrics:
+    """In-memory latency histograms of every stage of the signal to order path."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self.histograms = {}
+
+    def observe(self, stage: str, milliseconds: float) -> None:
+        """Records the latency of a stage.
+
+        Arguments:
+            stage: name of the stage, ex: Parse
+            milliseconds: latency of the stage
+        """
+
+        if(stage not in self.histograms):
+            self.histograms[stage] = LatencyHistogram(self.window)
+
+        self.histograms[stage].observe(milliseconds)
+
+        return
+
+    @contextmanager
+    def time(self, stage: str, timings: dict = None):
+        """Measures the block it wraps with a monotonic timer, ex: with METRICS.time('Parse'): ...
+
+        Arguments:
+            stage: name of the stage
+            timings: optional dictionary that also receives the latency of the stage
+        """
+
+        started = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            milliseconds = (time.perf_counter() - started) * 1000
+            self.observe(stage, milliseconds)
+
+            if(timings is not None):
+                timings[stage] = milliseconds
+
+    def summary(self) -> list:
+        """Returns one row per stage with its count and p50, p95 and p99 latencies."""
+
+        return [[stage, histogram.count] + histogram.percentiles() for stage, histogram in self.histograms.items()]
+
+    def prometheus(self) -> str:
+        """Formats the histograms as Prometheus summaries in the text exposition format."""
+
+        name = 'signal_copier_stage_latency_seconds'
+        lines = [f'# HELP {name} Latency of each stage of the signal to order path.', f'# TYPE {name} summary']
+
+        for stage, histogram in self.histograms.items():
+            for quantile, value in zip(QUANTILES, histogram.percentiles()):
+                if(value is not None):
+                    lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {value / 1000:.6f}')
+
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum / 1000:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Minimal HTTP server that exposes the latency histograms at /metrics for Prometheus to scrape.
+
+    With a readiness function, /ready answers 200 once it reports ready and 503 before, for readiness probes.
+    """
+
+    def __init__(self, metrics: LatencyMetrics, port: int, host: str = '0.0.0.0', readiness=None) -> None:
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.readiness = readiness
+
+        self._server = None
+
+    async def start(self) -> None:
+        """Starts listening on the metrics port."""
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f'Serving metrics on port {self.port}')
+
+        return
+
+    async def close(self) -> None:
+        """Stops listening on the metrics port."""
+
+        if(self._server is not None):
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        return
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers a single request and closes the connection."""
+
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            parts = request.decode('latin-1').split()
+
+            # drains the request headers
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+
+            path = parts[1].split('?')[0] if len(parts) >= 2 and parts[0] == 'GET' else None
+
+            if(path == '/metrics'):
+                status, body = '200 OK', self.metrics.prometheus()
+            elif(path == '/ready' and self.readiness is not None):
+                ready, body = self.readiness()
+                status = '200 OK' if ready else '503 Service Unavailable'
+            else:
+                status, body = '404 Not Found', 'Not Found\n'
+
+            body = body.encode()
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+            await writer.drain()
+
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+        finally:
+            writer.close()
+
+        return
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket that allows rate messages per second in bursts of up to burst messages."""
+
+    def __init__(self, rate: float, burst: float = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes a token and returns the seconds to wait before it may be used."""
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+        self.updated = now
+
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refill(self) -> float:
+        """Returns the seconds until the bucket is full again, 0 if it already is."""
+
+        return max(0.0, (self.burst - self.tokens) / self.rate - (time.monotonic() - self.updated))
+
+    async def acquire(self) -> None:
+        """Waits for a token."""
+
+        delay = self.reserve()
+
+        if(delay > 0):
+            await asyncio.sleep(delay)
+
+        return
+
+
+class OutboundQueue:
+    """Delivers outgoing Telegram messages in the background within Telegram's rate limits.
+
+    A message is any object with a deliver() coroutine that sends its latest text, ex: run.StatusMessage. Each
+    chat is drained by its own task that waits for the chat's and the global rate limit, so submitting never
+    waits for Telegram. A message that is submitted again before it was delivered keeps its place in the queue
+    and only its latest text is sent, which coalesces the bursts of updates of a trade. A chat is forgotten once its
+    queue is empty and its rate limit is back to a full burst, so that a new message would not be sent earlier
+    than if its state had been kept.
+    """
+
+    def __init__(self, rate: float = 30, chatRate: float = 1, chatBurst: float = 3, maxRetries: int = 5, maxBackoff: float = 30) -> None:
+        self.chatRate = chatRate
+        self.chatBurst = chatBurst
+        self.maxRetries = maxRetries
+        self.maxBackoff = maxBackoff
+
+        self._limiter = RateLimiter(rate, rate)
+        self._chats = {}
+
+    def submit(self, chat, message) -> None:
+        """Queues a message for delivery without blocking.
+
+        Arguments:
+            chat: id of the chat the message is sent to, which selects its rate limit
+            message: object with a deliver() coroutine
+        """
+
+        state = self._chats.get(chat)
+
+        if(state is None):
+            state = self._chats[chat] = {'Limiter': RateLimiter(self.chatRate, self.chatBurst), 'Pending': {}, 'Task': None}
+
+        # a dictionary keeps the order of the messages and holds each of them once
+        state['Pending'][message] = None
+
+        if(state['Task'] is None):
+            state['Task'] = asyncio.get_running_loop().create_task(self._drain(chat, state))
+
+        return
+
+    async def join(self, chat=None) -> None:
+        """Waits until the queued messages of a chat, or of every chat, are delivered.
+
+        Arguments:
+            chat: optional id of the chat to wait for
+        """
+
+        states = [self._chats[chat]] if chat in self._chats else [] if chat is not None else list(self._chats.values())
+
+        for state in states:
+            while(state['Task'] is not None):
+                await asyncio.shield(state['Task'])
+
+        return
+
+    async def close(self, timeout: float = 10) -> None:
+        """Delivers the queued messages for up to timeout seconds and drops the rest.
+
+        Arguments:
+            timeout: seconds to wait for the queued messages
+        """
+
+        tasks = [state['Task'] for state in self._chats.values() if state['Task'] is not None]
+
+        if(tasks):
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+            for task in pending:
+                task.cancel()
+
+            if(pending):
+                logger.warning(f'Dropped the queued messages of {len(pending)} chats on shutdown')
+
+        self._chats.clear()
+
+        return
+
+    async def _drain(self, chat, state: dict) -> None:
+        """Delivers the messages of one chat in order until none is left."""
+
+        try:
+            while(state['Pending']):
+                await state['Limiter'].acquire()
+                await self._limiter.acquire()
+
+                # takes the message only now so that the updates made while waiting are sent at once
+                message = next(iter(state['Pending']))
+                del state['Pending'][message]
+
+                await self._deliver(chat, message)
+
+        finally:
+            state['Task'] = None
+            self._evict(chat, state)
+
+        return
+
+    def _evict(self, chat, state: dict) -> None:
+        """Forgets an idle chat once its bucket is full, checking again later if it is not full yet."""
+
+        # the chat got new messages or was already replaced
+        if(self._chats.get(chat) is not state or state['Task'] is not None or state['Pending']):
+            return
+
+        delay = state['Limiter'].refill()
+
+        if(delay > 0):
+            asyncio.get_running_loop().call_later(delay, self._evict, chat, state)
+            return
+
+        del self._chats[chat]
+
+        return
+
+    async def _deliver(self, chat, message) -> None:
+        """Delivers one message, retrying rate limited and network errors with backoff."""
+
+        for attempt in range(self.maxRetries + 1):
+            try:
+                await message.deliver()
+                return
+
+            # Telegram tells how long the chat has to wait
+            except RetryAfter as error:
+                logger.warning(f'Rate limited in chat {chat}, retrying in {error.retry_after} s')
+                await asyncio.sleep(error.retry_after)
+
+            # a malformed message fails the same way every time
+            except BadRequest as error:
+                logger.error(f'Could not send message to chat {chat}: {error}')
+                return
+
+            except NetworkError as error:
+                delay = min(self.maxBackoff, 0.5 * 2 ** attempt)
+                logger.warning(f'Could not send message to chat {chat}, retrying in {delay:.1f} s: {error}')
+                await asyncio.sleep(delay)
+
+            except Exception as error:
+                logger.error(f'Could not send message to chat {chat}: {error}')
+                return
+
+        logger.error(f'Gave up sending message to chat {chat} after {self.maxRetries + 1} attempts')
+
+        return
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def Round(values, decimals: int):
+    """Rounds an array like round() does for each of its values.
+
+    np.round scales by a power of ten, which can move a value that is just below or above a half onto it, so the
+    values that end up near a half are rounded again with round(), which works on their exact binary value.
+    """
+
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+
+    if(ties.any()):
+        rounded[ties] = [round(float(value), decimals) for value in values[ties]]
+
+    return rounded
+
+
+def CalculateRisk(entry, stopLoss, takeProfits, pipSize, pipValue, balances, riskFactors, volumeStep=0.01, maxVolume=np.inf) -> dict:
+    """Sizes every signal for every balance and risk factor in one pass.
+
+    Follows the same rules as sizing.CalculateTradeInformation and ExecuteTrade in run.py: pips are rounded to whole
+    pips, the position size is rounded down to the volume step and capped at the maximum volume, and the position is
+    split evenly between the take profits.
+
+    Arguments:
+        entry: entry price of each signal, shape (S,)
+        stopLoss: stop loss price of each signal, shape (S,)
+        takeProfits: take profit prices of each signal, shape (S, T), padded with NaN when a signal has fewer than T
+        pipSize: pip size of each signal's symbol, shape (S,)
+        pipValue: value of one pip for one lot of each signal's symbol in the account currency, shape (S,)
+        balances: account balances to size the signals for, shape (B,)
+        riskFactors: risk factors to size the signals with, shape (R,)
+        volumeStep: volume step of each signal's symbol, scalar or shape (S,)
+        maxVolume: maximum volume of each signal's symbol, scalar or shape (S,)
+
+    Returns:
+        a dictionary of arrays: StopLossPips (S,), TakeProfitPips (S, T), PositionSize (S, B, R), Loss (S, B, R),
+        Profit (S, B, R, T) with NaN for missing take profits and TotalProfit (S, B, R)
+    """
+
+    entry = np.asarray(entry, dtype=float)
+    stopLoss = np.asarray(stopLoss, dtype=float)
+    takeProfits = np.atleast_2d(np.asarray(takeProfits, dtype=float))
+    pipSize = np.asarray(pipSize, dtype=float)
+    pipValue = np.asarray(pipValue, dtype=float)
+    balances = np.asarray(balances, dtype=float)
+    riskFactors = np.asarray(riskFactors, dtype=float)
+    volumeStep = np.broadcast_to(np.asarray(volumeStep, dtype=float), entry.shape)
+    maxVolume = np.broadcast_to(np.asarray(maxVolume, dtype=float), entry.shape)
+
+    # calculates the stop loss and take profits in pips, rounded half to even like round()
+    stopLossPips = np.abs(np.round((stopLoss - entry) / pipSize))
+    takeProfitPips = np.abs(np.round((takeProfits - entry[:, None]) / pipSize[:, None]))
+
+    # amount at risk for every balance and risk factor, shape (S, B, R)
+    risk = (balances[:, None] * riskFactors[None, :])[None, :, :]
+    positionSize = risk / (stopLossPips * pipValue)[:, None, None]
+
+    # rounds down to the volume step, the small epsilon matches RoundVolume
+    step = volumeStep[:, None, None]
+    positionSize = Round(np.floor(positionSize / step + 1e-9) * step, 8)
+    positionSize = np.minimum(positionSize, maxVolume[:, None, None])
+
+    pipAmount = positionSize * pipValue[:, None, None]
+    loss = Round(pipAmount * stopLossPips[:, None, None], 2)
+
+    # the position is split evenly between the take profits of each signal
+    legs = np.count_nonzero(~np.isnan(takeProfits), axis=1)
+    profit = Round((pipAmount * (1 / legs)[:, None, None])[..., None] * takeProfitPips[:, None, None, :], 2)
+
+    return {
+        'StopLossPips': stopLossPips,
+        'TakeProfitPips': takeProfitPips,
+        'PositionSize': positionSize,
+        'Loss': loss,
+        'Profit': profit,
+        'TotalProfit': np.nansum(profit, axis=-1)
+    }
+
+
+def CalculateTradesRisk(trades: list, balances, riskFactors, specifications: list, pipValues) -> dict:
+    """Sizes parsed trades for every balance and risk factor, ex: to tune RISK_FACTOR over historical signals.
+
+    Arguments:
+        trades: list of trades returned by ParseSignal, with a numeric entry price
+        balances: account balances to size the trades for
+        riskFactors: risk factors to size the trades with
+        specifications: symbol specification of each trade, with its pipSize
+        pipValues: value of one pip for one lot of each trade in the account currency
+
+    Returns:
+        the dictionary of arrays returned by CalculateRisk
+    """
+
+    takeProfits = np.full((len(trades), max(len(trade['TP']) for trade in trades)), np.nan)
+
+    for row, trade in enumerate(trades):
+        takeProfits[row, :len(trade['TP'])] = trade['TP']
+
+    return CalculateRisk(
+        [trade['Entry'] for trade in trades],
+        [trade['StopLoss'] for trade in trades],
+        takeProfits,
+        [specification['pipSize'] for specification in specifications],
+        pipValues,
+        balances,
+        riskFactors,
+        [specification.get('volumeStep') or 0.01 for specification in specifications],
+        [specification.get('maxVolume') or np.inf for specification in specifications]
+    )
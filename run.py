@@ -1,442 +1,2755 @@
 #!/usr/bin/env python3
 import asyncio
+import datetime
+import hashlib
+import html
+import json
 import logging
-import math
 import os
+import re
+import secrets
+import socket
+import time
+from functools import lru_cache
+
+# the boot time of the bot is measured from here, the imports below take most of a cold start
+BOOT_STARTED = time.perf_counter()
+
+from cachetools import TTLCache
+from config import ConfigError, ConfigWatcher, LoadConfig
+from journal import TradeJournal
+from metrics import LatencyMetrics, MetricsServer
+from notifier import OutboundQueue
+from signals import LABEL_PATTERN, SIGNAL_LABELS, ParseSignal, ParseSignals, Trade
+from sizing import CalculateTradeInformation, PipSize, PipValue, RoundVolume
+from state import OpenStateStore
+from metaapi_cloud_sdk import MetaApi, SynchronizationListener
+from metaapi_cloud_sdk.clients.metaApi.notConnectedException import NotConnectedException
+from metaapi_cloud_sdk.clients.timeoutException import TimeoutException
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.ext import Application, ApplicationHandlerStop, CommandHandler, ContextTypes, ConversationHandler, MessageHandler, filters
+from wcwidth import wcswidth
+
+# milliseconds spent importing the dependencies, NumPy is only imported by the commands that use it
+IMPORT_TIME = (time.perf_counter() - BOOT_STARTED) * 1000
 
-from metaapi_cloud_sdk import MetaApi
-from prettytable import PrettyTable
-from telegram import ParseMode, Update
-from telegram.ext import CommandHandler, Filters, MessageHandler, Updater, ConversationHandler, CallbackContext
+# MetaAPI Credentials
+API_KEY = os.environ.get("API_KEY")
+
+# Telegram Credentials
+TOKEN = os.environ.get("TOKEN")
+
+# Heroku Credentials
+APP_URL = os.environ.get("APP_URL")
+
+# Port number for Telegram bot web hook
+PORT = int(os.environ.get('PORT', '8443'))
+
+# MetaAPI connection settings (in seconds)
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', '30'))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', '10'))
+RECONNECT_MAX_DELAY = float(os.environ.get('RECONNECT_MAX_DELAY', '60'))
+CONNECTION_TIMEOUT = float(os.environ.get('CONNECTION_TIMEOUT', '300'))
+
+# symbol specification cache settings, the file is used when the broker's specification is unavailable
+SYMBOLS_FILE = os.environ.get('SYMBOLS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbols.json'))
+SPECIFICATION_TTL = float(os.environ.get('SPECIFICATION_TTL', '21600'))
+SPECIFICATION_CACHE_SIZE = int(os.environ.get('SPECIFICATION_CACHE_SIZE', '256'))
+
+# maximum age of a streamed quote, in seconds, before trades on its symbol are refused
+QUOTE_MAX_AGE = float(os.environ.get('QUOTE_MAX_AGE', '10'))
+
+# seconds an order approved by the risk guard is counted at most while it does not appear in the streamed orders and positions
+RISK_RESERVATION_TTL = float(os.environ.get('RISK_RESERVATION_TTL', '60'))
+
+# optional JSON file with the settings that can be changed while the bot runs, checked for changes every CONFIG_POLL_INTERVAL seconds (0 disables it)
+CONFIG_FILE = os.environ.get('CONFIG_FILE', 'config.json')
+CONFIG_POLL_INTERVAL = float(os.environ.get('CONFIG_POLL_INTERVAL', '5'))
+
+
+# Enables logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.info(f'Imported dependencies in {IMPORT_TIME:.0f} ms')
+
+# possibles states for conversation handler
+CALCULATE, TRADE, DECISION = range(3)
+
+# users, accounts, risk factors, symbols and trading rules, read from the environment and CONFIG_FILE, checked when
+# the bot starts so that the module can be imported without them. Reloading swaps in a new Config object
+CONFIG = LoadConfig(CONFIG_FILE, validate=False)
+
+# MetaAPI order functions for each order type
+ORDER_FUNCTIONS = {
+    'Buy': 'create_market_buy_order',
+    'Buy Limit': 'create_limit_buy_order',
+    'Buy Stop': 'create_stop_buy_order',
+    'Sell': 'create_market_sell_order',
+    'Sell Limit': 'create_limit_sell_order',
+    'Sell Stop': 'create_stop_sell_order'
+}
+
+# maximum number of trades whose MetaApi calls run at the same time, across every account. A slot is only held during
+# the calls, so a trade that waits for a connection, a reply or another instance does not hold up the others
+FANOUT_CONCURRENCY = int(os.environ.get("FANOUT_CONCURRENCY", "4"))
+FANOUT_LIMIT = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+# Channel Copier: chats (ids or @usernames) whose signals are copied without the /trade conversation
+SOURCE_CHATS = [chat.strip() for chat in os.environ.get("SOURCE_CHATS", "").split(',') if chat.strip()]
+
+# seconds during which a signal with the same symbol, side, entry, stop loss and take profits is not placed again
+DEDUPE_WINDOW = float(os.environ.get("DEDUPE_WINDOW", "300"))
+
+# seconds during which a reply to a copied signal can still close it or move its stop loss
+SIGNAL_MESSAGE_TTL = float(os.environ.get("SIGNAL_MESSAGE_TTL", "604800"))
+
+# SQLite file shared by the instances of the bot on one host for conversations, pending trades, dedupe keys and account leases (default: process memory)
+STATE_STORE = os.environ.get("STATE_STORE", "")
+
+# name of this instance in the account leases, seconds a lease is held without being renewed and seconds an idle conversation is kept
+INSTANCE_ID = os.environ.get("INSTANCE_ID") or f"{os.environ.get('DYNO') or socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = float(os.environ.get("LEASE_TTL", "15"))
+CONVERSATION_TIMEOUT = float(os.environ.get("CONVERSATION_TIMEOUT", "3600"))
+
+# seconds a trade handed to the instance that holds the account's lease waits for its orders, and seconds between checks for handed trades
+HANDOFF_TIMEOUT = float(os.environ.get("HANDOFF_TIMEOUT", "60"))
+HANDOFF_POLL_INTERVAL = float(os.environ.get("HANDOFF_POLL_INTERVAL", "0.05"))
+
+# seconds to wait for each order and number of times an order that never reached the broker is sent again
+ORDER_TIMEOUT = float(os.environ.get("ORDER_TIMEOUT", "10"))
+ORDER_RETRIES = int(os.environ.get("ORDER_RETRIES", "2"))
+
+# seconds during which an order whose response was lost is looked up by its client id, and seconds between lookups
+ORDER_SETTLE_TIMEOUT = float(os.environ.get("ORDER_SETTLE_TIMEOUT", "30"))
+ORDER_SETTLE_INTERVAL = float(os.environ.get("ORDER_SETTLE_INTERVAL", "1"))
+
+# broker result codes of orders that were not executed and can be sent again
+RETRYABLE_CODES = frozenset(['TRADE_RETCODE_TIMEOUT', 'TRADE_RETCODE_CONNECTION', 'TRADE_RETCODE_TOO_MANY_REQUESTS'])
+
+# client ids of the bot's orders: the trade's client id, T and the number of the take profit
+CLIENT_ID_PATTERN = re.compile(r'([0-9a-f]{10})T(\d+)')
+
+# messages of the source chats that close a copied trade or move its stop loss to the entry when replying to its signal,
+# the whole message has to be the command, ex: "Close", "close all!" or "Move SL to breakeven", so that a remark such as
+# "Do not close yet" is not taken for one
+PROVIDER_COMMAND_PATTERN = re.compile(r'\s*(close|(?:move\s+(?:sl|stop\s*loss)\s+to\s+)?break\s*even)(?:\s+(?:all|now))?\s*[.!]*\s*', re.IGNORECASE)
+
+# SQLite file of the trade journal and number of trades per /history page
+JOURNAL_FILE = os.environ.get("JOURNAL_FILE", "journal.db")
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "10"))
+
+# number of latest latencies kept per stage and optional port of the Prometheus metrics endpoint
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "1000"))
+METRICS_PORT = os.environ.get("METRICS_PORT")
+
+# maximum number of rows of a /whatif table
+WHATIF_MAX_ROWS = int(os.environ.get("WHATIF_MAX_ROWS", "40"))
+
+# messages per second sent to Telegram overall and to each chat, with short bursts allowed in a chat
+TELEGRAM_RATE_LIMIT = float(os.environ.get("TELEGRAM_RATE_LIMIT", "30"))
+TELEGRAM_CHAT_RATE_LIMIT = float(os.environ.get("TELEGRAM_CHAT_RATE_LIMIT", "1"))
+TELEGRAM_CHAT_BURST = float(os.environ.get("TELEGRAM_CHAT_BURST", "3"))
+
+
+# Symbol Specifications
+class SymbolSpecificationCache:
+    """Caches the broker's symbol specifications (digits, pip size, contract size and volume limits).
+
+    Each symbol is loaded with get_symbol_specification once and kept for SPECIFICATION_TTL seconds, with the
+    least recently used symbols evicted past SPECIFICATION_CACHE_SIZE entries. When the broker cannot be reached,
+    the specification is read from SYMBOLS_FILE instead.
+    """
+
+    def __init__(self, ttl: float = SPECIFICATION_TTL, maxsize: int = SPECIFICATION_CACHE_SIZE, fallbackFile: str = SYMBOLS_FILE, aliases: dict = None) -> None:
+        self.aliases = aliases or {}
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loading = {}
+        self._fallback = {}
+
+        if(fallbackFile and os.path.exists(fallbackFile)):
+            with open(fallbackFile) as file:
+                self._fallback = json.load(file)
+
+    async def get(self, connection, symbol: str) -> dict:
+        """Returns the specification of a symbol, loading it from the broker on a cache miss.
+
+        Arguments:
+            connection: MetaAPI RPC connection, or None to only use the fallback file
+            symbol: symbol to get the specification for
+
+        Returns:
+            the symbol specification including its pip size
+        """
+
+        specification = self._cache.get(symbol)
+
+        if(specification is not None):
+            return specification
+
+        # concurrent misses of the same symbol share a single request
+        if(symbol not in self._loading):
+            self._loading[symbol] = asyncio.ensure_future(self._load(connection, symbol))
+
+        try:
+            return await asyncio.shield(self._loading[symbol])
+
+        finally:
+            self._loading.pop(symbol, None)
+
+    def put(self, specification: dict) -> dict:
+        """Stores a specification received from the broker.
+
+        Arguments:
+            specification: MetaAPI symbol specification
+
+        Returns:
+            the stored specification including its pip size
+        """
+
+        specification = dict(specification)
+        fallback = self._fallback.get(self.aliases.get(specification['symbol'], specification['symbol']), {})
+
+        # pip size conventions of metals differ between brokers, so the file's pip size takes precedence
+        if('pipSize' in fallback):
+            specification['pipSize'] = fallback['pipSize']
+
+        specification['pipSize'] = PipSize(specification)
+        self._cache[specification['symbol']] = specification
+
+        return specification
+
+    async def _load(self, connection, symbol: str) -> dict:
+        """Loads a specification from the broker, falling back to the symbol file."""
+
+        try:
+            if(connection is None):
+                raise Exception('no MetaTrader connection')
+
+            specification = await connection.get_symbol_specification(symbol)
+
+        except Exception as error:
+            fallbackSymbol = self.aliases.get(symbol, symbol)
+
+            if(fallbackSymbol not in self._fallback):
+                raise Exception(f'No specification available for {symbol}: {error}')
+
+            logger.warning(f'Using {SYMBOLS_FILE} specification for {symbol}: {error}')
+            specification = dict(self._fallback[fallbackSymbol], symbol=symbol)
+
+        return self.put(specification)
+
+    def peek(self, symbol: str) -> dict:
+        """Returns the cached specification of a symbol without loading it, or None.
+
+        Arguments:
+            symbol: symbol to get the specification for
+        """
+
+        return self._cache.get(symbol)
+
+
+# Market Data
+class MarketDataCache(SynchronizationListener):
+    """Keeps the latest quotes and account information in memory, fed by a MetaAPI streaming connection.
+
+    Quotes are timestamped on arrival so that trades are refused when the quote of their symbol is older than
+    QUOTE_MAX_AGE seconds. Symbols without a streamed quote and a missing account state fall back to the RPC
+    connection.
+    """
+
+    def __init__(self, specifications: SymbolSpecificationCache, symbols: frozenset) -> None:
+        super().__init__()
+        self.specifications = specifications
+        self.symbols = symbols
+        self.quotes = {}
+        self.accountInformation = None
+
+    def age(self, symbol: str) -> float:
+        """Returns the age of the latest quote of a symbol in seconds, or None if no quote was received.
+
+        Arguments:
+            symbol: symbol of the quote
+        """
+
+        if(symbol not in self.quotes):
+            return None
+
+        return time.monotonic() - self.quotes[symbol][1]
+
+    async def get_price(self, connection, symbol: str, maxAge: float = QUOTE_MAX_AGE) -> dict:
+        """Returns the latest price of a symbol.
+
+        Arguments:
+            connection: MetaAPI RPC connection used for symbols that are not streamed
+            symbol: symbol to get the price for
+            maxAge: maximum age of the quote in seconds
+
+        Returns:
+            the latest MetaAPI symbol price
+        """
+
+        age = self.age(symbol)
+
+        if(age is None):
+            return await connection.get_symbol_price(symbol=symbol)
+
+        if(age > maxAge):
+            raise Exception(f'Quote for {symbol} is {age:.1f} s old (limit {maxAge:.0f} s), refusing to size trade')
+
+        return self.quotes[symbol][0]
+
+    async def get_account_information(self, connection) -> dict:
+        """Returns the latest account information, fetching it with the RPC connection until it has been streamed.
+
+        Arguments:
+            connection: MetaAPI RPC connection
+        """
+
+        if(self.accountInformation is None):
+            self.accountInformation = await connection.get_account_information()
+
+        return self.accountInformation
+
+    def status(self) -> str:
+        """Returns a human readable summary of the cached quotes."""
+
+        if(not(self.quotes)):
+            return 'Quotes: none received'
+
+        ages = {symbol: self.age(symbol) for symbol in self.quotes}
+        oldest = max(ages, key=ages.get)
+
+        return f'Quotes: {len(ages)} symbols, oldest {oldest} ({ages[oldest]:.1f} s)'
+
+    async def on_account_information_updated(self, instance_index: str, account_information: dict):
+        self.accountInformation = account_information
+
+    async def on_symbol_price_updated(self, instance_index: str, price: dict):
+        self.quotes[price['symbol']] = (price, time.monotonic())
+
+    async def on_symbol_prices_updated(self, instance_index: str, prices: list, equity: float = None, margin: float = None,
+                                       free_margin: float = None, margin_level: float = None, account_currency_exchange_rate: float = None):
+        # price packets also carry the account's equity and margin
+        if(self.accountInformation is not None and equity is not None):
+            self.accountInformation = {**self.accountInformation, 'equity': equity, 'margin': margin, 'freeMargin': free_margin, 'marginLevel': margin_level}
+
+    async def on_symbol_specifications_updated(self, instance_index: str, specifications: list, removed_symbols: list):
+        for specification in specifications:
+            if(specification['symbol'] in self.symbols):
+                self.specifications.put(specification)
+
+
+# Position Management
+def SplitClientId(clientId: str) -> tuple:
+    """Returns the trade's client id and the take profit number of an order placed by the bot.
+
+    Arguments:
+        clientId: client id of an order or position
+
+    Returns:
+        a tuple of the trade's client id and the take profit number, or (None, None) for other orders
+    """
+
+    match = CLIENT_ID_PATTERN.fullmatch(clientId or '')
+
+    if(match is None):
+        return None, None
+
+    return match.group(1), int(match.group(2))
+
+class PositionManager(SynchronizationListener):
+    """Indexes the pending orders and positions of one account by the trade they were placed for and manages them.
+
+    The orders of a trade carry its client id, so the streamed orders and positions are grouped by trade, also
+    after a restart. Every price update is checked against the trades of its symbol in memory: the stop loss of
+    the other take profits is moved to their entry once TP 1 is reached (breakevenAtTp1) and trailed
+    trailingStopPips behind the price, and an RPC call is only made when a stop loss has to change.
+    """
+
+    def __init__(self, manager) -> None:
+        super().__init__()
+        self.manager = manager
+        self.orders = {}
+        self.positions = {}
+        self.trades = {}
+        self._modifying = set()
+        self._tasks = set()
+
+    def find(self, key: str) -> tuple:
+        """Returns the positions and pending orders of a trade, or of every trade of a symbol.
+
+        Arguments:
+            key: client id of the trade, or a symbol
+
+        Returns:
+            a tuple of the list of positions and the list of pending orders
+        """
+
+        if(key in self.trades):
+            trade = self.trades[key]
+            return [self.positions[itemId] for itemId in trade['Positions']], [self.orders[itemId] for itemId in trade['Orders']]
+
+        # only the bot's trades are managed by symbol
+        symbol = self.manager.symbols.get(key.upper(), key.upper())
+        trades = [trade for trade in self.trades.values() if trade['Symbol'] == symbol]
+
+        return [self.positions[itemId] for trade in trades for itemId in trade['Positions']], [self.orders[itemId] for trade in trades for itemId in trade['Orders']]
+
+    async def close(self, key: str) -> list:
+        """Closes the positions and cancels the pending orders of a trade or symbol.
+
+        Arguments:
+            key: client id of the trade, or a symbol
+
+        Returns:
+            a list with the outcome of each request
+        """
+
+        positions, orders = self.find(key)
+        connection = await self.manager.get_connection()
+
+        return await self._request(positions + orders, [connection.close_position(position['id']) for position in positions] +
+                                   [connection.cancel_order(order['id']) for order in orders])
+
+    async def modify(self, key: str, stopLoss: float = None, takeProfit: float = None) -> list:
+        """Changes the stop loss and/or take profit of the positions and pending orders of a trade or symbol.
+
+        Arguments:
+            key: client id of the trade, or a symbol
+            stopLoss: new stop loss, or None to keep it
+            takeProfit: new take profit, or None to keep it
+
+        Returns:
+            a list with the outcome of each request
+        """
+
+        positions, orders = self.find(key)
+        connection = await self.manager.get_connection()
+
+        # a value of 0 is a change too, only None keeps the current one
+        requests = [connection.modify_position(position['id'], stopLoss if stopLoss is not None else position.get('stopLoss'),
+                                               takeProfit if takeProfit is not None else position.get('takeProfit')) for position in positions]
+        requests += [connection.modify_order(order['id'], order['openPrice'], stopLoss if stopLoss is not None else order.get('stopLoss'),
+                                             takeProfit if takeProfit is not None else order.get('takeProfit')) for order in orders]
+
+        return await self._request(positions + orders, requests)
+
+    async def breakeven(self, key: str) -> list:
+        """Moves the stop loss of the positions of a trade or symbol to their entry.
+
+        Arguments:
+            key: client id of the trade, or a symbol
+
+        Returns:
+            a list with the outcome of each request
+        """
+
+        positions, orders = self.find(key)
+        connection = await self.manager.get_connection()
+
+        return await self._request(positions, [connection.modify_position(position['id'], position['openPrice'], position.get('takeProfit')) for position in positions])
+
+    async def _request(self, items: list, requests: list) -> list:
+        """Sends the requests of several orders or positions at the same time."""
+
+        responses = await asyncio.gather(*requests, return_exceptions=True)
+
+        return [{'Id': item['id'], 'Symbol': item['symbol'], 'Error': response if isinstance(response, Exception) else None} for item, response in zip(items, responses)]
+
+    def _add(self, kind: str, collection: dict, item: dict) -> None:
+        """Stores a streamed order or position and indexes it by its trade."""
+
+        collection[item['id']] = item
+        tradeId, leg = SplitClientId(item.get('clientId'))
+
+        if(tradeId is None):
+            return
+
+        if(tradeId not in self.trades):
+            self.trades[tradeId] = {'Symbol': item['symbol'], 'Buy': 'BUY' in item['type'], 'TP1': None, 'Breakeven': False, 'Orders': set(), 'Positions': set()}
+
+        trade = self.trades[tradeId]
+        trade[kind].add(item['id'])
+
+        # TP 1 is remembered for the breakeven rule after its position has been closed
+        if(leg == 1 and item.get('takeProfit')):
+            trade['TP1'] = item['takeProfit']
+
+        return
+
+    def _remove(self, kind: str, collection: dict, itemId: str) -> None:
+        """Forgets a closed position or a filled or cancelled order, and the trade once nothing of it is left."""
+
+        item = collection.pop(itemId, None)
+
+        if(item is None):
+            return
+
+        tradeId, leg = SplitClientId(item.get('clientId'))
+        trade = self.trades.get(tradeId)
+
+        if(trade is not None):
+            trade[kind].discard(itemId)
+
+            if(not(trade['Orders']) and not(trade['Positions'])):
+                del self.trades[tradeId]
+
+        return
+
+    def _replace(self, kind: str, collection: dict, items: list) -> None:
+        """Replaces every order or position after a synchronization."""
+
+        # TP 1 and the breakeven state outlive the rebuilt trades, the position of TP 1 may already be closed
+        trades = {tradeId: (trade['TP1'], trade['Breakeven']) for tradeId, trade in self.trades.items()}
+
+        for itemId in list(collection):
+            self._remove(kind, collection, itemId)
+
+        for item in items:
+            self._add(kind, collection, item)
+
+        for tradeId, (takeProfit, breakeven) in trades.items():
+            trade = self.trades.get(tradeId)
+
+            if(trade is not None):
+                trade['TP1'] = trade['TP1'] if trade['TP1'] is not None else takeProfit
+                trade['Breakeven'] = trade['Breakeven'] or breakeven
+
+        return
+
+    def _evaluate(self, price: dict) -> None:
+        """Applies the breakeven and trailing stop rules to the trades of a symbol."""
+
+        # only the instance that holds the account's lease manages the trades
+        if(not(self.manager.leader)):
+            return
+
+        config = CONFIG
+        specification = self.manager.specifications.peek(price['symbol'])
+
+        for tradeId, trade in self.trades.items():
+            if(trade['Symbol'] != price['symbol'] or not(trade['Positions'])):
+                continue
+
+            # a buy closes at the bid and a sell at the ask
+            direction = 1 if trade['Buy'] else -1
+            current = price['bid'] if trade['Buy'] else price['ask']
+            positions = [self.positions[itemId] for itemId in trade['Positions']]
+
+            # moves the stop loss of the other take profits to their entry once TP 1 is reached, the trade is done once
+            # every move succeeded and failed ones are sent again on the next price
+            if(config.breakevenAtTp1 and not(trade['Breakeven']) and trade['TP1'] is not None and (current - trade['TP1']) * direction >= 0):
+                moves = [position for position in positions if SplitClientId(position['clientId'])[1] != 1 and
+                         (position.get('stopLoss') is None or (position['openPrice'] - position['stopLoss']) * direction > 0)]
+
+                for position in moves:
+                    self._modify(position, position['openPrice'])
+
+                trade['Breakeven'] = not(moves)
+
+            # trails the stop loss behind the price once the position is trailingStopPips in profit
+            if(config.trailingStopPips > 0 and specification is not None):
+                stopLoss = round(current - direction * config.trailingStopPips * specification['pipSize'], specification['digits'])
+                step = config.trailingStepPips * specification['pipSize']
+
+                for position in positions:
+                    if((stopLoss - position['openPrice']) * direction >= 0 and (position.get('stopLoss') is None or (stopLoss - position['stopLoss']) * direction >= step)):
+                        self._modify(position, stopLoss)
+
+        return
+
+    def _modify(self, position: dict, stopLoss: float) -> None:
+        """Moves the stop loss of a position in the background, once at a time per position."""
+
+        # only the instance that holds the account's lease moves stop losses, so that two instances never modify the same position
+        if(position['id'] in self._modifying or not(self.manager.leader)):
+            return
+
+        self._modifying.add(position['id'])
+        task = asyncio.get_running_loop().create_task(self._modifyStopLoss(position, stopLoss))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return
+
+    async def _modifyStopLoss(self, position: dict, stopLoss: float) -> None:
+        """Sends the new stop loss of a position."""
+
+        try:
+            connection = await self.manager.get_connection()
+            position = self.positions.get(position['id'], position)
+            await connection.modify_position(position['id'], stopLoss, position.get('takeProfit'))
+
+            # the streamed update follows, until then the new stop loss prevents sending it again
+            self.positions.get(position['id'], position)['stopLoss'] = stopLoss
+            logger.info(f"{self.manager.account['name']} moved stop loss of position {position['id']} {position['symbol']} to {stopLoss}")
+
+        except Exception as error:
+            logger.error(f"{self.manager.account['name']} could not move stop loss of position {position['id']}: {error}")
+
+        finally:
+            self._modifying.discard(position['id'])
+
+        return
+
+    def status(self) -> str:
+        """Returns a human readable summary of the managed trades."""
+
+        return f'Managed trades: {len(self.trades)} ({sum(len(trade["Positions"]) for trade in self.trades.values())} positions, {sum(len(trade["Orders"]) for trade in self.trades.values())} pending orders)'
+
+    async def on_positions_replaced(self, instance_index: str, positions: list):
+        self._replace('Positions', self.positions, positions)
+
+    async def on_position_updated(self, instance_index: str, position: dict):
+        self._add('Positions', self.positions, position)
+
+    async def on_position_removed(self, instance_index: str, position_id: str):
+        self._remove('Positions', self.positions, position_id)
+
+    async def on_pending_orders_replaced(self, instance_index: str, orders: list):
+        self._replace('Orders', self.orders, orders)
+
+    async def on_pending_order_updated(self, instance_index: str, order: dict):
+        self._add('Orders', self.orders, order)
+
+    async def on_pending_order_completed(self, instance_index: str, order_id: str):
+        self._remove('Orders', self.orders, order_id)
+
+    async def on_symbol_prices_updated(self, instance_index: str, prices: list, equity: float = None, margin: float = None,
+                                       free_margin: float = None, margin_level: float = None, account_currency_exchange_rate: float = None):
+        if((CONFIG.breakevenAtTp1 or CONFIG.trailingStopPips > 0) and self.trades):
+            for price in prices:
+                self._evaluate(price)
+
+
+# Risk Guard
+def SymbolCurrencies(specification: dict) -> tuple:
+    """Returns the base and quote currency of a symbol, ex: ('EUR', 'USD') for EURUSD.
+
+    Arguments:
+        specification: symbol specification
+
+    Returns:
+        a tuple of the base and the quote currency
+    """
+
+    symbol = specification['symbol']
+
+    return specification.get('baseCurrency') or symbol[:3], specification.get('profitCurrency') or symbol[3:6]
+
+class RiskGuard(SynchronizationListener):
+    """Keeps the open risk of one account per symbol and per currency and limits the size of new trades by it.
+
+    The risk of a position or pending order is its loss at the stop loss in the account currency. A buy adds its
+    risk to the base currency and subtracts it from the quote currency and a sell the other way round, so EURUSD
+    and GBPUSD buys add up against the dollar while a USDCHF buy offsets them. Every streamed event only applies
+    the difference it makes to the totals, and check() only reads the totals of the trade's symbol and currencies,
+    so a signal is checked in the same time however many positions are open.
+
+    check() reserves the risk of every order of a trade it approves in the same step, so that concurrent signals
+    see it. A reservation lasts until the order is streamed with its client id, the order fails, or
+    RISK_RESERVATION_TTL seconds pass.
+    """
+
+    def __init__(self, manager) -> None:
+        super().__init__()
+        self.manager = manager
+        self.items = {}
+        self.unpriced = {}
+        self.symbolRisk = {}
+        self.currencyRisk = {}
+        self.openRisk = 0.0
+        self.day = None
+        self.dayBalance = None
+        self.reserved = {}
+        self._loading = set()
+        self._tasks = set()
+
+    def check(self, trade: Trade, stopLossPips: int, accountInformation: dict, specification: dict, reserve: bool = False) -> str:
+        """Scales a sized trade down to the largest volume that stays within every limit.
+
+        Arguments:
+            trade: dictionary that stores the sized trade information
+            stopLossPips: the difference in pips from stop loss price to entry price
+            accountInformation: MetaAPI account information
+            specification: symbol specification
+            reserve: whether the trade will be placed, its orders are then counted at once and the caller releases
+                the ones that are not placed with release()
+
+        Returns:
+            the limit the position size was reduced for, or None if the trade is within every limit
+        """
+
+        config = CONFIG
+        self._expire()
+        balance = accountInformation['balance']
+        equity = accountInformation.get('equity') or balance
+        dailyLoss = self.dailyLoss(accountInformation)
+        base, quote = SymbolCurrencies(specification)
+        direction = 1 if trade['OrderType'].startswith('Buy') else -1
+        riskPerLot = stopLossPips * trade['PipValue']
+
+        # risk that may still be added before each limit is reached
+        headroom = {}
+
+        if(config.maxOpenRisk > 0):
+            headroom['open risk'] = config.maxOpenRisk * balance - self.openRisk
+
+        if(config.maxSymbolRisk > 0):
+            headroom[f"{trade['Symbol']} risk"] = config.maxSymbolRisk * balance - self.symbolRisk.get(trade['Symbol'], 0.0)
+
+        # a buy adds to the base currency and reduces the quote currency, which may already be held the other way
+        if(config.maxCurrencyRisk > 0):
+            headroom[f'{base} risk'] = config.maxCurrencyRisk * balance - direction * self.currencyRisk.get(base, 0.0)
+            headroom[f'{quote} risk'] = config.maxCurrencyRisk * balance + direction * self.currencyRisk.get(quote, 0.0)
+
+        # the loss of the trade at its stop loss has to fit into what is left of the day's loss limit
+        if(config.maxDailyLoss > 0):
+            headroom['daily loss'] = config.maxDailyLoss * self.dayBalance - dailyLoss
+
+        lots = {limit: risk / riskPerLot for limit, risk in headroom.items()}
+
+        # the margin of one lot is its contract value in the account currency divided by the leverage
+        if(config.maxMarginUsage > 0 and accountInformation.get('leverage')):
+            marginPerLot = trade['Entry'] * trade['PipValue'] / trade['PipSize'] / accountInformation['leverage']
+            lots['margin'] = (config.maxMarginUsage * equity - (accountInformation.get('margin') or 0)) / marginPerLot
+
+        limit = min(lots, key=lots.get) if lots else None
+
+        if(limit is None or lots[limit] >= trade['PositionSize']):
+            if(reserve):
+                self.reserve(trade, specification)
+
+            return None
+
+        volume = RoundVolume(max(lots[limit], 0), trade['VolumeStep'])
+
+        # every take profit needs at least the smallest volume
+        if(volume < (specification.get('minVolume') or trade['VolumeStep']) * len(trade['TP'])):
+            raise Exception(f"Risk guard: the {limit} limit of {self.manager.account['name']} is reached, trade rejected")
+
+        logger.info(f"{self.manager.account['name']} risk guard reduced {trade['Symbol']} from {trade['PositionSize']} to {volume} lots ({limit} limit)")
+        trade['PositionSize'] = volume
+
+        if(reserve):
+            self.reserve(trade, specification)
+
+        return limit
+
+    def reserve(self, trade: Trade, specification: dict) -> None:
+        """Counts every order of a trade that is being placed until it is streamed, so that concurrent signals see it.
+
+        Arguments:
+            trade: dictionary that stores the sized trade information
+            specification: symbol specification
+        """
+
+        # the position size is split between the take profits like ExecuteTrade does
+        volume = RoundVolume(trade['PositionSize'] / len(trade['TP']), trade['VolumeStep'])
+        risk = abs(trade['Entry'] - trade['StopLoss']) / trade['PipSize'] * trade['PipValue'] * volume
+        entry = (trade['Symbol'], *SymbolCurrencies(specification), 1 if trade['OrderType'].startswith('Buy') else -1, risk)
+
+        for clientId in self._clientIds(trade):
+            self._apply(('Reserved', clientId), entry)
+            self.reserved[clientId] = time.monotonic() + RISK_RESERVATION_TTL
+
+        return
+
+    def release(self, trade: Trade, orders: list = None) -> None:
+        """Stops counting the orders of a reserved trade that were not placed.
+
+        Arguments:
+            trade: dictionary that stores the sized trade information
+            orders: outcome of each order, every order is released when it is None or empty
+        """
+
+        placed = {order['ClientId'] for order in orders or [] if order['Error'] is None}
+
+        for clientId in self._clientIds(trade):
+            if(clientId not in placed):
+                self._unreserve(clientId)
+
+        return
+
+    def _clientIds(self, trade: Trade) -> list:
+        """Returns the client ids of the orders of a trade, as PlaceOrder sends them."""
+
+        prefix = trade['ClientId'] if trade.get('ClientId') else f'{id(trade):x}'
+
+        return [f'{prefix}T{leg + 1}' for leg in range(len(trade['TP']))]
+
+    def _unreserve(self, clientId: str) -> None:
+        if(self.reserved.pop(clientId, None) is not None):
+            self._apply(('Reserved', clientId), None)
+
+        return
+
+    def _expire(self) -> None:
+        """Releases the reserved orders that were not streamed within RISK_RESERVATION_TTL seconds."""
+
+        now = time.monotonic()
+
+        for clientId in [clientId for clientId, expires in self.reserved.items() if expires < now]:
+            self._unreserve(clientId)
+
+        return
+
+    def dailyLoss(self, accountInformation: dict) -> float:
+        """Returns the loss of the account since the start of the UTC day, including the open positions.
+
+        Arguments:
+            accountInformation: MetaAPI account information
+        """
+
+        # the first balance seen on a new day is the reference of the day
+        today = time.strftime('%Y-%m-%d', time.gmtime())
+
+        if(self.day != today):
+            self.day = today
+            self.dayBalance = accountInformation['balance']
+
+        return max(0.0, self.dayBalance - (accountInformation.get('equity') or accountInformation['balance']))
+
+    def status(self) -> str:
+        """Returns a human readable summary of the open risk."""
+
+        accountInformation = self.manager.marketData.accountInformation
+
+        if(accountInformation is None or not(accountInformation.get('balance'))):
+            return f'Open risk: {self.openRisk:,.2f}'
+
+        balance = accountInformation['balance']
+        status = f'Open risk: {self.openRisk / balance:.1%}'
+
+        if(self.reserved):
+            status += f', {len(self.reserved)} orders reserved'
+
+        if(self.currencyRisk):
+            currency = max(self.currencyRisk, key=lambda currency: abs(self.currencyRisk[currency]))
+            status += f', largest {currency} {self.currencyRisk[currency] / balance:+.1%}'
+
+        if(self.unpriced):
+            status += f', {len(self.unpriced)} unpriced'
+
+        return status
+
+    def _apply(self, key: tuple, entry: tuple) -> None:
+        """Replaces the risk of one position, pending order or reserved trade in the totals."""
+
+        previous = self.items.pop(key, None)
+
+        for sign, value in [(-1, previous), (1, entry)]:
+            if(value is None):
+                continue
+
+            symbol, base, quote, direction, risk = value
+            self.openRisk += sign * risk
+            self.symbolRisk[symbol] = self.symbolRisk.get(symbol, 0.0) + sign * risk
+            self.currencyRisk[base] = self.currencyRisk.get(base, 0.0) + sign * direction * risk
+            self.currencyRisk[quote] = self.currencyRisk.get(quote, 0.0) - sign * direction * risk
+
+        if(entry is not None):
+            self.items[key] = entry
+
+        return
+
+    def _update(self, kind: str, item: dict, price: dict = None) -> None:
+        """Recalculates the risk of a streamed position or pending order, with the latest price of its symbol if given."""
+
+        key = (kind, item['id'])
+        self.unpriced.pop(key, None)
+
+        # the streamed order now carries the risk that was reserved for it
+        if(item.get('clientId') in self.reserved):
+            self._unreserve(item['clientId'])
+
+        # a position without stop loss has no defined risk
+        if(item.get('stopLoss') is None):
+            self._apply(key, None)
+            return
+
+        specification = self.manager.specifications.peek(item['symbol'])
+        accountInformation = self.manager.marketData.accountInformation
+        quote = self.manager.marketData.quotes.get(item['symbol'])
+        price = price or (quote and quote[0])
+
+        if(specification is None):
+            self._load(item['symbol'])
+
+        try:
+            if(specification is None or accountInformation is None):
+                raise LookupError(item['symbol'])
+
+            pipValue = PipValue(specification, price, accountInformation['currency'], item['openPrice'])
+
+        # recalculated with the next prices, until then the previous risk is kept
+        except Exception:
+            self.unpriced[key] = item
+            return
+
+        risk = abs(item['openPrice'] - item['stopLoss']) / specification['pipSize'] * pipValue * item['volume']
+        self._apply(key, (item['symbol'], *SymbolCurrencies(specification), 1 if 'BUY' in item['type'] else -1, risk))
+
+        return
+
+    def _load(self, symbol: str) -> None:
+        """Loads the specification of a symbol that was not traded by the bot yet in the background."""
+
+        if(symbol in self._loading):
+            return
+
+        self._loading.add(symbol)
+        task = asyncio.get_running_loop().create_task(self.manager.specifications.get(self.manager._connection, symbol))
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._loaded(symbol, task))
+
+        return
+
+    def _loaded(self, symbol: str, task: asyncio.Task) -> None:
+        """Prices the positions and orders of a symbol once its specification is loaded, a failed load is tried again with the next update."""
+
+        self._tasks.discard(task)
+        self._loading.discard(symbol)
+
+        if(task.cancelled()):
+            return
+
+        if(task.exception() is not None):
+            logger.warning(f"{self.manager.account['name']} risk guard could not load the specification of {symbol}: {task.exception()}")
+            return
+
+        for kind, item in [(key[0], item) for key, item in self.unpriced.items() if item['symbol'] == symbol]:
+            self._update(kind, item)
+
+        return
+
+    def _remove(self, kind: str, itemId: str) -> None:
+        """Removes a closed position or a filled or cancelled pending order."""
+
+        self.unpriced.pop((kind, itemId), None)
+        self._apply((kind, itemId), None)
+
+        return
+
+    def _replace(self, kind: str, items: list) -> None:
+        """Replaces every position or pending order after a synchronization."""
+
+        for key in [key for key in self.items if key[0] == kind]:
+            self._remove(*key)
+
+        for key in [key for key in self.unpriced if key[0] == kind]:
+            del self.unpriced[key]
+
+        for item in items:
+            self._update(kind, item)
+
+        return
+
+    async def on_account_information_updated(self, instance_index: str, account_information: dict):
+        self.dailyLoss(account_information)
+
+    async def on_positions_replaced(self, instance_index: str, positions: list):
+        self._replace('Position', positions)
+
+    async def on_position_updated(self, instance_index: str, position: dict):
+        self._update('Position', position)
+
+    async def on_position_removed(self, instance_index: str, position_id: str):
+        self._remove('Position', position_id)
+
+    async def on_pending_orders_replaced(self, instance_index: str, orders: list):
+        self._replace('Order', orders)
+
+    async def on_pending_order_updated(self, instance_index: str, order: dict):
+        self._update('Order', order)
+
+    async def on_pending_order_completed(self, instance_index: str, order_id: str):
+        self._remove('Order', order_id)
+
+    async def on_symbol_prices_updated(self, instance_index: str, prices: list, equity: float = None, margin: float = None,
+                                       free_margin: float = None, margin_level: float = None, account_currency_exchange_rate: float = None):
+        if(self.unpriced):
+            prices = {price['symbol']: price for price in prices}
+
+            for kind, item in [(key[0], item) for key, item in self.unpriced.items() if item['symbol'] in prices]:
+                self._update(kind, item, prices[item['symbol']])
+
+
+# MetaAPI Connection
+class ConnectionManager:
+    """Owns the long-lived MetaAPI connections of one MetaTrader account that are shared by all handlers.
+
+    The account is deployed, connected and synchronized once at startup. A background task then pings the
+    terminal every HEALTH_CHECK_INTERVAL seconds and reconnects with exponential backoff when a ping fails.
+
+    When several instances of the bot share a STATE_STORE, only the instance that holds the account's lease
+    submits its orders. The others hand their trades to it through the store and wait for the results.
+    """
+
+    DISCONNECTED = 'DISCONNECTED'
+    CONNECTING = 'CONNECTING'
+    SYNCHRONIZED = 'SYNCHRONIZED'
+    RECONNECTING = 'RECONNECTING'
+    CLOSED = 'CLOSED'
+
+    def __init__(self, pool, account: dict) -> None:
+        self.pool = pool
+        self.account = account
+        self.accountId = account['id']
+        self.state = ConnectionManager.DISCONNECTED
+        self.lastError = None
+        self.lastHealthCheck = None
+        self.reconnects = 0
+        self.readyAfter = None
+        self.leader = False
+
+        self.symbols = {}
+        self.specifications = SymbolSpecificationCache()
+        self.marketData = MarketDataCache(self.specifications, frozenset())
+        self.update(account, CONFIG.symbols)
+        self.positions = PositionManager(self)
+        self.risk = RiskGuard(self)
+
+        self._connection = None
+        self._streaming = None
+        self._ready = None
+        self._task = None
+        self._lease = None
+        self._handoffs = set()
+
+    def update(self, account: dict, symbols: tuple) -> None:
+        """Applies a changed name, risk factor or symbol names of the account without reconnecting.
+
+        Arguments:
+            account: account settings from the configuration
+            symbols: symbols recognized in signals
+        """
+
+        self.account = account
+
+        # maps the allowed symbols to the broker's symbol names of this account
+        self.symbols = {symbol: account['symbols'].get(symbol, symbol) for symbol in symbols if symbol != 'NOW'}
+        self.specifications.aliases = {brokerSymbol: symbol for symbol, brokerSymbol in self.symbols.items()}
+        self.marketData.symbols = frozenset(self.symbols.values())
+
+        return
+
+    async def start(self) -> None:
+        """Starts the background task that connects, synchronizes and monitors the MetaAPI connection."""
+
+        if(self._task is None):
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            self._lease = asyncio.get_running_loop().create_task(self._lead())
+
+        return
+
+    async def get_connection(self, timeout: float = CONNECTION_TIMEOUT):
+        """Returns the synchronized RPC connection, waiting for it to become ready if necessary.
+
+        Arguments:
+            timeout: maximum number of seconds to wait for the connection, 0 fails at once when it is not ready
+
+        Returns:
+            the synchronized MetaAPI RPC connection
+        """
+
+        if(self._task is None):
+            await self.start()
+
+        if(self._ready.is_set()):
+            return self._connection
+
+        if(timeout <= 0):
+            raise Exception(f"MetaTrader connection of {self.account['name']} is not ready (state: {self.state}, last error: {self.lastError})")
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+
+        except asyncio.TimeoutError:
+            raise Exception(f'MetaTrader connection is not ready (state: {self.state}, last error: {self.lastError})')
+
+        return self._connection
+
+    async def close(self) -> None:
+        """Stops the health checks, gives up the account's lease and closes the MetaAPI connection."""
+
+        for task in [self._task, self._lease, *self._handoffs]:
+            if(task is not None):
+                task.cancel()
+
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        # another instance can take over the account's orders at once
+        if(self.leader):
+            self.leader = False
+
+            try:
+                await STATE.release(f'account:{self.accountId}', INSTANCE_ID)
+            except Exception as error:
+                logger.warning(f"Could not release the lease of {self.account['name']}: {error}")
+
+        await self._disconnect()
+        self.state = ConnectionManager.CLOSED
+
+        return
+
+    def status(self) -> str:
+        """Returns a human readable description of the connection state."""
+
+        status = f'State: {self.state}\nReconnects: {self.reconnects}'
+
+        if(STATE.shared):
+            status += f"\nOrders: {'submitted by this instance' if self.leader else 'handed to the instance that holds the lease'}"
+
+        if(self.readyAfter is not None):
+            status += f'\nReady {self.readyAfter:.1f} s after boot'
+
+        if(self.lastHealthCheck is not None):
+            status += f'\nLast health check: {time.monotonic() - self.lastHealthCheck:.0f} s ago'
+
+        status += f'\n{self.marketData.status()}\n{self.positions.status()}\n{self.risk.status()}'
+
+        if(self.lastError is not None):
+            status += f'\nLast error: {self.lastError}'
+
+        return status
+
+    async def lead(self) -> bool:
+        """Takes or renews the account's lease and returns whether this instance submits the account's orders."""
+
+        self.leader = await STATE.acquire(f'account:{self.accountId}', INSTANCE_ID, LEASE_TTL)
+
+        return self.leader
+
+    async def handoff(self, trade: Trade) -> list:
+        """Hands a sized trade to the instance that holds the account's lease and waits for the outcome of its orders.
+
+        Arguments:
+            trade: dictionary that stores the account's trade information
+
+        Returns:
+            a list with the outcome of each order, in take profit order
+        """
+
+        key = f"handoff:{self.accountId}:{trade['ClientId'] if trade.get('ClientId') else secrets.token_hex(5)}"
+        await STATE.set(key, trade, ttl=HANDOFF_TIMEOUT)
+        deadline = time.monotonic() + HANDOFF_TIMEOUT
+
+        while(time.monotonic() < deadline):
+            outcome = await STATE.get(f'result:{key}')
+
+            if(outcome is not None):
+                await STATE.delete(f'result:{key}')
+
+                if(outcome['Error'] is not None):
+                    raise Exception(outcome['Error'])
+
+                return [dict(order, Error=Exception(order['Error']) if order['Error'] is not None else None) for order in outcome['Orders']]
+
+            await asyncio.sleep(HANDOFF_POLL_INTERVAL)
+
+        # a trade that was not taken yet is withdrawn so that it is never placed late
+        if(await STATE.delete(key)):
+            raise Exception(f'No instance submitted the orders of {self.account["name"]} within {HANDOFF_TIMEOUT:.0f} s, trade not placed')
+
+        raise Exception(f'The orders of {self.account["name"]} were submitted by another instance but their outcome is unknown, check /status before placing the trade again')
+
+    async def _execute(self, key: str, trade: Trade) -> None:
+        """Submits the orders of a trade handed over by another instance and stores their outcome for it."""
+
+        outcome = {'Orders': [], 'Error': None}
+
+        try:
+            connection = await self.get_connection()
+            specification = await self.specifications.get(connection, trade['Symbol'])
+            self.risk.reserve(trade, specification)
+            orders = []
+
+            try:
+                async with FANOUT_LIMIT:
+                    orders = await ExecuteTrade(connection, trade)
+
+            # the placed orders stay counted until they are streamed
+            finally:
+                self.risk.release(trade, orders)
+
+            LogOrderResults(self.account['name'], orders)
+            outcome['Orders'] = [dict(order, Error=str(order['Error']) if order['Error'] is not None else None) for order in orders]
+
+        except Exception as error:
+            logger.error(f"{self.account['name']} could not submit a handed over trade: {error}")
+            outcome['Error'] = str(error)
+
+        await STATE.set(f'result:{key}', outcome, ttl=HANDOFF_TIMEOUT)
+
+        return
+
+    async def _lead(self) -> None:
+        """Keeps the account's lease and, while holding it, submits the trades handed over by the other instances."""
+
+        renewed = None
+
+        while True:
+            try:
+                # the lease is renewed well before it expires
+                if(renewed is None or time.monotonic() - renewed >= LEASE_TTL / 3):
+                    leader = self.leader
+                    renewed = time.monotonic()
+
+                    if(await self.lead() != leader):
+                        logger.info(f"{INSTANCE_ID} {'now submits' if self.leader else 'no longer submits'} the orders of {self.account['name']}")
+
+                # each handed over trade is taken by deleting it, which only one instance can do
+                if(self.leader and STATE.shared):
+                    for key in await STATE.keys(f'handoff:{self.accountId}:'):
+                        trade = await STATE.get(key)
+
+                        if(trade is not None and await STATE.delete(key)):
+                            task = asyncio.get_running_loop().create_task(self._execute(key, trade))
+                            self._handoffs.add(task)
+                            task.add_done_callback(self._handoffs.discard)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as error:
+                logger.error(f"Could not check the lease of {self.account['name']}: {error}")
+
+            await asyncio.sleep(HANDOFF_POLL_INTERVAL if STATE.shared else LEASE_TTL / 3)
+
+    async def _connect(self) -> None:
+        """Deploys the account, opens the RPC connection and waits until the terminal state is synchronized."""
+
+        timings = {}
+
+        with METRICS.time('GetAccount', timings):
+            api = await self.pool.get_api()
+            account = await api.metatrader_account_api.get_account(self.accountId)
+
+        initial_state = account.state
+
+        if initial_state not in CONFIG.deployedStates:
+            #  wait until account is deployed and connected to broker
+            logger.info('Deploying account')
+
+            with METRICS.time('Deploy', timings):
+                await account.deploy()
+
+        logger.info('Waiting for API server to connect to broker ...')
+
+        with METRICS.time('WaitConnected', timings):
+            await account.wait_connected()
+
+        # connect to MetaApi API
+        self._connection = account.get_rpc_connection()
+
+        # streams quotes and account information into the market data cache
+        self._streaming = account.get_streaming_connection()
+        self._streaming.add_synchronization_listener(self.marketData)
+        self._streaming.add_synchronization_listener(self.positions)
+        self._streaming.add_synchronization_listener(self.risk)
+
+        async def synchronize(connection, stage: str) -> None:
+            # wait until terminal state synchronized to the local state
+            with METRICS.time(stage, timings):
+                await connection.connect()
+                await connection.wait_synchronized()
+
+        # both connections synchronize at the same time
+        logger.info('Waiting for SDK to synchronize to terminal state ...')
+        await asyncio.gather(synchronize(self._connection, 'WaitSynchronized'), synchronize(self._streaming, 'StreamingSynchronized'))
+
+        symbols = list(self.symbols.values())
+
+        with METRICS.time('WarmUp', timings):
+            subscriptions = await asyncio.gather(*[self._streaming.subscribe_to_market_data(symbol) for symbol in symbols], return_exceptions=True)
+
+            # loads the specifications that were not streamed, so that the first trade of a symbol does not wait for them
+            missing = [symbol for symbol in symbols if self.specifications.peek(symbol) is None]
+            await asyncio.gather(*[self.specifications.get(self._connection, symbol) for symbol in missing], return_exceptions=True)
+
+        for symbol, subscription in zip(symbols, subscriptions):
+            if(isinstance(subscription, Exception)):
+                logger.warning(f'Could not subscribe to {symbol} prices: {subscription}')
+
+        logger.info(f"{self.account['name']} connected " + json.dumps({stage: round(milliseconds) for stage, milliseconds in timings.items()}))
+
+        return
+
+    async def _disconnect(self) -> None:
+        """Closes the current connection, ignoring errors from an already broken connection."""
+
+        if(self._ready is not None):
+            self._ready.clear()
+
+        try:
+            if(self._streaming is not None):
+                await self._streaming.close()
+
+            if(self._connection is not None):
+                await self._connection.close()
+
+        except Exception as error:
+            logger.warning(f'Error while closing MetaAPI connection: {error}')
+
+        self._connection = None
+        self._streaming = None
+
+        # account information is fetched again once the new connection is synchronized
+        self.marketData.accountInformation = None
+
+        return
+
+    async def _run(self) -> None:
+        """Connects to MetaTrader and keeps the connection healthy until cancelled."""
+
+        delay = 1
+
+        while True:
+            try:
+                self.state = ConnectionManager.CONNECTING if self.reconnects == 0 else ConnectionManager.RECONNECTING
+                await self._connect()
+
+                self.state = ConnectionManager.SYNCHRONIZED
+                self.lastError = None
+                self._ready.set()
+                logger.info(f"MetaTrader connection of {self.account['name']} synchronized")
+
+                # the first connection measures how long the bot took to become ready to trade
+                if(self.readyAfter is None):
+                    self.readyAfter = time.perf_counter() - BOOT_STARTED
+                    METRICS.observe('BrokerReady', self.readyAfter * 1000)
+                    logger.info(f"{self.account['name']} broker ready {self.readyAfter:.1f} s after boot")
+
+                # resets the backoff once a connection has been established
+                delay = 1
+
+                while True:
+                    await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+                    await asyncio.wait_for(self._connection.get_server_time(), HEALTH_CHECK_TIMEOUT)
+                    self.lastHealthCheck = time.monotonic()
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as error:
+                self.lastError = error
+                self.reconnects += 1
+                self.state = ConnectionManager.RECONNECTING
+                logger.error(f"MetaTrader connection of {self.account['name']} failed: {error}. Reconnecting in {delay} s")
+
+                await self._disconnect()
+                await asyncio.sleep(delay)
+
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+class ConnectionPool:
+    """Shares one MetaAPI client between the connection managers of all configured accounts."""
+
+    def __init__(self, apiKey: str, accounts: list) -> None:
+        self.apiKey = apiKey
+        self.managers = {account['id']: ConnectionManager(self, account) for account in accounts}
+        self._api = None
+
+    def __iter__(self):
+        return iter(self.managers.values())
+
+    def __len__(self) -> int:
+        return len(self.managers)
+
+    async def get_api(self) -> MetaApi:
+        """Returns the shared MetaAPI client, creating it on first use."""
+
+        if(self._api is None):
+            self._api = MetaApi(self.apiKey)
+
+        return self._api
+
+    async def update(self, accounts: tuple, symbols: tuple) -> None:
+        """Applies the accounts of a new configuration, keeping the connections of the accounts that remain.
+
+        Arguments:
+            accounts: accounts from the configuration
+            symbols: symbols recognized in signals
+        """
+
+        accounts = {account['id']: account for account in accounts}
+        removed = [manager for accountId, manager in self.managers.items() if accountId not in accounts]
+
+        for accountId, account in accounts.items():
+            if(accountId in self.managers):
+                self.managers[accountId].update(account, symbols)
+
+            else:
+                self.managers[accountId] = ConnectionManager(self, account)
+                await self.managers[accountId].start()
+                logger.info(f"Connecting added account {account['name']}")
+
+        for manager in removed:
+            del self.managers[manager.accountId]
+            await manager.close()
+            logger.info(f"Closed removed account {manager.account['name']}")
+
+        return
+
+    async def start(self) -> None:
+        """Starts connecting every account in the background."""
+
+        for manager in self:
+            await manager.start()
+
+        return
+
+    async def close(self) -> None:
+        """Closes the connections of every account and the MetaAPI client."""
+
+        await asyncio.gather(*[manager.close() for manager in self])
+
+        if(self._api is not None):
+            self._api.close()
+            self._api = None
+
+        return
+
+    def readiness(self) -> tuple:
+        """Returns whether every account is synchronized and ready to trade, and the state of each account."""
+
+        ready = all(manager.state == ConnectionManager.SYNCHRONIZED for manager in self)
+        states = '\n'.join(f"{manager.account['name']}: {manager.state}" for manager in self)
+
+        return ready, ('broker ready' if ready else 'broker not ready') + f'\n{states}\n'
+
+    def status(self) -> str:
+        """Returns a human readable description of every account's connection."""
+
+        return '\n\n'.join(f"{manager.account['name']}\n{manager.status()}" for manager in self)
+
+
+# pooled connections to every MetaTrader account
+CONNECTIONS = ConnectionPool(API_KEY, CONFIG.accounts)
+
+# static texts of the /start and /help commands, built once
+WELCOME_MESSAGE = "Welcome to the FX Signal Copier Telegram Bot! 💻💸\n\nYou can use this bot to enter trades directly from Telegram and get a detailed look at your risk to reward ratio with profit, loss, and calculated lot size. You are able to change specific settings such as allowed symbols, risk factor, and more from your personalized Python script and environment variables.\n\nUse the /help command to view instructions and example trades."
+
+HELP_MESSAGE = '\n\n'.join([
+    "This bot is used to automatically enter trades onto your MetaTrader account directly from Telegram. To begin, ensure that you are authorized to use this bot by adjusting your Python script or environment variables.\n\nThis bot supports all trade order types (Market Execution, Limit, and Stop)\n\nThe connection to your MetaTrader account is kept open and reconnects automatically. Use the /status command to check its state.",
+    "List of commands:\n/start : displays welcome message\n/help : displays list of commands and example trades\n/trade : takes in user inputted trade for parsing and placement\n/calculate : calculates trade information for a user inputted trade\n/status : displays the state of the MetaTrader connections\n/history : pages through the trade journal, ex: /history 2 XAUUSD\n/stats : displays the latency of each stage of the signal to order path\n/whatif : sizes signals for several balances and risk factors, ex: /whatif 1000,5000 0.01,0.02 followed by the signal\n/close : closes a placed trade by its id, or every trade of a symbol, ex: /close XAUUSD\n/modify : changes the stop loss and/or take profit of a placed trade, ex: /modify XAUUSD SL 1915.5 TP 1950\n/breakeven : moves the stop loss of a placed trade to its entry, ex: /breakeven XAUUSD\n/reload : applies the changes of the configuration file without restarting the bot",
+    "Example Trades 💴:",
+    "Market Execution:\nBUY GBPUSD\nEntry NOW\nSL 1.14336\nTP 1.28930\nTP 1.29845",
+    "Limit Execution:\nBUY LIMIT GBPUSD\nEntry 1.14480\nSL 1.14336\nTP 1.28930",
+    "You are able to enter multiple take profits. If more than one is entered, the position size is split evenly between them and one order is placed for each take profit at the same time.\n\nNote: Use 'NOW' as the entry to enter a market execution trade."
+])
+
+# journal of every calculated and placed trade
+JOURNAL = TradeJournal(JOURNAL_FILE)
+
+# rolling latency histograms of every stage of the signal to order path
+METRICS = LatencyMetrics(METRICS_WINDOW)
+METRICS.observe('Import', IMPORT_TIME)
+METRICS_SERVER = MetricsServer(METRICS, int(METRICS_PORT or 0), readiness=CONNECTIONS.readiness)
+
+# outgoing messages are delivered in the background so that they never delay an order
+OUTBOX = OutboundQueue(TELEGRAM_RATE_LIMIT, TELEGRAM_CHAT_RATE_LIMIT, TELEGRAM_CHAT_BURST)
+
+# conversations, pending trades, fingerprints of the recent signals, client ids of the copied signal messages and
+# account leases, shared by every instance of the bot that uses the same STATE_STORE
+STATE = OpenStateStore(STATE_STORE)
+
+# Helper Functions
+def IsAuthorized(update: Update) -> bool:
+    """Checks if the chat of an update belongs to one of the configured users.
+
+    Arguments:
+        update: update from Telegram
+
+    Returns:
+        whether the user may use the bot
+    """
+
+    chat = update.effective_message.chat
+
+    return CONFIG.isAuthorized(chat.username, chat.id)
+
+def SignalFingerprint(trade: Trade) -> str:
+    """Hashes the symbol, side, entry, stop loss and take profits of a trade, so that a reposted or redelivered signal has the same fingerprint.
+
+    Arguments:
+        trade: dictionary that stores trade information
+
+    Returns:
+        a hexadecimal fingerprint of 16 characters
+    """
+
+    # the take profits are sorted so that their order in the message does not matter
+    fields = [trade['Symbol'], trade['OrderType'], trade['Entry'], trade['StopLoss']] + sorted(trade['TP'])
+    key = '|'.join(field if isinstance(field, str) else f'{field:.10g}' for field in fields)
+
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+async def AcceptSignal(trade: Trade) -> bool:
+    """Remembers a trade that is about to be placed and gives it a client id, unless the same signal was placed within DEDUPE_WINDOW seconds by any instance.
+
+    Arguments:
+        trade: dictionary that stores trade information
+
+    Returns:
+        whether the trade may be placed
+    """
+
+    fingerprint = SignalFingerprint(trade)
+
+    # only the first instance that adds the fingerprint places the signal
+    if(not(await STATE.add(f'signal:{fingerprint}', time.time(), ttl=DEDUPE_WINDOW))):
+        return False
+
+    # each order adds its take profit number to the client id, the comment and client id must fit in 26 characters
+    trade['Fingerprint'] = fingerprint
+    trade['ClientId'] = fingerprint[:6] + secrets.token_hex(2)
+
+    return True
+
+def TextWidth(text: str) -> int:
+    """Returns the number of columns a text takes in a monospaced font, counting emojis as two columns."""
+
+    return len(text) if text.isascii() else max(wcswidth(text), len(text))
+
+@lru_cache(maxsize=64)
+def TableBorder(widths: tuple) -> str:
+    """Returns the horizontal border of a table with the given column widths."""
+
+    return '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+
+def RenderTable(title: str, fieldNames: list, rows: list, rightAligned: tuple = ()) -> str:
+    """Renders a fixed-width text table in the PrettyTable layout without building a PrettyTable.
+
+    Arguments:
+        title: title of the table
+        fieldNames: names of the columns
+        rows: list of rows, each a list of cells, or None for an empty row that separates groups of rows
+        rightAligned: indexes of the columns aligned to the right
+
+    Returns:
+        the table as text, ready to be wrapped in a <pre> block
+    """
+
+    rows = [[str(cell) for cell in row] if row is not None else None for row in rows]
+    widths = [TextWidth(name) for name in fieldNames]
+
+    for row in rows:
+        if(row is not None):
+            widths = [max(width, TextWidth(cell)) for width, cell in zip(widths, row)]
+
+    # widens the last column when the title is wider than the table
+    titleWidth = TextWidth(title)
+    tableWidth = sum(widths) + 3 * (len(widths) - 1)
+
+    if(titleWidth > tableWidth):
+        widths[-1] += titleWidth - tableWidth
+        tableWidth = titleWidth
+
+    border = TableBorder(tuple(widths))
+    padding = tableWidth - titleWidth
+
+    def line(cells: list) -> str:
+        padded = [' ' * (width - TextWidth(cell)) + cell if count in rightAligned else cell + ' ' * (width - TextWidth(cell)) for count, (width, cell) in enumerate(zip(widths, cells))]
+        return '| ' + ' | '.join(padded) + ' |'
+
+    lines = ['+' + '-' * (tableWidth + 2) + '+', '| ' + ' ' * (padding // 2) + title + ' ' * (padding - padding // 2) + ' |', border, line(fieldNames), border]
+    lines.extend(line(row if row is not None else [''] * len(widths)) for row in rows)
+    lines.append(border)
+
+    return '\n'.join(lines)
+
+def CreateTable(trade: Trade, balance: float, stopLossPips: int, takeProfitPips: int) -> str:
+    """Creates a fixed-width table to display trade information to user.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        balance: current balance of the MetaTrader account
+        stopLossPips: the difference in pips from stop loss price to entry price
+
+    Returns:
+        the trade information table as text
+    """
+
+    rows = [[trade["OrderType"], trade["Symbol"]], ['Entry', trade['Entry']], None]
+
+    rows.append(['Stop Loss', '{} pips'.format(stopLossPips)])
+
+    for count, takeProfit in enumerate(takeProfitPips):
+        rows.append([f'TP {count + 1}', f'{takeProfit} pips'])
+
+    rows.append(None)
+    rows.append(['Risk Factor', '{:,.0f} %'.format(trade['RiskFactor'] * 100)])
+    rows.append(['Position Size', trade['PositionSize']])
+
+    if(trade.get('RiskGuard')):
+        rows.append(['Reduced By', f"{trade['RiskGuard']} limit"])
+
+    rows.append(None)
+    rows.append(['Current Balance', '$ {:,.2f}'.format(balance)])
+    rows.append(['Potential Loss', '$ {:,.2f}'.format(round((trade['PositionSize'] * trade['PipValue']) * stopLossPips, 2))])
+
+    # total potential profit from trade
+    totalProfit = 0
+
+    for count, takeProfit in enumerate(takeProfitPips):
+        profit = round((trade['PositionSize'] * trade['PipValue'] * (1 / len(takeProfitPips))) * takeProfit, 2)
+        rows.append([f'TP {count + 1} Profit', '$ {:,.2f}'.format(profit)])
+
+        # sums potential profit from each take profit target
+        totalProfit += profit
+
+    rows.append(None)
+    rows.append(['Total Profit', '$ {:,.2f}'.format(totalProfit)])
+
+    return RenderTable("Trade Information", ["Key", "Value"], rows)
+
+def CreateSummaryTable(trade: Trade, results: list, enterTrade: bool) -> str:
+    """Creates a fixed-width table to display the outcome of a trade on every account.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        results: list with the outcome of the trade on each account
+        enterTrade: whether the trade was placed or only calculated
+
+    Returns:
+        the table as text, with one row per account
+    """
+
+    rows = []
+
+    for result in results:
+        # a trade rejected after sizing, ex: by the risk guard, shows why instead of the size it was not placed with
+        if(result['Error'] is not None):
+            rows.append([result['Account'], '-', f"❌ {result['Error']}"[:40], f"{result['Latency']:.0f} ms"])
+            continue
+
+        if(enterTrade):
+            filled = len([order for order in result['Orders'] if order['Error'] is None])
+            status = f"{'✅' if filled == len(result['Orders']) else '⚠️'} {filled}/{len(result['Orders'])} filled"
+
+        else:
+            status = '$ {:,.2f} risk'.format(result['Trade']['PositionSize'] * result['Trade']['PipValue'] * result['StopLossPips'])
+
+        rows.append([result['Account'], result['Trade']['PositionSize'], status, f"{result['Latency']:.0f} ms"])
+
+    return RenderTable(f"{trade['OrderType']} {trade['Symbol']}", ["Account", "Size", "Status", "Latency"], rows)
+
+def IsRetryable(error: Exception) -> bool:
+    """Returns whether an order certainly did not reach the broker, so that it can be sent again without checking.
+
+    Arguments:
+        error: exception raised by the order
+
+    Returns:
+        True when the terminal was not connected, the MetaApi socket could not connect before sending the request,
+        or the broker answered with a result code of RETRYABLE_CODES
+    """
+
+    if(isinstance(error, NotConnectedException) or getattr(error, 'stringCode', None) in RETRYABLE_CODES):
+        return True
+
+    # the MetaApi client raises this timeout before the request is sent
+    return isinstance(error, TimeoutException) and 'failed to connect to the server' in str(error)
+
+def IsUncertain(error: Exception) -> bool:
+    """Returns whether an order may have been executed although no response arrived.
+
+    Arguments:
+        error: exception raised by the order
+
+    Returns:
+        True for timeouts of a request that was sent, whose order the broker can still execute
+    """
+
+    return isinstance(error, (asyncio.TimeoutError, TimeoutException)) and not(IsRetryable(error))
+
+async def FindOrder(connection, clientId: str, since: datetime.datetime) -> dict:
+    """Looks up a pending order, an open position or a completed order by its client id.
+
+    Arguments:
+        connection: MetaAPI RPC connection
+        clientId: client id the order was sent with
+        since: time the order was first sent, completed orders are only searched from then
+
+    Returns:
+        the order or position, or None when the order was not found
+    """
+
+    # an order that was filled and closed, or cancelled, in the meantime is only in the history
+    until = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=1)
+    orders, positions, history = await asyncio.gather(connection.get_orders(), connection.get_positions(), connection.get_history_orders_by_time_range(since, until))
+
+    for order in orders + positions + history.get('historyOrders', []):
+        if(order.get('clientId') == clientId):
+            return order
+
+    return None
+
+async def SettleOrder(connection, clientId: str, since: datetime.datetime) -> dict:
+    """Waits up to ORDER_SETTLE_TIMEOUT seconds for an order whose response was lost to appear in the terminal state.
+
+    The request has already been sent, so the broker can still execute it after the bot stopped waiting. Until
+    the order shows up, sending it again could place it twice.
+
+    Arguments:
+        connection: MetaAPI RPC connection
+        clientId: client id the order was sent with
+        since: time the order was first sent
+
+    Returns:
+        the order or position, or None when it did not appear
+    """
+
+    deadline = time.monotonic() + ORDER_SETTLE_TIMEOUT
+
+    while True:
+        try:
+            order = await asyncio.wait_for(FindOrder(connection, clientId, since), ORDER_TIMEOUT)
+
+            if(order is not None):
+                return order
+
+        except Exception as error:
+            logger.warning(f'{clientId} lookup failed: {type(error).__name__} {error}')
+
+        if(time.monotonic() + ORDER_SETTLE_INTERVAL > deadline):
+            return None
+
+        await asyncio.sleep(ORDER_SETTLE_INTERVAL)
+
+async def PlaceOrder(connection, trade: Trade, leg: int, takeProfit: float, volume: float) -> dict:
+    """Places a single order of a trade and records its outcome.
+
+    An order is only sent again when it certainly did not reach the broker. When its response is lost, the order
+    is looked up by its client id until it appears or ORDER_SETTLE_TIMEOUT passes, and is never sent again.
+
+    Arguments:
+        connection: MetaAPI RPC connection
+        trade: dictionary that stores trade information
+        leg: number of the take profit the order belongs to
+        takeProfit: take profit price of the order
+        volume: volume of the order in lots
+
+    Returns:
+        a dictionary with the order id, client id, result code, number of attempts, latency in milliseconds and error of the order
+    """
+
+    clientId = f"{trade['ClientId']}T{leg}" if trade.get('ClientId') else None
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
+    result = {'Leg': leg, 'TP': takeProfit, 'Volume': volume, 'OrderId': None, 'ClientId': clientId, 'StringCode': None, 'Attempts': 0, 'Latency': 0, 'Error': None}
+    started = time.perf_counter()
+
+    # market execution orders do not take an open price
+    if(trade['OrderType'] in ['Buy', 'Sell']):
+        arguments = [trade['Symbol'], volume, trade['StopLoss'], takeProfit]
+
+    else:
+        arguments = [trade['Symbol'], volume, trade['Entry'], trade['StopLoss'], takeProfit]
+
+    if(clientId is not None):
+        arguments.append({'clientId': clientId})
+
+    for attempt in range(ORDER_RETRIES + 1 if clientId is not None else 1):
+        result['Attempts'] = attempt + 1
+
+        try:
+            response = await asyncio.wait_for(getattr(connection, ORDER_FUNCTIONS[trade['OrderType']])(*arguments), ORDER_TIMEOUT)
+            result.update(OrderId=response.get('orderId'), StringCode=response.get('stringCode'), Error=None)
+            break
+
+        except Exception as error:
+            result['StringCode'] = getattr(error, 'stringCode', None)
+            result['Error'] = error
+
+            # the request was sent, so the order is looked up by its client id instead of being sent again
+            if(clientId is not None and IsUncertain(error)):
+                logger.warning(f"{clientId} attempt {attempt + 1} got no response, looking the order up: {type(error).__name__} {error}")
+                order = await SettleOrder(connection, clientId, since)
+
+                if(order is not None):
+                    result.update(OrderId=order['id'], StringCode='TRADE_RETCODE_DONE', Error=None)
+                else:
+                    result['Error'] = Exception(f'No response and the order did not appear within {ORDER_SETTLE_TIMEOUT:.0f} s, it was not sent again. Check /status before placing it again')
+
+                break
+
+            if(not(IsRetryable(error))):
+                break
+
+            logger.warning(f"{clientId} attempt {attempt + 1} failed: {type(error).__name__} {error}")
+
+    result['Latency'] = (time.perf_counter() - started) * 1000
+    METRICS.observe('OrderRPC', result['Latency'])
+
+    return result
+
+async def ExecuteTrade(connection, trade: Trade) -> list:
+    """Submits every take profit of a trade as a separate order at the same time.
+
+    Arguments:
+        connection: MetaAPI RPC connection
+        trade: dictionary that stores trade information
+
+    Returns:
+        a list with the outcome of each order, in take profit order
+    """
+
+    # splits the position size evenly between the take profits, rounded down to the volume step
+    volume = RoundVolume(trade['PositionSize'] / len(trade['TP']), trade['VolumeStep'])
+
+    if(volume <= 0):
+        raise Exception(f"Position size {trade['PositionSize']} is too small to split between {len(trade['TP'])} take profits")
+
+    orders = [PlaceOrder(connection, trade, count + 1, takeProfit, volume) for count, takeProfit in enumerate(trade['TP'])]
+
+    return list(await asyncio.gather(*orders))
+
+def FormatOrderResults(results: list) -> str:
+    """Formats the outcome of each order for the user.
+
+    Arguments:
+        results: list with the outcome of each order
+
+    Returns:
+        one line per order with its status, order id or error and latency
+    """
+
+    lines = []
+
+    for result in results:
+        if(result['Error'] is None):
+            lines.append(f"TP {result['Leg']}: ✅ #{result['OrderId']} ({result['Latency']:.0f} ms)")
+        else:
+            lines.append(f"TP {result['Leg']}: ❌ {result['Error']} ({result['Latency']:.0f} ms)")
+
+    return '\n'.join(lines)
+
+def LogOrderResults(account: str, results: list) -> None:
+    """Logs the outcome of every order so that a failed order does not hide the successful ones.
+
+    Arguments:
+        account: name of the account the orders were placed on
+        results: list with the outcome of each order
+    """
+
+    for result in results:
+        if(result['Error'] is None):
+            logger.info(f"{account} TP {result['Leg']}: order {result['OrderId']} {result['StringCode']} ({result['Latency']:.0f} ms)")
+        else:
+            logger.error(f"{account} TP {result['Leg']}: failed with {result['StringCode']}: {result['Error']} ({result['Latency']:.0f} ms)")
+
+    return
+
+async def TradeAccount(manager: ConnectionManager, trade: Trade, enterTrade: bool, onSized=None, maxRisk: float = None) -> dict:
+    """Sizes a trade from the balance of one account and places it if requested.
+
+    Arguments:
+        manager: connection manager of the account
+        trade: dictionary that stores trade information
+        enterTrade: whether to place the trade or only calculate it
+        onSized: optional coroutine function called with the result once the trade has been sized
+        maxRisk: optional upper limit of the account's risk factor
+
+    Returns:
+        a dictionary with the account's sized trade, balance, pips, order results, error and latency
+    """
+
+    result = {'Account': manager.account['name'], 'Trade': None, 'Balance': None, 'StopLossPips': None, 'TakeProfitPips': [], 'Orders': [], 'Error': None, 'Latency': 0, 'Timings': {}}
+    started = time.perf_counter()
+
+    def checkpoint(stage: str) -> None:
+        # records the milliseconds spent in each stage since the previous one
+        nonlocal started
+        now = time.perf_counter()
+        result['Timings'][stage] = (now - started) * 1000
+        result['Latency'] += result['Timings'][stage]
+        started = now
+
+    try:
+        # a trade waits for the first connection after the boot, but fails at once while the account reconnects
+        connection = await manager.get_connection(CONNECTION_TIMEOUT if manager.readyAfter is None else 0)
+        checkpoint('Connection')
+
+        # each account uses its own risk factor and broker symbol name
+        accountTrade = dict(trade, Symbol=manager.symbols.get(trade['Symbol'], trade['Symbol']), RiskFactor=manager.account['riskFactor'])
+
+        if(maxRisk is not None):
+            accountTrade['RiskFactor'] = min(accountTrade['RiskFactor'], maxRisk)
+
+        # a slot is only held while MetaApi is called, so that a disconnected or slow account does not hold up the others
+        async with FANOUT_LIMIT:
+            checkpoint('Queue')
+
+            # reads account information, the current price and the symbol specification from memory when available
+            account_information, price, specification = await asyncio.gather(
+                manager.marketData.get_account_information(connection),
+                manager.marketData.get_price(connection, accountTrade['Symbol']),
+                manager.specifications.get(connection, accountTrade['Symbol'])
+            )
+            checkpoint('MarketData')
+
+        # checks if the order is a market execution to use the current price of symbol
+        if(accountTrade['Entry'] == 'NOW'):
+
+            # uses bid price if the order type is a buy
+            if(accountTrade['OrderType'] == 'Buy'):
+                accountTrade['Entry'] = float(price['bid'])
+
+            # uses ask price if the order type is a sell
+            if(accountTrade['OrderType'] == 'Sell'):
+                accountTrade['Entry'] = float(price['ask'])
+
+        pipValue = PipValue(specification, price, account_information['currency'], accountTrade['Entry'])
+        result['StopLossPips'], result['TakeProfitPips'] = CalculateTradeInformation(accountTrade, account_information['balance'], specification, pipValue)
+        result['Trade'] = accountTrade
+        result['Balance'] = account_information['balance']
+        checkpoint('Sizing')
+
+        # reduces or rejects the trade when it would breach the account's exposure, margin or daily loss limits, and
+        # counts a trade that will be placed at once so that concurrent signals see it
+        accountTrade['RiskGuard'] = manager.risk.check(accountTrade, result['StopLossPips'], account_information, specification, reserve=enterTrade)
+        checkpoint('RiskGuard')
+
+        try:
+            if(onSized is not None):
+                await onSized(result)
+                checkpoint('Reply')
+
+            # submits one order per take profit concurrently, _lead keeps the lease and the flag up to date in the background
+            if(enterTrade and manager.leader):
+                async with FANOUT_LIMIT:
+                    result['Orders'] = await ExecuteTrade(connection, accountTrade)
+
+                checkpoint('Orders')
+
+            # another instance holds the account's lease and submits the orders
+            elif(enterTrade):
+                result['Orders'] = await manager.handoff(accountTrade)
+                checkpoint('Orders')
+
+        # the orders that were not placed stop counting, the placed ones count until they are streamed
+        finally:
+            if(enterTrade):
+                manager.risk.release(accountTrade, result['Orders'])
+
+    except Exception as error:
+        result['Error'] = error
+        checkpoint('Error')
+
+    return result
+
+def RecordTrade(trade: Trade, results: list, enterTrade: bool) -> None:
+    """Adds the outcome of a trade on every account to the trade journal, the latency histograms and the log.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        results: list with the outcome of the trade on each account
+        enterTrade: whether the trade was placed or only calculated
+    """
+
+    signal = {key: value for key, value in trade.items() if key not in ['Message', 'Source', 'Timings']}
+
+    for result in results:
+        sizing = None
+
+        # the Telegram and parse stages are shared by every account
+        timings = dict(trade.get('Timings', {}), **result['Timings'])
+        timings['Total'] = sum(timings.values())
+
+        for stage, milliseconds in result['Timings'].items():
+            METRICS.observe(stage, milliseconds)
+
+        METRICS.observe('Total', timings['Total'])
+
+        logger.info('trade ' + json.dumps({
+            'account': result['Account'],
+            'source': trade.get('Source'),
+            'order_type': trade['OrderType'],
+            'symbol': trade['Symbol'],
+            'entered': enterTrade,
+            'orders': len(result['Orders']),
+            'failed': sum(order['Error'] is not None for order in result['Orders']),
+            'error': None if result['Error'] is None else str(result['Error']),
+            'timings_ms': {stage: round(milliseconds, 1) for stage, milliseconds in timings.items()}
+        }))
+
+        if(result['Trade'] is not None):
+            sizing = {
+                'Balance': result['Balance'],
+                'Entry': result['Trade']['Entry'],
+                'RiskFactor': result['Trade']['RiskFactor'],
+                'PositionSize': result['Trade']['PositionSize'],
+                'PipValue': result['Trade']['PipValue'],
+                'StopLossPips': result['StopLossPips'],
+                'TakeProfitPips': result['TakeProfitPips']
+            }
+
+        JOURNAL.record({
+            'source': f"{trade.get('Source', 'unknown')}:{'trade' if enterTrade else 'calculate'}",
+            'account': result['Account'],
+            'symbol': trade['Symbol'],
+            'order_type': trade['OrderType'],
+            'message': trade.get('Message'),
+            'trade': signal,
+            'sizing': sizing,
+            'orders': result['Orders'],
+            'timings': timings,
+            'error': result['Error']
+        })
+
+    return
+
+def ManageHint(trade: Trade, results: list) -> str:
+    """Returns the line that tells the user how to manage a placed trade, or an empty string when no order was placed.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        results: list with the outcome of the trade on each account
+    """
+
+    if(trade.get('ClientId') is None or not(any(order['Error'] is None for result in results for order in result['Orders']))):
+        return ''
+
+    return f"\n\nTrade id: <code>{trade['ClientId']}</code>\nManage it with /close, /modify or /breakeven {trade['ClientId']}"
+
+async def ReleaseSignal(trade: Trade, results: list) -> None:
+    """Forgets the fingerprint of a trade that placed no order on any account, so that the signal can be sent again.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        results: list with the outcome of the trade on each account
+    """
+
+    placed = any(order['Error'] is None for result in results for order in result['Orders'])
+
+    if(not(placed) and trade.get('Fingerprint') is not None):
+        await STATE.delete(f"signal:{trade['Fingerprint']}")
+
+    return
+
+class StatusMessage:
+    """A single message that is edited as the stages of a trade progress instead of sending a message per stage.
+
+    show() only queues the latest text on OUTBOX, which sends or edits the message in the background.
+    """
+
+    def __init__(self, chat, reply) -> None:
+        self.chat = chat
+        self.reply = reply
+        self.message = None
+        self.text = None
+        self.sent = None
+
+    def show(self, text: str) -> None:
+        """Replaces the text of the message, sending it on first use.
+
+        Arguments:
+            text: HTML text of the message
+        """
+
+        if(text == self.text):
+            return
+
+        self.text = text
+        OUTBOX.submit(self.chat, self)
+
+        return
+
+    async def deliver(self) -> None:
+        """Sends or edits the message with its latest text, called by OUTBOX."""
+
+        text = self.text
+
+        if(text == self.sent):
+            return
+
+        # messages that cannot be edited, ex: results that are only logged, are sent again
+        if(self.message is not None and hasattr(self.message, 'edit_text')):
+            try:
+                await self.message.edit_text(text, parse_mode=ParseMode.HTML)
+                self.sent = text
+                return
+
+            except BadRequest as error:
+                logger.warning(f'Could not edit status message: {error}')
+
+        self.message = await self.reply(text, parse_mode=ParseMode.HTML)
+        self.sent = text
+
+        return
+
+async def ConnectMetaTrader(status: StatusMessage, trade: Trade, enterTrade: bool, maxRisk: float = None):
+    """Uses the pooled MetaAPI connections to calculate and place trade on every account.
+
+    Arguments:
+        status: message that is edited with the progress of the trade
+        trade: dictionary that stores trade information
+        enterTrade: whether to place the trade or only calculate it
+        maxRisk: optional upper limit of each account's risk factor
+
+    Returns:
+        A coroutine that confirms that the trade calculation and placement were successful
+    """
+
+    status.show("Calculating trade risk ... 🤔")
+
+    # a single account keeps the detailed trade table
+    if(len(CONNECTIONS) == 1):
+        summary = ''
+
+        async def onSized(result: dict) -> None:
+            nonlocal summary
+
+            # produces a table with trade information
+            summary = '<pre>{}</pre>\n\n'.format(html.escape(CreateTable(result['Trade'], result['Balance'], result['StopLossPips'], result['TakeProfitPips'])))
+
+            # enters trade on to MetaTrader account
+            status.show(summary + ("Entering trade on MetaTrader Account ... 👨🏾‍💻" if enterTrade else "Trade calculated 🧮"))
+
+            return
+
+        result = await TradeAccount(next(iter(CONNECTIONS)), trade, enterTrade, onSized, maxRisk)
+        LogOrderResults(result['Account'], result['Orders'])
+        RecordTrade(trade, [result], enterTrade)
+        await ReleaseSignal(trade, [result])
+
+        if(result['Error'] is not None):
+            logger.error(f"Error: {result['Error']}")
+
+            if(result['Trade'] is None):
+                status.show(f"There was an issue with the connection 😕\n\nError Message:\n{html.escape(str(result['Error']))}")
+            else:
+                status.show(summary + f"There was an issue 😕\n\nError Message:\n{html.escape(str(result['Error']))}")
+
+        elif(enterTrade):
+            failed = [order for order in result['Orders'] if order['Error'] is not None]
+
+            # shows the outcome of every order below the trade information
+            if(not(failed)):
+                status.show(summary + "Trade entered successfully! 💰\n\n" + html.escape(FormatOrderResults(result['Orders'])) + ManageHint(trade, [result]))
+
+            else:
+                status.show(summary + f"There was an issue 😕\n\n{len(failed)} of {len(result['Orders'])} orders failed:\n\n" + html.escape(FormatOrderResults(result['Orders'])) + ManageHint(trade, [result]))
+
+        return
+
+    # copies the trade to every account at the same time, with at most FANOUT_CONCURRENCY of them calling MetaApi
+    results = await asyncio.gather(*[TradeAccount(manager, trade, enterTrade, maxRisk=maxRisk) for manager in CONNECTIONS])
+    RecordTrade(trade, results, enterTrade)
+    await ReleaseSignal(trade, results)
+
+    for result in results:
+        LogOrderResults(result['Account'], result['Orders'])
+
+        if(result['Error'] is not None):
+            logger.error(f"{result['Account']} error: {result['Error']}")
+
+    # shows one summary table for all accounts
+    table = CreateSummaryTable(trade, results, enterTrade)
+    status.show('<pre>{}</pre>'.format(html.escape(table)) + ManageHint(trade, results))
+
+    return
+
+
+def DeliveryLatency(message) -> float:
+    """Returns the milliseconds between a message being sent and the bot receiving it.
+
+    Arguments:
+        message: Telegram message
+
+    Returns:
+        the delivery latency, to the second as Telegram timestamps messages to the second
+    """
+
+    return max(0.0, time.time() - message.date.timestamp()) * 1000
+
+
+def ConversationKey(update: Update) -> str:
+    """Returns the key of the conversation of an update's chat in STATE."""
+
+    return str(update.effective_message.chat.id)
+
+async def GetPendingTrade(update: Update) -> Trade:
+    """Returns the trade parsed in the conversation of an update's chat, or None."""
+
+    return await STATE.get(f'trade:{ConversationKey(update)}')
+
+async def SetPendingTrade(update: Update, trade: Trade) -> None:
+    """Keeps the trade of the conversation of an update's chat for CONVERSATION_TIMEOUT seconds, or removes it when trade is None."""
+
+    if(trade is None):
+        await STATE.delete(f'trade:{ConversationKey(update)}')
+    else:
+        await STATE.set(f'trade:{ConversationKey(update)}', trade, ttl=CONVERSATION_TIMEOUT)
+
+    return
+
+
+# Handler Functions
+async def PlaceTrade(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Parses trade and places on MetaTrader account.   
+    
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
+
+    # checks if the trade has already been parsed or not
+    trade = await GetPendingTrade(update)
+
+    if(trade is None):
+
+        try: 
+            timings = {'Telegram': DeliveryLatency(update.effective_message)}
+            METRICS.observe('Telegram', timings['Telegram'])
+
+            # parses signal from Telegram message
+            with METRICS.time('Parse', timings):
+                trade = ParseSignal(update.effective_message.text, CONFIG)
+            
+            # checks if there was an issue with parsing the trade
+            if(not(trade)):
+                raise Exception('Invalid Trade')
+
+            trade['Message'] = update.effective_message.text
+            trade['Source'] = update.effective_message.chat.username
+            trade['Timings'] = timings
+        
+        except Exception as error:
+            logger.error(f'Error: {error}')
+            errorMessage = f"There was an error parsing this trade 😕\n\nError: {error}\n\nPlease re-enter trade with this format:\n\nBUY/SELL SYMBOL\nEntry \nSL \nTP \n\nOr use the /cancel to command to cancel this action."
+            await update.effective_message.reply_text(errorMessage)
+
+            # returns to TRADE state to reattempt trade parsing
+            return TRADE
+
+    # removes the trade from the conversation, so that a repeated /yes does not place it again
+    await SetPendingTrade(update, None)
+
+    # a reposted or redelivered signal is not placed twice
+    if(not(await AcceptSignal(trade))):
+        await update.effective_message.reply_text(f"This trade was already placed within the last {DEDUPE_WINDOW:.0f} seconds 🔁")
+
+        return ConversationHandler.END
+    
+    # attempts connection to MetaTrader and places trade, editing one message as it progresses
+    status = StatusMessage(update.effective_message.chat.id, update.effective_message.reply_text)
+    status.show("Trade Successfully Parsed! 🥳\nConnecting to MetaTrader ... \n(May take a while) ⏰")
+    await ConnectMetaTrader(status, trade, True)
+
+    return ConversationHandler.END
+
+async def CalculateTrade(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Parses trade and places on MetaTrader account.   
+    
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
+
+    # checks if the trade has already been parsed or not
+    trade = await GetPendingTrade(update)
+
+    if(trade is None):
+
+        try: 
+            timings = {'Telegram': DeliveryLatency(update.effective_message)}
+            METRICS.observe('Telegram', timings['Telegram'])
+
+            # parses signal from Telegram message
+            with METRICS.time('Parse', timings):
+                trade = ParseSignal(update.effective_message.text, CONFIG)
+            
+            # checks if there was an issue with parsing the trade
+            if(not(trade)):
+                raise Exception('Invalid Trade')
+
+            trade['Message'] = update.effective_message.text
+            trade['Source'] = update.effective_message.chat.username
+            trade['Timings'] = timings
+
+            # keeps the parsed trade for the /yes of the conversation, which any instance may receive
+            await SetPendingTrade(update, trade)
+        
+        except Exception as error:
+            logger.error(f'Error: {error}')
+            errorMessage = f"There was an error parsing this trade 😕\n\nError: {error}\n\nPlease re-enter trade with this format:\n\nBUY/SELL SYMBOL\nEntry \nSL \nTP \n\nOr use the /cancel to command to cancel this action."
+            await update.effective_message.reply_text(errorMessage)
+
+            # returns to CALCULATE to reattempt trade parsing
+            return CALCULATE
+    
+    # attempts connection to MetaTrader and calculates trade information, editing one message as it progresses
+    status = StatusMessage(update.effective_message.chat.id, update.effective_message.reply_text)
+    status.show("Trade Successfully Parsed! 🥳\nConnecting to MetaTrader ... (May take a while) ⏰")
+    await ConnectMetaTrader(status, trade, False)
+
+    # asks if user if they would like to enter or decline trade
+    status.show(status.text + "\n\nWould you like to enter this trade?\nTo enter, select: /yes\nTo decline, select: /no")
 
-# MetaAPI Credentials
-API_KEY = os.environ.get("API_KEY")
-ACCOUNT_ID = os.environ.get("ACCOUNT_ID")
+    return DECISION
 
-# Telegram Credentials
-TOKEN = os.environ.get("TOKEN")
-TELEGRAM_USER = os.environ.get("TELEGRAM_USER")
+def ProviderCommand(text: str) -> str:
+    """Returns the action of a provider's reply to a copied signal.
 
-# Heroku Credentials
-APP_URL = os.environ.get("APP_URL")
+    Arguments:
+        text: text of the reply
 
-# Port number for Telegram bot web hook
-PORT = int(os.environ.get('PORT', '8443'))
+    Returns:
+        'close' or 'breakeven' if the whole reply is one of PROVIDER_COMMAND_PATTERN's commands, otherwise None
+    """
 
+    command = PROVIDER_COMMAND_PATTERN.fullmatch(text or '')
 
-# Enables logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-logger = logging.getLogger(__name__)
+    if(command is None):
+        return None
 
-# possibles states for conversation handler
-CALCULATE, TRADE, DECISION = range(3)
+    return 'close' if command.group(1).lower() == 'close' else 'breakeven'
 
-# allowed FX symbols
-SYMBOLS = ['AUDCAD', 'AUDCHF', 'AUDJPY', 'AUDNZD', 'AUDUSD', 'CADCHF', 'CADJPY', 'CHFJPY', 'EURAUD', 'EURCAD', 'EURCHF', 'EURGBP', 'EURJPY', 'EURNZD', 'EURUSD', 'GBPAUD', 'GBPCAD', 'GBPCHF', 'GBPJPY', 'GBPNZD', 'GBPUSD', 'NOW', 'NZDCAD', 'NZDCHF', 'NZDJPY', 'NZDUSD', 'USDCAD', 'USDCHF', 'USDJPY', 'XAGUSD', 'XAUUSD']
+async def CopySignal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Places signals posted in the source chats without the /trade conversation.
 
-# RISK FACTOR
-RISK_FACTOR = float(os.environ.get("RISK_FACTOR"))
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
 
+    message = update.effective_message
+    timings = {'Telegram': DeliveryLatency(message)}
+    config = CONFIG
 
-# Helper Functions
-def ParseSignal(signal: str) -> dict:
-    """Starts process of parsing signal and entering trade on MetaTrader account.
+    try:
+        with METRICS.time('Parse', timings):
+            trade = ParseSignal(message.text, config)
 
-    Arguments:
-        signal: trading signal
+    except ValueError as error:
+        logger.info(f'Ignoring message from {message.chat.title or message.chat.id}: {error}')
+        trade = {}
 
-    Returns:
-        a dictionary that contains trade signal information
-    """
+    async def notify(text: str, **kwargs):
+        # returns the sent message so that it can be edited as the trade progresses
+        if(config.notifyChat):
+            return await context.bot.send_message(config.notifyChat, text, **kwargs)
 
-    # converts message to list of strings for parsing
-    signal = signal.splitlines()
-    signal = [line.rstrip() for line in signal]
+        logger.info(text)
 
-    trade = {}
+    # ordinary messages of the source chat are not signals, but a reply to a copied signal can close it or move its stop loss to the entry
+    if(not(trade)):
+        action = ProviderCommand(message.text)
+        signal = message.reply_to_message
 
-    # determines the order type of the trade
-    if('Buy Limit'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Buy Limit'
+        clientId = await STATE.get(f'message:{message.chat.id}:{signal.message_id}') if action is not None and signal is not None else None
 
-    elif('Sell Limit'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Sell Limit'
+        if(clientId is not None):
+            outcome = await ManageTrade(action, clientId)
+            StatusMessage(config.notifyChat, notify).show(html.escape(f"{message.chat.title}: {action} {clientId}\n\n{outcome}"))
 
-    elif('Buy Stop'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Buy Stop'
+        raise ApplicationHandlerStop
 
-    elif('Sell Stop'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Sell Stop'
+    # applies the safety rules before placing the trade
+    if(trade['Symbol'] not in config.allowedSymbols):
+        StatusMessage(config.notifyChat, notify).show(html.escape(f"Ignored {trade['OrderType']} {trade['Symbol']} from {message.chat.title}: symbol is not allowed 🙅🏽‍♂️"))
+        raise ApplicationHandlerStop
 
-    elif('Buy'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Buy'
-    
-    elif('Sell'.lower() in signal[0].lower()):
-        trade['OrderType'] = 'Sell'
-    
-    # returns an empty dictionary if an invalid order type was given
-    else:
-        return {}
+    if(not(await AcceptSignal(trade))):
+        logger.info(f"Ignoring repeated {trade['OrderType']} {trade['Symbol']} signal from {message.chat.title}")
+        raise ApplicationHandlerStop
 
-    # extracts symbol from trade signal
-    trade['Symbol'] = (signal[0].split())[-1].upper()
-    
-    # checks if the symbol is valid, if not, returns an empty dictionary
-    if(trade['Symbol'] not in SYMBOLS):
-        return {}
-    
-    # checks wheter or not to convert entry to float because of market exectution option ("NOW")
-    if(trade['OrderType'] == 'Buy' or trade['OrderType'] == 'Sell'):
-        trade['Entry'] = (signal[1].split())[-1]
-    
-    else:
-        trade['Entry'] = float((signal[1].split())[-1])
-    
-    trade['StopLoss'] = float((signal[2].split())[-1])
-    trade['TP'] = [float((signal[3].split())[-1])]
+    trade['Message'] = message.text
+    trade['Source'] = message.chat.title or str(message.chat.id)
+    trade['Timings'] = timings
+    METRICS.observe('Telegram', timings['Telegram'])
+    await STATE.set(f'message:{message.chat.id}:{message.message_id}', trade['ClientId'], ttl=SIGNAL_MESSAGE_TTL)
 
-    # checks if there's a fourth line and parses it for TP2
-    if(len(signal) > 4):
-        trade['TP'].append(float(signal[4].split()[-1]))
-    
-    # adds risk factor to trade
-    trade['RiskFactor'] = RISK_FACTOR
+    status = StatusMessage(config.notifyChat, notify)
+    status.show(html.escape(f"Copying {trade['OrderType']} {trade['Symbol']} from {message.chat.title} 📡"))
+    await ConnectMetaTrader(status, trade, True, maxRisk=config.maxRisk)
 
-    return trade
+    # prevents the other handlers from answering in the source chat
+    raise ApplicationHandlerStop
 
-def GetTradeInformation(update: Update, trade: dict, balance: float) -> None:
-    """Calculates information from given trade including stop loss and take profit in pips, posiition size, and potential loss/profit.
+async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Checks if the user is authorized to use this bot or shares to use /help command for instructions.
 
     Arguments:
         update: update from Telegram
-        trade: dictionary that stores trade information
-        balance: current balance of the MetaTrader account
+        context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    # calculates the stop loss in pips
-    if(trade['Symbol'] == 'XAUUSD'):
-        multiplier = 0.1
+    await update.effective_message.reply_text("Unknown command. Use /trade to place a trade or /calculate to find information for a trade. You can also use the /help command to view instructions for this bot.")
 
-    elif(trade['Symbol'] == 'XAGUSD'):
-        multiplier = 0.001
+    return
 
-    elif(str(trade['Entry']).index('.') >= 2):
-        multiplier = 0.01
 
-    else:
-        multiplier = 0.0001
+# Command Handlers
+async def welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends welcome message to user.
+
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
 
-    # calculates the stop loss in pips
-    stopLossPips = abs(round((trade['StopLoss'] - trade['Entry']) / multiplier))
+    # sends messages to user
+    await update.effective_message.reply_text(WELCOME_MESSAGE)
 
-    # calculates the position size using stop loss and RISK FACTOR
-    trade['PositionSize'] = math.floor(((balance * trade['RiskFactor']) / stopLossPips) / 10 * 100) / 100
+    return
 
-    # calculates the take profit(s) in pips
-    takeProfitPips = []
-    for takeProfit in trade['TP']:
-        takeProfitPips.append(abs(round((takeProfit - trade['Entry']) / multiplier)))
+async def help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends a help message when the command /help is issued
 
-    # creates table with trade information
-    table = CreateTable(trade, balance, stopLossPips, takeProfitPips)
-    
-    # sends user trade information and calcualted risk
-    update.effective_message.reply_text(f'<pre>{table}</pre>', parse_mode=ParseMode.HTML)
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
+
+    # sends the instructions, commands and example trades in one message
+    await update.effective_message.reply_text(HELP_MESSAGE)
 
     return
 
-def CreateTable(trade: dict, balance: float, stopLossPips: int, takeProfitPips: int) -> PrettyTable:
-    """Creates PrettyTable object to display trade information to user.
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the state of the MetaTrader connection to the user.
 
     Arguments:
-        trade: dictionary that stores trade information
-        balance: current balance of the MetaTrader account
-        stopLossPips: the difference in pips from stop loss price to entry price
-
-    Returns:
-        a Pretty Table object that contains trade information
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    # creates prettytable object
-    table = PrettyTable()
-    
-    table.title = "Trade Information"
-    table.field_names = ["Key", "Value"]
-    table.align["Key"] = "l"  
-    table.align["Value"] = "l" 
+    await update.effective_message.reply_text(f"MetaTrader Connections 🔌\n\n{CONNECTIONS.status()}")
 
-    table.add_row([trade["OrderType"] , trade["Symbol"]])
-    table.add_row(['Entry\n', trade['Entry']])
+    return
 
-    table.add_row(['Stop Loss', '{} pips'.format(stopLossPips)])
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the p50, p95 and p99 latency of every stage of the signal to order path.
 
-    for count, takeProfit in enumerate(takeProfitPips):
-        table.add_row([f'TP {count + 1}', f'{takeProfit} pips'])
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    table.add_row(['\nRisk Factor', '\n{:,.0f} %'.format(trade['RiskFactor'] * 100)])
-    table.add_row(['Position Size', trade['PositionSize']])
-    
-    table.add_row(['\nCurrent Balance', '\n$ {:,.2f}'.format(balance)])
-    table.add_row(['Potential Loss', '$ {:,.2f}'.format(round((trade['PositionSize'] * 10) * stopLossPips, 2))])
+    rows = METRICS.summary()
 
-    # total potential profit from trade
-    totalProfit = 0
+    if(not(rows)):
+        await update.effective_message.reply_text("No latencies recorded yet ⏱️")
+        return
 
-    for count, takeProfit in enumerate(takeProfitPips):
-        profit = round((trade['PositionSize'] * 10 * (1 / len(takeProfitPips))) * takeProfit, 2)
-        table.add_row([f'TP {count + 1} Profit', '$ {:,.2f}'.format(profit)])
-        
-        # sums potential profit from each take profit target
-        totalProfit += profit
+    table = RenderTable(f"Latency in ms (last {METRICS_WINDOW})", ["Stage", "Count", "p50", "p95", "p99"],
+                        [row[:2] + [f'{value:.0f}' for value in row[2:]] for row in rows], rightAligned=(1, 2, 3, 4))
+
+    await update.effective_message.reply_text('<pre>{}</pre>'.format(html.escape(table)), parse_mode=ParseMode.HTML)
 
-    table.add_row(['\nTotal Profit', '\n$ {:,.2f}'.format(totalProfit)])
+    return
 
-    return table
+async def whatif(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sizes one or more signals for several balances and risk factors without placing them.
 
-async def ConnectMetaTrader(update: Update, trade: dict, enterTrade: bool):
-    """Attempts connection to MetaAPI and MetaTrader to place trade.
+    The first line holds the comma separated balances and risk factors, which default to the current balance and
+    risk factor of the first account, followed by the signals separated by blank lines, ex:
+    /whatif 1000,5000 0.01,0.02
+    BUY GBPUSD
+    Entry NOW
+    SL 1.14336
+    TP 1.28930
 
     Arguments:
         update: update from Telegram
-        trade: dictionary that stores trade information
-
-    Returns:
-        A coroutine that confirms that the connection to MetaAPI/MetaTrader and trade placement were successful
+        context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    # creates connection to MetaAPI
-    api = MetaApi(API_KEY)
-    
-    try:
-        account = await api.metatrader_account_api.get_account(ACCOUNT_ID)
-        initial_state = account.state
-        deployed_states = ['DEPLOYING', 'DEPLOYED']
+    usage = "Please enter the balances, risk factors and signals with this format:\n\n/whatif 1000,5000 0.01,0.02\nBUY/SELL SYMBOL\nEntry \nSL \nTP \n\nSeparate several signals with a blank line."
 
-        if initial_state not in deployed_states:
-            #  wait until account is deployed and connected to broker
-            logger.info('Deploying account')
-            await account.deploy()
+    firstLine, _, text = update.effective_message.text.partition('\n')
+    arguments = firstLine.split()[1:]
+    signals = [signal for signal in re.split(r'\n\s*\n', text) if signal.strip()]
 
-        logger.info('Waiting for API server to connect to broker ...')
-        await account.wait_connected()
+    try:
+        balances = [float(balance) for balance in arguments[0].split(',')] if len(arguments) > 0 else None
+        riskFactors = [float(riskFactor) for riskFactor in arguments[1].split(',')] if len(arguments) > 1 else None
 
-        # connect to MetaApi API
-        connection = account.get_rpc_connection()
-        await connection.connect()
+    except ValueError:
+        balances = None
+        signals = []
 
-        # wait until terminal state synchronized to the local state
-        logger.info('Waiting for SDK to synchronize to terminal state ...')
-        await connection.wait_synchronized()
+    trades = [trade for trade in ParseSignals(signals, CONFIG) if trade]
 
-        # obtains account information from MetaTrader server
-        account_information = await connection.get_account_information()
+    if(not(trades)):
+        await update.effective_message.reply_text(usage)
+        return
 
-        update.effective_message.reply_text("Successfully connected to MetaTrader!\nCalculating trade risk ... 🤔")
+    manager = next(iter(CONNECTIONS))
 
-        # checks if the order is a market execution to get the current price of symbol
-        if(trade['Entry'] == 'NOW'):
-            price = await connection.get_symbol_price(symbol=trade['Symbol'])
+    try:
+        connection = await manager.get_connection()
+        account_information = await manager.marketData.get_account_information(connection)
 
-            # uses bid price if the order type is a buy
-            if(trade['OrderType'] == 'Buy'):
-                trade['Entry'] = float(price['bid'])
+        # fetches the price and specification of every symbol once
+        symbols = sorted(set(manager.symbols.get(trade['Symbol'], trade['Symbol']) for trade in trades))
+        prices = await asyncio.gather(*[manager.marketData.get_price(connection, symbol) for symbol in symbols])
+        specifications = await asyncio.gather(*[manager.specifications.get(connection, symbol) for symbol in symbols])
+        prices, specifications = dict(zip(symbols, prices)), dict(zip(symbols, specifications))
 
-            # uses ask price if the order type is a sell
-            if(trade['OrderType'] == 'Sell'):
-                trade['Entry'] = float(price['ask'])
+        tradeSpecifications, pipValues = [], []
 
-        # produces a table with trade information
-        GetTradeInformation(update, trade, account_information['balance'])
-            
-        # checks if the user has indicated to enter trade
-        if(enterTrade == True):
+        for trade in trades:
+            symbol = manager.symbols.get(trade['Symbol'], trade['Symbol'])
 
-            # enters trade on to MetaTrader account
-            update.effective_message.reply_text("Entering trade on MetaTrader Account ... 👨🏾‍💻")
+            # market execution orders are sized at the current price, like TradeAccount does
+            if(trade['Entry'] == 'NOW'):
+                trade['Entry'] = float(prices[symbol]['bid'] if trade['OrderType'] == 'Buy' else prices[symbol]['ask'])
+
+            tradeSpecifications.append(specifications[symbol])
+            pipValues.append(PipValue(specifications[symbol], prices[symbol], account_information['currency'], trade['Entry']))
 
-            try:
-                # executes buy market execution order
-                if(trade['OrderType'] == 'Buy'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_market_buy_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['StopLoss'], takeProfit)
-
-                # executes buy limit order
-                elif(trade['OrderType'] == 'Buy Limit'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_limit_buy_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['Entry'], trade['StopLoss'], takeProfit)
-
-                # executes buy stop order
-                elif(trade['OrderType'] == 'Buy Stop'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_stop_buy_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['Entry'], trade['StopLoss'], takeProfit)
-
-                # executes sell market execution order
-                elif(trade['OrderType'] == 'Sell'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_market_sell_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['StopLoss'], takeProfit)
-
-                # executes sell limit order
-                elif(trade['OrderType'] == 'Sell Limit'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_limit_sell_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['Entry'], trade['StopLoss'], takeProfit)
-
-                # executes sell stop order
-                elif(trade['OrderType'] == 'Sell Stop'):
-                    for takeProfit in trade['TP']:
-                        result = await connection.create_stop_sell_order(trade['Symbol'], trade['PositionSize'] / len(trade['TP']), trade['Entry'], trade['StopLoss'], takeProfit)
-                
-                # sends success message to user
-                update.effective_message.reply_text("Trade entered successfully! 💰")
-                
-                # prints success message to console
-                logger.info('\nTrade entered successfully!')
-                logger.info('Result Code: {}\n'.format(result['stringCode']))
-            
-            except Exception as error:
-                logger.info(f"\nTrade failed with error: {error}\n")
-                update.effective_message.reply_text(f"There was an issue 😕\n\nError Message:\n{error}")
-    
     except Exception as error:
         logger.error(f'Error: {error}')
-        update.effective_message.reply_text(f"There was an issue with the connection 😕\n\nError Message:\n{error}")
-    
+        await update.effective_message.reply_text(f"There was an issue with the connection 😕\n\nError Message:\n{error}")
+        return
+
+    balances = balances or [account_information['balance']]
+    riskFactors = riskFactors or [manager.account['riskFactor']]
+    # NumPy is imported on first use to keep it out of the cold start
+    from riskengine import CalculateTradesRisk
+
+    risk = CalculateTradesRisk(trades, balances, riskFactors, tradeSpecifications, pipValues)
+
+    rows = [(signal, balance, riskFactor) for signal in range(len(trades)) for balance in range(len(balances)) for riskFactor in range(len(riskFactors))]
+    table = RenderTable("What If", ["Trade", "Balance", "Risk", "Size", "Loss", "Profit"], [[
+        f"{trades[signal]['OrderType']} {trades[signal]['Symbol']}",
+        '{:,.0f}'.format(balances[balance]),
+        '{:.1f} %'.format(riskFactors[riskFactor] * 100),
+        '{:g}'.format(risk['PositionSize'][signal, balance, riskFactor]),
+        '{:,.2f}'.format(risk['Loss'][signal, balance, riskFactor]),
+        '{:,.2f}'.format(risk['TotalProfit'][signal, balance, riskFactor])
+    ] for signal, balance, riskFactor in rows[:WHATIF_MAX_ROWS]], rightAligned=(1, 2, 3, 4, 5))
+
+    note = f'\nShowing {WHATIF_MAX_ROWS} of {len(rows)} combinations.' if len(rows) > WHATIF_MAX_ROWS else ''
+    await update.effective_message.reply_text('<pre>{}</pre>{}'.format(html.escape(table), note), parse_mode=ParseMode.HTML)
+
     return
 
+async def ManageTrade(action: str, key: str, **arguments) -> str:
+    """Closes, modifies or moves to breakeven a trade or every trade of a symbol on every account.
+
+    Arguments:
+        action: name of the PositionManager method, close, modify or breakeven
+        key: client id of the trade, or a symbol
+        arguments: arguments of the method, ex: stopLoss and takeProfit
+
+    Returns:
+        one line per position or pending order with its outcome
+    """
+
+    outcomes = await asyncio.gather(*[getattr(manager.positions, action)(key, **arguments) for manager in CONNECTIONS], return_exceptions=True)
+    lines = []
+
+    for manager, outcome in zip(CONNECTIONS, outcomes):
+        if(isinstance(outcome, Exception)):
+            lines.append(f"{manager.account['name']}: ❌ {outcome}")
+            continue
+
+        for item in outcome:
+            lines.append(f"{manager.account['name']} #{item['Id']} {item['Symbol']}: " + ('✅' if item['Error'] is None else f"❌ {item['Error']}"))
+
+    return '\n'.join(lines) or f'No open positions or pending orders found for {key}'
+
+async def close(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Closes the positions and cancels the pending orders of a trade or of every trade of a symbol, ex: /close XAUUSD.
 
-# Handler Functions
-def PlaceTrade(update: Update, context: CallbackContext) -> int:
-    """Parses trade and places on MetaTrader account.   
-    
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    # checks if the trade has already been parsed or not
-    if(context.user_data['trade'] == None):
-
-        try: 
-            # parses signal from Telegram message
-            trade = ParseSignal(update.effective_message.text)
-            
-            # checks if there was an issue with parsing the trade
-            if(not(trade)):
-                raise Exception('Invalid Trade')
+    if(len(context.args) != 1):
+        await update.effective_message.reply_text("Use /close followed by a trade id or a symbol, ex: /close XAUUSD")
+        return
 
-            # sets the user context trade equal to the parsed trade
-            context.user_data['trade'] = trade
-            update.effective_message.reply_text("Trade Successfully Parsed! 🥳\nConnecting to MetaTrader ... \n(May take a while) ⏰")
-        
-        except Exception as error:
-            logger.error(f'Error: {error}')
-            errorMessage = f"There was an error parsing this trade 😕\n\nError: {error}\n\nPlease re-enter trade with this format:\n\nBUY/SELL SYMBOL\nEntry \nSL \nTP \n\nOr use the /cancel to command to cancel this action."
-            update.effective_message.reply_text(errorMessage)
+    await update.effective_message.reply_text(f"Close {context.args[0]} 🛑\n\n" + await ManageTrade('close', context.args[0]))
 
-            # returns to TRADE state to reattempt trade parsing
-            return TRADE
-    
-    # attempts connection to MetaTrader and places trade
-    asyncio.run(ConnectMetaTrader(update, context.user_data['trade'], True))
-    
-    # removes trade from user context data
-    context.user_data['trade'] = None
+    return
 
-    return ConversationHandler.END
+async def modify(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Changes the stop loss and/or take profit of a trade or of every trade of a symbol, ex: /modify XAUUSD SL 1915.5 TP 1950.
 
-def CalculateTrade(update: Update, context: CallbackContext) -> int:
-    """Parses trade and places on MetaTrader account.   
-    
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    # checks if the trade has already been parsed or not
-    if(context.user_data['trade'] == None):
+    arguments = {}
 
-        try: 
-            # parses signal from Telegram message
-            trade = ParseSignal(update.effective_message.text)
-            
-            # checks if there was an issue with parsing the trade
-            if(not(trade)):
-                raise Exception('Invalid Trade')
+    # reads the new levels with the same labels as a signal
+    for match in LABEL_PATTERN.finditer(' '.join(context.args[1:])):
+        field, number = SIGNAL_LABELS.get(''.join(match.group(1).lower().split()), (None, None))
 
-            # sets the user context trade equal to the parsed trade
-            context.user_data['trade'] = trade
-            update.effective_message.reply_text("Trade Successfully Parsed! 🥳\nConnecting to MetaTrader ... (May take a while) ⏰")
-        
-        except Exception as error:
-            logger.error(f'Error: {error}')
-            errorMessage = f"There was an error parsing this trade 😕\n\nError: {error}\n\nPlease re-enter trade with this format:\n\nBUY/SELL SYMBOL\nEntry \nSL \nTP \n\nOr use the /cancel to command to cancel this action."
-            update.effective_message.reply_text(errorMessage)
+        if(match.group(2).lower() == 'now'):
+            continue
 
-            # returns to CALCULATE to reattempt trade parsing
-            return CALCULATE
-    
-    # attempts connection to MetaTrader and calculates trade information
-    asyncio.run(ConnectMetaTrader(update, context.user_data['trade'], False))
+        if(field == 'StopLoss'):
+            arguments['stopLoss'] = float(match.group(2))
 
-    # asks if user if they would like to enter or decline trade
-    update.effective_message.reply_text("Would you like to enter this trade?\nTo enter, select: /yes\nTo decline, select: /no")
+        elif(field == 'TP'):
+            arguments['takeProfit'] = float(match.group(2))
 
-    return DECISION
+    if(not(context.args) or not(arguments)):
+        await update.effective_message.reply_text("Use /modify followed by a trade id or a symbol and the new SL and/or TP, ex: /modify XAUUSD SL 1915.5 TP 1950")
+        return
 
-def unknown_command(update: Update, context: CallbackContext) -> None:
-    """Checks if the user is authorized to use this bot or shares to use /help command for instructions.
+    await update.effective_message.reply_text(f"Modify {context.args[0]} ✏️\n\n" + await ManageTrade('modify', context.args[0], **arguments))
+
+    return
+
+async def breakeven(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Moves the stop loss of the positions of a trade or of every trade of a symbol to their entry, ex: /breakeven XAUUSD.
 
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
-    if(not(update.effective_message.chat.username == TELEGRAM_USER)):
-        update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
+
+    if(len(context.args) != 1):
+        await update.effective_message.reply_text("Use /breakeven followed by a trade id or a symbol, ex: /breakeven XAUUSD")
         return
 
-    update.effective_message.reply_text("Unknown command. Use /trade to place a trade or /calculate to find information for a trade. You can also use the /help command to view instructions for this bot.")
+    await update.effective_message.reply_text(f"Breakeven {context.args[0]} ⚖️\n\n" + await ManageTrade('breakeven', context.args[0]))
 
     return
 
+async def ReloadConfig() -> list:
+    """Loads CONFIG_FILE and the environment again and swaps in the new configuration if it is valid.
 
-# Command Handlers
-def welcome(update: Update, context: CallbackContext) -> None:
-    """Sends welcome message to user.
+    Returns:
+        the names of the changed settings
+
+    Raises:
+        ConfigError: when the new configuration is invalid, the current one is kept
+    """
+
+    global CONFIG
+
+    config = LoadConfig(CONFIG_FILE)
+    changes = CONFIG.changes(config)
+
+    # a single assignment swaps the configuration, handlers that already read it finish with the previous one
+    CONFIG = config
+
+    # the connections of the remaining accounts are kept warm
+    if('ACCOUNTS' in changes or 'SYMBOLS' in changes):
+        await CONNECTIONS.update(config.accounts, config.symbols)
+
+    logger.info(f"Reloaded configuration, changed: {', '.join(changes) or 'nothing'}")
+
+    return changes
+
+async def WatchConfig() -> None:
+    """Reloads the configuration when CONFIG_FILE changes, keeping the current one if the file is invalid."""
+
+    try:
+        await ReloadConfig()
+
+    except ConfigError as error:
+        logger.error(f'Keeping the current configuration, {CONFIG_FILE} is invalid:\n{error}')
+
+    return
+
+# reloads the configuration when CONFIG_FILE changes
+CONFIG_WATCHER = ConfigWatcher(CONFIG_FILE, WatchConfig, CONFIG_POLL_INTERVAL)
+
+async def reload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Reloads the configuration from CONFIG_FILE and the environment without restarting the bot.
 
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    welcome_message = "Welcome to the FX Signal Copier Telegram Bot! 💻💸\n\nYou can use this bot to enter trades directly from Telegram and get a detailed look at your risk to reward ratio with profit, loss, and calculated lot size. You are able to change specific settings such as allowed symbols, risk factor, and more from your personalized Python script and environment variables.\n\nUse the /help command to view instructions and example trades."
-    
-    # sends messages to user
-    update.effective_message.reply_text(welcome_message)
+    try:
+        changes = await ReloadConfig()
+
+    except ConfigError as error:
+        await update.effective_message.reply_text(f"The configuration is invalid, nothing was changed ❌\n\n{error}")
+        return
+
+    await update.effective_message.reply_text(f"Configuration reloaded 🔄\n\nChanged: {', '.join(changes) or 'nothing'}")
 
     return
 
-def help(update: Update, context: CallbackContext) -> None:
-    """Sends a help message when the command /help is issued
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends a page of the trade journal, ex: /history 2 XAUUSD.
 
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+        return
 
-    help_message = "This bot is used to automatically enter trades onto your MetaTrader account directly from Telegram. To begin, ensure that you are authorized to use this bot by adjusting your Python script or environment variables.\n\nThis bot supports all trade order types (Market Execution, Limit, and Stop)\n\nAfter an extended period away from the bot, please be sure to re-enter the start command to restart the connection to your MetaTrader account."
-    commands = "List of commands:\n/start : displays welcome message\n/help : displays list of commands and example trades\n/trade : takes in user inputted trade for parsing and placement\n/calculate : calculates trade information for a user inputted trade"
-    trade_example = "Example Trades 💴:\n\n"
-    market_execution_example = "Market Execution:\nBUY GBPUSD\nEntry NOW\nSL 1.14336\nTP 1.28930\nTP 1.29845\n\n"
-    limit_example = "Limit Execution:\nBUY LIMIT GBPUSD\nEntry 1.14480\nSL 1.14336\nTP 1.28930\n\n"
-    note = "You are able to enter up to two take profits. If two are entered, both trades will use half of the position size, and one will use TP1 while the other uses TP2.\n\nNote: Use 'NOW' as the entry to enter a market execution trade."
+    # the optional arguments are the page number and a symbol, in any order
+    page = next((int(argument) for argument in context.args if argument.isdigit()), 1)
+    symbol = next((argument.upper() for argument in context.args if not argument.isdigit()), None)
 
-    # sends messages to user
-    update.effective_message.reply_text(help_message)
-    update.effective_message.reply_text(commands)
-    update.effective_message.reply_text(trade_example + market_execution_example + limit_example + note)
+    entries = await JOURNAL.page(max(page, 1) - 1, HISTORY_PAGE_SIZE, symbol)
+
+    if(not(entries)):
+        await update.effective_message.reply_text("No trades found in the journal 📭")
+        return
+
+    rows = []
+
+    for entry in entries:
+        if(entry['error']):
+            status = '❌'
+        elif(entry['orders']):
+            status = '✅' if all(order['Error'] is None for order in entry['orders']) else '⚠️'
+        else:
+            status = '🧮'
+
+        size = entry['sizing']['PositionSize'] if entry['sizing'] else '-'
+        rows.append([time.strftime('%d/%m %H:%M', time.gmtime(entry['time'])), entry['account'], f"{entry['order_type']} {entry['symbol']}", size, status])
+
+    # account names and symbols come from the configuration and signals, so they are escaped with the rest of the table
+    table = RenderTable(f"Trade History (page {max(page, 1)})", ["Time", "Account", "Trade", "Size", "Status"], rows)
+
+    await update.effective_message.reply_text('<pre>{}</pre>\nUse /history {} for older trades.'.format(html.escape(table), max(page, 1) + 1), parse_mode=ParseMode.HTML)
 
     return
 
-def cancel(update: Update, context: CallbackContext) -> int:
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancels and ends the conversation.   
     
     Arguments:
@@ -444,14 +2757,14 @@ def cancel(update: Update, context: CallbackContext) -> int:
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
 
-    update.effective_message.reply_text("Command has been canceled.")
+    await update.effective_message.reply_text("Command has been canceled.")
 
-    # removes trade from user context data
-    context.user_data['trade'] = None
+    # removes the trade from the conversation
+    await SetPendingTrade(update, None)
 
     return ConversationHandler.END
 
-def error(update: Update, context: CallbackContext) -> None:
+async def error(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Logs Errors caused by updates.
 
     Arguments:
@@ -463,81 +2776,185 @@ def error(update: Update, context: CallbackContext) -> None:
 
     return
 
-def Trade_Command(update: Update, context: CallbackContext) -> int:
+async def Trade_Command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Asks user to enter the trade they would like to place.
 
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
-    if(not(update.effective_message.chat.username == TELEGRAM_USER)):
-        update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
         return ConversationHandler.END
     
     # initializes the user's trade as empty prior to input and parsing
-    context.user_data['trade'] = None
-    
+    await SetPendingTrade(update, None)
+
     # asks user to enter the trade
-    update.effective_message.reply_text("Please enter the trade that you would like to place.")
+    await update.effective_message.reply_text("Please enter the trade that you would like to place.")
 
     return TRADE
 
-def Calculation_Command(update: Update, context: CallbackContext) -> int:
+async def Calculation_Command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Asks user to enter the trade they would like to calculate trade information for.
 
     Arguments:
         update: update from Telegram
         context: CallbackContext object that stores commonly used objects in handler callbacks
     """
-    if(not(update.effective_message.chat.username == TELEGRAM_USER)):
-        update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
+    if(not(IsAuthorized(update))):
+        await update.effective_message.reply_text("You are not authorized to use this bot! 🙅🏽‍♂️")
         return ConversationHandler.END
 
     # initializes the user's trade as empty prior to input and parsing
-    context.user_data['trade'] = None
+    await SetPendingTrade(update, None)
 
     # asks user to enter the trade
-    update.effective_message.reply_text("Please enter the trade that you would like to calculate.")
+    await update.effective_message.reply_text("Please enter the trade that you would like to calculate.")
 
     return CALCULATE
 
+# handlers of each state of the /trade and /calculate conversations, by command name or "text" for any other message
+CONVERSATION_STATES = {
+    None: {'trade': Trade_Command, 'calculate': Calculation_Command},
+    TRADE: {'text': PlaceTrade, 'cancel': cancel},
+    CALCULATE: {'text': CalculateTrade, 'cancel': cancel},
+    DECISION: {'yes': PlaceTrade, 'no': cancel, 'cancel': cancel}
+}
+
+async def Converse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs the handler of the chat's conversation state for a message and keeps the state it moves to in STATE.
+
+    ConversationHandler only keeps the states in the memory of one process, so the next message of a conversation
+    could not be handled by another instance of the bot.
+
+    Arguments:
+        update: update from Telegram
+        context: CallbackContext object that stores commonly used objects in handler callbacks
+    """
+
+    message = update.effective_message
+    key = f'conversation:{ConversationKey(update)}'
+    state = await STATE.get(key)
+
+    # commands are recognized without their arguments and the bot's name, ex: /yes@FXSignalCopierBot
+    name = message.text.split()[0][1:].split('@')[0].lower() if message.text.startswith('/') else 'text'
+    handler = CONVERSATION_STATES.get(state, {}).get(name)
+
+    # messages that are not part of the conversation are answered like unknown commands
+    if(handler is None):
+        await unknown_command(update, context)
+        return
+
+    state = await handler(update, context)
+
+    if(state is None or state == ConversationHandler.END):
+        await STATE.delete(key)
+    else:
+        await STATE.set(key, state, ttl=CONVERSATION_TIMEOUT)
+
+    return
+
+
+async def StartBroker(application: Application) -> None:
+    """Connects to MetaTrader and opens the trade journal on the bot's event loop before the first signal arrives.
+
+    Arguments:
+        application: the running Telegram application, or None when started before it
+    """
+
+    await JOURNAL.start()
+    await STATE.start()
+
+    if(METRICS_PORT):
+        await METRICS_SERVER.start()
+
+    await CONNECTIONS.start()
+    await CONFIG_WATCHER.start()
+
+    return
+
+async def StopBroker(application: Application) -> None:
+    """Sends the queued messages and closes the MetaTrader connections and the trade journal once the bot has stopped.
+
+    Arguments:
+        application: the running Telegram application
+    """
+
+    await CONFIG_WATCHER.close()
+    await OUTBOX.close()
+    await CONNECTIONS.close()
+    await STATE.close()
+    await JOURNAL.close()
+    await METRICS_SERVER.close()
+
+    return
+
 
 def main() -> None:
     """Runs the Telegram bot."""
 
-    updater = Updater(TOKEN, use_context=True)
+    # every account needs a risk factor to size its positions and the bot needs at least one user
+    problems = CONFIG.problems()
 
-    # get the dispatcher to register handlers
-    dp = updater.dispatcher
+    if(problems):
+        raise SystemExit('Invalid configuration:\n' + '\n'.join(problems))
+
+    # starts connecting to MetaTrader on the application's event loop while Telegram is being initialized
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    boot = loop.create_task(StartBroker(None))
+
+    async def waitForBroker(application: Application) -> None:
+        # the webhook only receives updates once the broker has been started
+        await boot
+        logger.info(f'Booted in {time.perf_counter() - BOOT_STARTED:.1f} s, connecting to MetaTrader in the background')
+
+    # handlers and MetaAPI calls share the application's event loop, updates are processed concurrently
+    application = Application.builder().token(TOKEN).concurrent_updates(True).post_init(waitForBroker).post_shutdown(StopBroker).build()
+
+    # copies signals from the source chats before any other handler sees them
+    if(SOURCE_CHATS):
+        chatIds = [int(chat) for chat in SOURCE_CHATS if chat.lstrip('-').isdigit()]
+        usernames = [chat.lstrip('@') for chat in SOURCE_CHATS if not chat.lstrip('-').isdigit()]
+        sourceFilter = (filters.Chat(chat_id=chatIds) | filters.Chat(username=usernames)) & filters.TEXT & ~filters.COMMAND & ~filters.UpdateType.EDITED
+        application.add_handler(MessageHandler(sourceFilter, CopySignal), group=-1)
 
     # message handler
-    dp.add_handler(CommandHandler("start", welcome))
+    application.add_handler(CommandHandler("start", welcome))
 
     # help command handler
-    dp.add_handler(CommandHandler("help", help))
+    application.add_handler(CommandHandler("help", help))
+
+    # connection status command handler
+    application.add_handler(CommandHandler("status", status))
+
+    # trade journal command handler
+    application.add_handler(CommandHandler("history", history))
+
+    # latency statistics command handler
+    application.add_handler(CommandHandler("stats", stats))
+
+    # what-if sizing command handler
+    application.add_handler(CommandHandler("whatif", whatif))
 
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("trade", Trade_Command), CommandHandler("calculate", Calculation_Command)],
-        states={
-            TRADE: [MessageHandler(Filters.text & ~Filters.command, PlaceTrade)],
-            CALCULATE: [MessageHandler(Filters.text & ~Filters.command, CalculateTrade)],
-            DECISION: [CommandHandler("yes", PlaceTrade), CommandHandler("no", cancel)]
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
+    # position manager command handlers
+    application.add_handler(CommandHandler("close", close))
+    application.add_handler(CommandHandler("modify", modify))
+    application.add_handler(CommandHandler("breakeven", breakeven))
 
-    # conversation handler for entering trade or calculating trade information
-    dp.add_handler(conv_handler)
+    # configuration reload command handler
+    application.add_handler(CommandHandler("reload", reload))
 
-    # message handler for all messages that are not included in conversation handler
-    dp.add_handler(MessageHandler(Filters.text, unknown_command))
+    # conversation for entering trade or calculating trade information, kept in STATE so that any instance can continue it,
+    # which also answers all messages that are not included in the conversation
+    application.add_handler(MessageHandler(filters.TEXT, Converse))
 
     # log all errors
-    dp.add_error_handler(error)
+    application.add_error_handler(error)
     
     # listens for incoming updates from Telegram
-    updater.start_webhook(listen="0.0.0.0", port=PORT, url_path=TOKEN, webhook_url=APP_URL + TOKEN)
-    updater.idle()
+    application.run_webhook(listen="0.0.0.0", port=PORT, url_path=TOKEN, webhook_url=APP_URL + TOKEN)
 
     return
 
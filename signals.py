@@ -0,0 +1,271 @@
+import re
+from typing import List, TypedDict, Union
+
+from config import Config
+
+# signal grammar: order types and the labels of the remaining lines
+ORDER_PATTERN = re.compile(r'\b(?:buy|sell)\b(?:\s+(?:limit|stop)\b)?', re.IGNORECASE)
+LABEL_PATTERN = re.compile(r'\s*(entry|price|open|sl|stop\s*loss|tp\s*\d*|take\s*profit\s*\d*)\s*[:=@-]?\s*(now|\d+(?:\.\d+)?)\b', re.IGNORECASE)
+
+# values of unlabeled lines: a price, or "NOW" as the entry of a market execution order
+VALUE_PATTERN = re.compile(r'now|\d+(?:\.\d+)?', re.IGNORECASE)
+
+ORDER_TYPES = {
+    'buy': 'Buy',
+    'buy limit': 'Buy Limit',
+    'buy stop': 'Buy Stop',
+    'sell': 'Sell',
+    'sell limit': 'Sell Limit',
+    'sell stop': 'Sell Stop'
+}
+
+MARKET_ORDER_TYPES = frozenset(['Buy', 'Sell'])
+
+# the usual layout of a lower case signal, matched in a single pass: order line, entry, stop loss and one to three
+# "TP" lines, ex: "buy limit gbpusd\nentry 1.14480\nsl 1.14336\ntp 1.28930". Other layouts are parsed line by line
+SIGNAL_PATTERN = re.compile(
+    r' *(buy|sell)(?: +(limit|stop))? +([a-z]+) *\n'
+    r' *(?:entry|price|open) *[:=@-]? *(now|\d+(?:\.\d+)?) *\n'
+    r' *(?:sl|stop *loss) *[:=@-]? *(\d+(?:\.\d+)?) *\n'
+    r' *tp +(\d+(?:\.\d+)?) *(?:\n *tp +(\d+(?:\.\d+)?) *)?(?:\n *tp +(\d+(?:\.\d+)?) *)?\s*',
+    re.ASCII
+)
+
+
+def BuildSignalLabels(maxTakeProfits: int = 10) -> dict:
+    """Builds the table of line labels, mapping each spelling to its field and take profit number.
+
+    Arguments:
+        maxTakeProfits: highest take profit number to recognize
+
+    Returns:
+        a dictionary from lower case label to a (field, take profit number) tuple
+    """
+
+    labels = {
+        'entry': ('Entry', None),
+        'price': ('Entry', None),
+        'open': ('Entry', None),
+        'sl': ('StopLoss', None),
+        'stoploss': ('StopLoss', None),
+        'tp': ('TP', None),
+        'takeprofit': ('TP', None)
+    }
+
+    for number in range(1, maxTakeProfits + 1):
+        labels[f'tp{number}'] = ('TP', number)
+        labels[f'takeprofit{number}'] = ('TP', number)
+
+    # accepts the labels followed by a separator, ex: "SL:"
+    for label, field in list(labels.items()):
+        for separator in ':=@-':
+            labels[label + separator] = field
+
+    return labels
+
+SIGNAL_LABELS = BuildSignalLabels()
+
+
+class Trade(TypedDict, total=False):
+    """Trade parsed from a signal, sized by sizing.CalculateTradeInformation."""
+
+    OrderType: str
+    Symbol: str
+    Entry: Union[float, str]
+    StopLoss: float
+    TP: List[float]
+    RiskFactor: float
+    PositionSize: float
+    PipSize: float
+    PipValue: float
+    VolumeStep: float
+    Message: str
+    Source: str
+    Fingerprint: str
+    ClientId: str
+    RiskGuard: str
+    Timings: dict
+
+
+def ParseSignal(signal: str, config: Config) -> Trade:
+    """Parses a trading signal into a trade.
+
+    Signals in the usual layout are matched by SIGNAL_PATTERN in a single pass. Otherwise, the first line containing
+    BUY/SELL (optionally followed by LIMIT/STOP) and an allowed symbol is the order line, and the remaining lines may
+    come in any order and are recognized by their labels (Entry, SL, TP, TP1 ... TPn). Unlabeled lines fall back to
+    the fixed layout: entry, stop loss, then one take profit per line.
+
+    Arguments:
+        signal: trading signal
+        config: configuration to read the recognized symbols and the risk factor from
+
+    Returns:
+        a dictionary that contains trade signal information, empty if the signal is not a valid trade
+    """
+
+    match = SIGNAL_PATTERN.fullmatch(signal.lower())
+
+    if(match is not None):
+        side, kind, symbol, entry, stopLoss, takeProfit1, takeProfit2, takeProfit3 = match.groups()
+        symbol = symbol.upper()
+
+        if(symbol in config.symbolIndex):
+            orderType = ORDER_TYPES[f'{side} {kind}' if kind else side]
+
+            # only market execution orders may use "NOW" as the entry
+            if(entry == 'now' and orderType not in MARKET_ORDER_TYPES):
+                return {}
+
+            takeProfits = [float(takeProfit1)]
+
+            if(takeProfit2 is not None):
+                takeProfits.append(float(takeProfit2))
+
+                if(takeProfit3 is not None):
+                    takeProfits.append(float(takeProfit3))
+
+            return {
+                'OrderType': orderType,
+                'Symbol': symbol,
+                'Entry': 'NOW' if entry == 'now' else float(entry),
+                'StopLoss': float(stopLoss),
+                'TP': takeProfits,
+                'RiskFactor': config.riskFactor
+            }
+
+    trade = {}
+    entry = stopLoss = None
+    takeProfits = []
+    unlabeled = []
+    numbered = False
+
+    for line in signal.splitlines():
+        tokens = line.split()
+
+        # skips blank lines
+        if(not(tokens)):
+            continue
+
+        # the first line with an order type is the order line, ex: "BUY LIMIT GBPUSD"
+        if(not(trade)):
+            orderType = ORDER_TYPES.get(' '.join(tokens[:-1]).lower())
+
+            if(orderType is None):
+                order = ORDER_PATTERN.search(line)
+                orderType = ORDER_TYPES[' '.join(order.group(0).lower().split())] if order else None
+
+            if(orderType is not None):
+                trade['OrderType'] = orderType
+
+                # extracts the symbol from the order line, if none is allowed, the signal is invalid
+                symbol = tokens[-1].upper()
+
+                if(symbol not in config.symbolIndex):
+                    symbols = [token for token in line.upper().replace('/', '').split() if token in config.symbolIndex]
+
+                    if(not(symbols)):
+                        return {}
+
+                    symbol = symbols[-1]
+
+                trade['Symbol'] = symbol
+                continue
+
+        # fast path: a label followed by its value, ex: "TP2 1.29845"
+        label = SIGNAL_LABELS.get(tokens[0].lower()) if len(tokens) == 2 else None
+
+        if(label is not None):
+            value = tokens[1]
+
+        # slow path: labels with spaces or trailing text, ex: "Take Profit 2: 1.29845 (50 pips)"
+        else:
+            field = LABEL_PATTERN.match(line)
+
+            if(field):
+                label = SIGNAL_LABELS.get(''.join(field.group(1).lower().split()))
+                value = field.group(2)
+
+        if(label is None):
+            # unlabeled lines before the order line are headers, and the ones that do not end with a value are comments, ex: "Close half at TP1"
+            if(trade and VALUE_PATTERN.fullmatch(tokens[-1])):
+                unlabeled.append(tokens[-1])
+
+        elif(label[0] == 'Entry'):
+            entry = value
+
+        # "NOW" is only an entry
+        elif(value.upper() == 'NOW'):
+            return {}
+
+        elif(label[0] == 'StopLoss'):
+            stopLoss = value
+
+        else:
+            # take profits are ordered by their number, unnumbered ones by their position
+            takeProfits.append((label[1] or len(takeProfits) + 1, float(value)))
+            numbered = numbered or label[1] is not None
+
+    # returns an empty dictionary if an invalid order type was given
+    if(not(trade)):
+        return {}
+
+    # fills the missing values from unlabeled lines in their fixed order
+    if(entry is None and unlabeled):
+        entry = unlabeled.pop(0)
+
+    if(stopLoss is None and unlabeled):
+        stopLoss = unlabeled.pop(0)
+
+    if(numbered):
+        takeProfits.sort(key=lambda takeProfit: takeProfit[0])
+
+    # "NOW" is only an entry
+    if((stopLoss is not None and stopLoss.upper() == 'NOW') or any(value.upper() == 'NOW' for value in unlabeled)):
+        return {}
+
+    takeProfits = [takeProfit for _, takeProfit in takeProfits]
+    takeProfits.extend(float(value) for value in unlabeled)
+
+    # checks that the entry, stop loss and at least one take profit were given
+    if(entry is None or stopLoss is None or not(takeProfits)):
+        return {}
+
+    # only market execution orders may use "NOW" as the entry
+    if(entry.upper() == 'NOW'):
+        if(trade['OrderType'] not in MARKET_ORDER_TYPES):
+            return {}
+
+        trade['Entry'] = 'NOW'
+
+    else:
+        trade['Entry'] = float(entry)
+
+    trade['StopLoss'] = float(stopLoss)
+    trade['TP'] = takeProfits
+
+    # adds risk factor to trade
+    trade['RiskFactor'] = config.riskFactor
+
+    return trade
+
+def ParseSignals(signals: list, config: Config) -> list:
+    """Parses many trading signals at once, ex: to re-parse the history of a channel.
+
+    Arguments:
+        signals: list of trading signals
+        config: configuration to read the recognized symbols and the risk factor from
+
+    Returns:
+        a list of trades in the same order as the signals, with an empty dictionary for each invalid signal
+    """
+
+    trades = []
+
+    for signal in signals:
+        try:
+            trades.append(ParseSignal(signal, config))
+
+        except ValueError:
+            trades.append({})
+
+    return trades
@@ -0,0 +1,98 @@
+import math
+
+from signals import Trade
+
+
+def PipSize(specification: dict) -> float:
+    """Returns the pip size of a symbol, ex: 0.0001 for EURUSD and 0.01 for USDJPY.
+
+    Arguments:
+        specification: symbol specification
+
+    Returns:
+        the pip size given by the specification, otherwise derived from its number of digits
+    """
+
+    if(specification.get('pipSize')):
+        return specification['pipSize']
+
+    digits = specification['digits']
+
+    # fractional pip quotes (3 or 5 digits) have a pip of ten points
+    if(digits in [3, 5]):
+        digits -= 1
+
+    return round(10 ** -digits, digits)
+
+def PipValue(specification: dict, price: dict, accountCurrency: str, entry: float) -> float:
+    """Returns the value of one pip for one lot in the account currency.
+
+    Arguments:
+        specification: symbol specification
+        price: current symbol price, may be None
+        accountCurrency: currency of the MetaTrader account
+        entry: entry price of the trade
+
+    Returns:
+        the value of one pip for one lot
+    """
+
+    # the broker's tick value is already converted to the account currency
+    if(price and price.get('lossTickValue')):
+        return price['lossTickValue'] * specification['pipSize'] / specification['tickSize']
+
+    pipValue = specification['contractSize'] * specification['pipSize']
+
+    if(specification.get('profitCurrency') in [None, accountCurrency]):
+        return pipValue
+
+    # the symbol is quoted in the account currency, ex: USDJPY on a USD account
+    if(specification.get('baseCurrency') == accountCurrency):
+        return pipValue / entry
+
+    raise Exception(f"Cannot convert the pip value of {specification['symbol']} from {specification['profitCurrency']} to {accountCurrency}")
+
+def RoundVolume(volume: float, volumeStep: float) -> float:
+    """Rounds a volume down to the broker's volume step.
+
+    Arguments:
+        volume: volume in lots
+        volumeStep: smallest volume increment of the symbol
+
+    Returns:
+        the rounded volume
+    """
+
+    # the small epsilon avoids flooring 0.03 / 0.01 = 2.9999999999999996 down to 2 steps
+    return round(math.floor(volume / volumeStep + 1e-9) * volumeStep, 8)
+
+def CalculateTradeInformation(trade: Trade, balance: float, specification: dict, pipValue: float) -> tuple:
+    """Calculates the stop loss and take profit(s) in pips and the position size of a trade.
+
+    Arguments:
+        trade: dictionary that stores trade information
+        balance: current balance of the MetaTrader account
+        specification: symbol specification
+        pipValue: value of one pip for one lot in the account currency
+
+    Returns:
+        the stop loss in pips and a list with the take profit(s) in pips
+    """
+
+    trade['PipSize'] = specification['pipSize']
+    trade['PipValue'] = pipValue
+    trade['VolumeStep'] = specification.get('volumeStep') or 0.01
+
+    # calculates the stop loss in pips
+    stopLossPips = abs(round((trade['StopLoss'] - trade['Entry']) / trade['PipSize']))
+
+    # calculates the position size using stop loss and RISK FACTOR
+    positionSize = (balance * trade['RiskFactor']) / (stopLossPips * pipValue)
+    trade['PositionSize'] = min(RoundVolume(positionSize, trade['VolumeStep']), specification.get('maxVolume') or positionSize)
+
+    # calculates the take profit(s) in pips
+    takeProfitPips = []
+    for takeProfit in trade['TP']:
+        takeProfitPips.append(abs(round((takeProfit - trade['Entry']) / trade['PipSize'])))
+
+    return stopLossPips, takeProfitPips
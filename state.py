@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS state_expires ON state (expires);
+"""
+
+
+class MemoryStateStore:
+    """Keeps the shared state of the bot in process memory, for a single instance.
+
+    The state is a set of JSON values under string keys, each with an optional expiry. Every operation is atomic,
+    add() only stores a key that does not exist yet and acquire() takes a lease that is free, expired or already
+    held by the same owner, which is what makes dedupe keys and leader election work. SqliteStateStore offers the
+    same operations across processes.
+    """
+
+    # whether other processes see the same state
+    shared = False
+
+    def __init__(self, sweepInterval: int = 256) -> None:
+        self.sweepInterval = sweepInterval
+
+        self._items = {}
+        self._writes = 0
+
+    async def start(self) -> None:
+        return
+
+    async def close(self) -> None:
+        return
+
+    async def get(self, key: str):
+        """Returns the value of a key, or None if it does not exist or expired."""
+
+        item = self._items.get(key)
+
+        if(item is None or (item[1] is not None and item[1] < time.time())):
+            return None
+
+        return item[0]
+
+    async def set(self, key: str, value, ttl: float = None) -> None:
+        """Stores a value, replacing the current one, for ttl seconds or until it is deleted."""
+
+        self._write(key, value, ttl)
+
+        return
+
+    async def add(self, key: str, value, ttl: float = None) -> bool:
+        """Stores a value only if the key does not exist, and returns whether it was stored."""
+
+        if(await self.get(key) is not None):
+            return False
+
+        self._write(key, value, ttl)
+
+        return True
+
+    async def delete(self, key: str) -> bool:
+        """Deletes a key and returns whether it existed, so that only one caller can claim it."""
+
+        exists = await self.get(key) is not None
+        self._items.pop(key, None)
+
+        return exists
+
+    async def keys(self, prefix: str) -> list:
+        """Returns the keys that start with a prefix, in order."""
+
+        now = time.time()
+
+        return sorted(key for key, (value, expires) in self._items.items() if key.startswith(prefix) and (expires is None or expires >= now))
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Takes or renews a lease for ttl seconds and returns whether the owner holds it."""
+
+        holder = await self.get(f'lease:{name}')
+
+        if(holder is not None and holder != owner):
+            return False
+
+        self._write(f'lease:{name}', owner, ttl)
+
+        return True
+
+    async def release(self, name: str, owner: str) -> None:
+        """Gives up a lease held by the owner."""
+
+        if(await self.get(f'lease:{name}') == owner):
+            self._items.pop(f'lease:{name}', None)
+
+        return
+
+    def _write(self, key: str, value, ttl: float) -> None:
+        """Stores a value and regularly forgets the expired ones."""
+
+        self._items[key] = (value, time.time() + ttl if ttl is not None else None)
+        self._writes += 1
+
+        if(self._writes % self.sweepInterval == 0):
+            now = time.time()
+            self._items = {key: item for key, item in self._items.items() if item[1] is None or item[1] >= now}
+
+        return
+
+
+class SqliteStateStore:
+    """Keeps the shared state of the bot in an SQLite file in WAL mode, shared by the processes of one host.
+
+    Offers the same operations as MemoryStateStore. Each one is a single statement, so its atomicity comes from
+    SQLite's locking, and runs on a worker thread so that the event loop never waits for the disk. A networked
+    store with the same methods can replace it to share the state between hosts.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, sweepInterval: float = 60) -> None:
+        self.path = path
+        self.sweepInterval = sweepInterval
+
+        self._connection = None
+        self._lock = threading.Lock()
+        self._swept = 0
+
+    async def start(self) -> None:
+        """Opens the database."""
+
+        if(self._connection is None):
+            self._connection = await asyncio.to_thread(self._open)
+
+        return
+
+    async def close(self) -> None:
+        """Closes the database."""
+
+        if(self._connection is not None):
+            connection, self._connection = self._connection, None
+            await asyncio.to_thread(connection.close)
+
+        return
+
+    async def get(self, key: str):
+        row = await self._execute('SELECT value FROM state WHERE key = ? AND (expires IS NULL OR expires >= ?)', (key, time.time()), fetch=True)
+
+        return json.loads(row[0]) if row else None
+
+    async def set(self, key: str, value, ttl: float = None) -> None:
+        await self._execute('INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)', (key, json.dumps(value), self._expires(ttl)))
+
+        return
+
+    async def add(self, key: str, value, ttl: float = None) -> bool:
+        # an expired key is replaced as if it did not exist
+        return await self._execute('INSERT INTO state (key, value, expires) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                                   'WHERE state.expires IS NOT NULL AND state.expires < ?', (key, json.dumps(value), self._expires(ttl), time.time())) == 1
+
+    async def delete(self, key: str) -> bool:
+        return await self._execute('DELETE FROM state WHERE key = ? AND (expires IS NULL OR expires >= ?)', (key, time.time())) == 1
+
+    async def keys(self, prefix: str) -> list:
+        rows = await self._execute("SELECT key FROM state WHERE key >= ? AND key < ? AND (expires IS NULL OR expires >= ?) ORDER BY key", (prefix, prefix + '￿', time.time()), fetch=True, all=True)
+
+        return [row[0] for row in rows]
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        # the lease is taken when it is free or expired and renewed when the owner already holds it
+        return await self._execute('INSERT INTO state (key, value, expires) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                                   'WHERE state.value = excluded.value OR state.expires < ?', (f'lease:{name}', json.dumps(owner), self._expires(ttl), time.time())) == 1
+
+    async def release(self, name: str, owner: str) -> None:
+        await self._execute('DELETE FROM state WHERE key = ? AND value = ?', (f'lease:{name}', json.dumps(owner)))
+
+        return
+
+    def _expires(self, ttl: float) -> float:
+        return time.time() + ttl if ttl is not None else None
+
+    def _open(self) -> sqlite3.Connection:
+        """Creates the database file and its table if necessary."""
+
+        # autocommit mode, every statement is its own transaction
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+
+        return connection
+
+    async def _execute(self, statement: str, parameters: tuple, fetch: bool = False, all: bool = False):
+        """Runs one statement on a worker thread and returns its rows or the number of changed rows."""
+
+        if(self._connection is None):
+            await self.start()
+
+        return await asyncio.to_thread(self._run, statement, parameters, fetch, all)
+
+    def _run(self, statement: str, parameters: tuple, fetch: bool, all: bool):
+        with self._lock:
+            # forgets the expired keys once in a while
+            if(time.monotonic() - self._swept > self.sweepInterval):
+                self._swept = time.monotonic()
+                self._connection.execute('DELETE FROM state WHERE expires < ?', (time.time(),))
+
+            cursor = self._connection.execute(statement, parameters)
+
+            if(fetch):
+                return cursor.fetchall() if all else cursor.fetchone()
+
+            return cursor.rowcount
+
+
+def OpenStateStore(path: str):
+    """Returns the state store of a STATE_STORE setting.
+
+    Arguments:
+        path: path of the SQLite file, or an empty string for the in-memory store
+
+    Returns:
+        a MemoryStateStore or SqliteStateStore
+    """
+
+    if(not(path) or path == 'memory'):
+        return MemoryStateStore()
+
+    return SqliteStateStore(path)
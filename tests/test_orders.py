@@ -0,0 +1,88 @@
+"""Order placement against the local MetaApi stand-in of the benchmarks."""
+import asyncio
+import os
+import sys
+
+# the bot reads its settings from the environment on import
+os.environ.setdefault('RISK_FACTOR', '0.01')
+os.environ.setdefault('TELEGRAM_USER', 'test')
+os.environ.setdefault('ACCOUNT_ID', 'test')
+os.environ['ORDER_TIMEOUT'] = '0.2'
+os.environ['ORDER_SETTLE_TIMEOUT'] = '2'
+os.environ['ORDER_SETTLE_INTERVAL'] = '0.05'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import run
+from fake_metaapi import FakeMetaApi, FakeOptions
+from metaapi_cloud_sdk.clients.metaApi.notConnectedException import NotConnectedException
+
+
+def Trade(clientId: str = 'abcdef0123') -> dict:
+    return {'OrderType': 'Buy', 'Symbol': 'EURUSD', 'Entry': 1.0793, 'StopLoss': 1.07, 'TP': [1.09], 'PositionSize': 0.1, 'VolumeStep': 0.01, 'ClientId': clientId}
+
+
+async def Place(options: FakeOptions, trade: dict, wait: float = 0.0) -> tuple:
+    """Places a trade on a fake account and returns its order results and the account after wait seconds."""
+
+    api = FakeMetaApi(options=options)
+    account = await api.metatrader_account_api.get_account('test')
+    results = await run.ExecuteTrade(account.get_rpc_connection(), trade)
+    await asyncio.sleep(wait)
+
+    return results, account
+
+
+def test_late_order_is_found_and_not_sent_again():
+    # the response is lost and the broker only places the order after the bot stopped waiting for it
+    options = FakeOptions(latency=0.001, lateRate=1.0, lateDelay=0.5)
+    results, account = asyncio.run(Place(options, Trade(), wait=1.0))
+
+    assert account.received == 1
+    assert results[0]['Error'] is None
+    assert results[0]['OrderId'] is not None
+    assert results[0]['Attempts'] == 1
+
+def test_order_that_never_appears_is_not_sent_again():
+    options = FakeOptions(latency=0.001, lateRate=1.0, lateDelay=3.0)
+    results, account = asyncio.run(Place(options, Trade(), wait=1.5))
+
+    assert account.received == 1
+    assert results[0]['Error'] is not None
+    assert results[0]['Attempts'] == 1
+
+def test_lost_response_is_found_by_client_id():
+    options = FakeOptions(latency=0.001, timeoutRate=1.0)
+    results, account = asyncio.run(Place(options, Trade()))
+
+    assert account.received == 1
+    assert results[0]['Error'] is None
+    assert results[0]['OrderId'] is not None
+
+def test_order_that_did_not_reach_the_broker_is_sent_again():
+    options = FakeOptions(latency=0.001)
+
+    async def place() -> tuple:
+        api = FakeMetaApi(options=options)
+        account = await api.metatrader_account_api.get_account('test')
+        connection = account.get_rpc_connection()
+        order = connection.create_market_buy_order
+        calls = []
+
+        async def disconnected(*arguments, **kwargs):
+            # the terminal is not connected on the first attempt
+            calls.append(arguments)
+
+            if(len(calls) == 1):
+                raise NotConnectedException('Terminal is not connected')
+
+            return await order(*arguments, **kwargs)
+
+        connection.create_market_buy_order = disconnected
+        return await run.ExecuteTrade(connection, Trade()), account
+
+    results, account = asyncio.run(place())
+
+    assert account.received == 1
+    assert results[0]['Error'] is None
+    assert results[0]['Attempts'] == 2
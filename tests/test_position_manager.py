@@ -0,0 +1,45 @@
+"""Trades rebuilt by the position manager from the streamed orders and positions."""
+import os
+import sys
+
+# the bot reads its settings from the environment on import
+os.environ.setdefault('RISK_FACTOR', '0.01')
+os.environ.setdefault('TELEGRAM_USER', 'test')
+os.environ.setdefault('ACCOUNT_ID', 'test')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import run
+
+
+def Position(leg: int, takeProfit: float) -> dict:
+    return {'id': str(leg), 'symbol': 'EURUSD', 'type': 'POSITION_TYPE_BUY', 'clientId': f'abcdef0123T{leg}', 'openPrice': 1.1,
+            'stopLoss': 1.098, 'takeProfit': takeProfit}
+
+
+def test_resync_keeps_tp1_of_a_closed_position():
+    manager = run.PositionManager(None)
+    manager._replace('Positions', manager.positions, [Position(1, 1.102), Position(2, 1.104)])
+    assert manager.trades['abcdef0123']['TP1'] == 1.102
+
+    # TP 1 closed while the terminal was disconnected, the synchronization only streams the second position
+    manager._replace('Positions', manager.positions, [Position(2, 1.104)])
+
+    assert manager.trades['abcdef0123']['TP1'] == 1.102
+    assert manager.trades['abcdef0123']['Positions'] == {'2'}
+
+def test_resync_keeps_the_breakeven_state():
+    manager = run.PositionManager(None)
+    manager._replace('Positions', manager.positions, [Position(2, 1.104)])
+    manager.trades['abcdef0123']['Breakeven'] = True
+
+    manager._replace('Positions', manager.positions, [Position(2, 1.104)])
+
+    assert manager.trades['abcdef0123']['Breakeven']
+
+def test_resync_forgets_closed_trades():
+    manager = run.PositionManager(None)
+    manager._replace('Positions', manager.positions, [Position(1, 1.102)])
+
+    manager._replace('Positions', manager.positions, [])
+
+    assert manager.trades == {}
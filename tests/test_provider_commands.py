@@ -0,0 +1,39 @@
+"""Replies of the signal providers that close a copied trade or move it to breakeven."""
+import os
+import sys
+
+import pytest
+
+# the bot reads its settings from the environment on import
+os.environ.setdefault('RISK_FACTOR', '0.01')
+os.environ.setdefault('TELEGRAM_USER', 'test')
+os.environ.setdefault('ACCOUNT_ID', 'test')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import run
+
+
+@pytest.mark.parametrize('text, action', [
+    ('close', 'close'),
+    ('Close', 'close'),
+    ('CLOSE ALL!', 'close'),
+    ('close now.', 'close'),
+    (' Breakeven ', 'breakeven'),
+    ('break even', 'breakeven'),
+    ('Move SL to breakeven', 'breakeven'),
+    ('move stop loss to break even!', 'breakeven'),
+])
+def test_commands(text, action):
+    assert run.ProviderCommand(text) == action
+
+@pytest.mark.parametrize('text', [
+    'Price is close to TP1, hold',
+    'Do not close yet',
+    'We will move SL to breakeven later if TP1 hits',
+    'closed at TP1',
+    'breakeven reached, well done',
+    '',
+    None,
+])
+def test_remarks_are_not_commands(text):
+    assert run.ProviderCommand(text) is None
@@ -0,0 +1,136 @@
+"""Sizing limits of the risk guard."""
+import dataclasses
+import os
+import sys
+
+import pytest
+
+# the bot reads its settings from the environment on import
+os.environ.setdefault('RISK_FACTOR', '0.01')
+os.environ.setdefault('TELEGRAM_USER', 'test')
+os.environ.setdefault('ACCOUNT_ID', 'test')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import run
+from config import LoadConfig
+
+SPECIFICATION = {'symbol': 'EURUSD', 'pipSize': 0.0001, 'volumeStep': 0.01, 'minVolume': 0.01}
+ACCOUNT_INFORMATION = {'balance': 10000.0, 'equity': 10000.0, 'currency': 'USD'}
+
+
+class Manager:
+    """The parts of a ConnectionManager that the risk guard reads."""
+
+    account = {'name': 'test'}
+
+
+def Trade(positionSize: float = 0.5, takeProfits: int = 2, clientId: str = 'abcdef0123') -> dict:
+    # a 20 pips stop loss at 10 USD per pip and lot risks 200 USD per lot
+    return {'OrderType': 'Buy', 'Symbol': 'EURUSD', 'Entry': 1.1, 'StopLoss': 1.098, 'TP': [1.102 + 0.002 * leg for leg in range(takeProfits)],
+            'PositionSize': positionSize, 'PipSize': 0.0001, 'PipValue': 10.0, 'VolumeStep': 0.01, 'ClientId': clientId}
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    # only the symbol limit of 3% of the balance, 300 USD or 1.5 lots of the test trades
+    monkeypatch.setattr(run, 'CONFIG', dataclasses.replace(run.CONFIG, maxOpenRisk=0.0, maxCurrencyRisk=0.0, maxSymbolRisk=0.03, maxDailyLoss=0.0, maxMarginUsage=0.0))
+
+    return run.RiskGuard(Manager())
+
+
+def test_limits_are_disabled_by_default():
+    config = LoadConfig(environ={}, validate=False)
+
+    assert (config.maxOpenRisk, config.maxCurrencyRisk, config.maxSymbolRisk, config.maxDailyLoss, config.maxMarginUsage) == (0, 0, 0, 0, 0)
+
+def test_default_limits_keep_the_size(monkeypatch):
+    monkeypatch.setattr(run, 'CONFIG', LoadConfig(environ={'RISK_FACTOR': '0.05'}, validate=False))
+    trade = Trade(positionSize=5.0)
+
+    assert run.RiskGuard(Manager()).check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION) is None
+    assert trade['PositionSize'] == 5.0
+
+def test_trade_within_the_limits_is_unchanged(guard):
+    trade = Trade(positionSize=0.5)
+
+    assert guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION) is None
+    assert trade['PositionSize'] == 0.5
+    assert guard.reserved == {}
+
+def test_trade_is_reduced_to_the_limit(guard):
+    trade = Trade(positionSize=2.5)
+
+    assert guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION) == 'EURUSD risk'
+    assert trade['PositionSize'] == 1.5
+
+def test_trade_is_rejected_when_the_limit_is_reached(guard):
+    guard.check(Trade(positionSize=1.5, clientId='aaaaaa0001'), 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+    with pytest.raises(Exception, match='EURUSD risk limit'):
+        guard.check(Trade(positionSize=0.5, clientId='aaaaaa0002'), 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+def test_reserved_trades_count_for_the_next_check(guard):
+    first, second = Trade(positionSize=1.0, clientId='aaaaaa0001'), Trade(positionSize=1.0, clientId='aaaaaa0002')
+
+    assert guard.check(first, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True) is None
+    assert set(guard.reserved) == {'aaaaaa0001T1', 'aaaaaa0001T2'}
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(200.0)
+
+    # only 100 USD, 0.5 lots, are left
+    assert guard.check(second, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True) == 'EURUSD risk'
+    assert second['PositionSize'] == 0.5
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(300.0)
+
+def test_release_keeps_the_placed_orders(guard):
+    trade = Trade(positionSize=1.0)
+    guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+    guard.release(trade, [{'ClientId': 'abcdef0123T1', 'Error': None}, {'ClientId': 'abcdef0123T2', 'Error': Exception('rejected')}])
+
+    assert set(guard.reserved) == {'abcdef0123T1'}
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(100.0)
+
+def test_release_without_orders_releases_everything(guard):
+    trade = Trade(positionSize=1.0)
+    guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+    guard.release(trade)
+
+    assert guard.reserved == {}
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(0.0)
+    assert guard.openRisk == pytest.approx(0.0)
+
+def test_streamed_order_replaces_its_reservation(guard):
+    trade = Trade(positionSize=1.0, takeProfits=1)
+    guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+    # the order is streamed without a stop loss, its risk is unknown and the reservation ends
+    guard._update('Order', {'id': '1', 'symbol': 'EURUSD', 'type': 'ORDER_TYPE_BUY_LIMIT', 'clientId': 'abcdef0123T1', 'openPrice': 1.1, 'volume': 1.0})
+
+    assert guard.reserved == {}
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(0.0)
+
+def test_reservations_expire(guard, monkeypatch):
+    monkeypatch.setattr(run, 'RISK_RESERVATION_TTL', -1)
+    guard.check(Trade(positionSize=1.0, clientId='aaaaaa0001'), 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(200.0)
+
+    guard._expire()
+
+    assert guard.reserved == {}
+    assert guard.symbolRisk['EURUSD'] == pytest.approx(0.0)
+
+def test_rejected_trade_shows_the_reason_instead_of_the_size(guard):
+    trade = Trade(positionSize=1.5)
+    guard.check(trade, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+    rejected = Trade(positionSize=0.5, clientId='aaaaaa0002')
+
+    with pytest.raises(Exception) as error:
+        guard.check(rejected, 20, ACCOUNT_INFORMATION, SPECIFICATION, reserve=True)
+
+    result = {'Account': 'test', 'Trade': rejected, 'StopLossPips': 20, 'Orders': [], 'Error': error.value, 'Latency': 12}
+    row = run.CreateSummaryTable(rejected, [result], False).splitlines()[-2]
+
+    assert row.split('|')[2].strip() == '-'
+    assert 'EURUSD risk limit' in row
+    assert 'risk |' not in row
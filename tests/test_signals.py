@@ -0,0 +1,65 @@
+"""Parsing of trading signals."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import LoadConfig
+from signals import ParseSignal, ParseSignals
+
+CONFIG = LoadConfig(environ={'RISK_FACTOR': '0.01'}, validate=False)
+
+
+def Trade(orderType: str, symbol: str, entry, stopLoss: float, takeProfits: list) -> dict:
+    return {'OrderType': orderType, 'Symbol': symbol, 'Entry': entry, 'StopLoss': stopLoss, 'TP': takeProfits, 'RiskFactor': 0.01}
+
+
+@pytest.mark.parametrize('signal, trade', [
+    # the usual layout, parsed in a single pass
+    ('BUY GBPUSD\nEntry NOW\nSL 1.14336\nTP 1.28930\nTP 1.29845', Trade('Buy', 'GBPUSD', 'NOW', 1.14336, [1.2893, 1.29845])),
+    ('Sell Limit USDJPY\nEntry 137.250\nSL 137.850\nTP 136.500', Trade('Sell Limit', 'USDJPY', 137.25, 137.85, [136.5])),
+    # labels in any order, with separators and numbers
+    ('XAUUSD BUY STOP\nSL: 1790\nTP2: 1830\nEntry @ 1805.5\nTP1: 1815', Trade('Buy Stop', 'XAUUSD', 1805.5, 1790.0, [1815.0, 1830.0])),
+    ('SELL EURUSD\nPrice = NOW\nStop Loss 1.1\nTake Profit 2: 0.9 (200 pips)\nTake Profit 1: 1.0', Trade('Sell', 'EURUSD', 'NOW', 1.1, [1.0, 0.9])),
+    ('VIP signal 🚀\nBUY EUR/USD 🔥\nEntry 1.1\nSL 1.09\nTP 1.12', Trade('Buy', 'EURUSD', 1.1, 1.09, [1.12])),
+    # unlabeled lines: entry, stop loss, then the take profits
+    ('BUY GBPUSD\nNOW\n1.14336\n1.28930\n1.29845', Trade('Buy', 'GBPUSD', 'NOW', 1.14336, [1.2893, 1.29845])),
+    ('BUY LIMIT GBPUSD\nEntry 1.14480\n1.14336\n1.28930', Trade('Buy Limit', 'GBPUSD', 1.1448, 1.14336, [1.2893])),
+    # comment lines are skipped
+    ('BUY EURUSD\nEntry NOW\nSL 1.09\nTP 1.12\nClose half at TP1', Trade('Buy', 'EURUSD', 'NOW', 1.09, [1.12])),
+    ('BUY EURUSD\nRisk only 1%\nEntry 1.1\nSL 1.09\nTP1 1.12\nTP2 1.13\nGood luck!', Trade('Buy', 'EURUSD', 1.1, 1.09, [1.12, 1.13])),
+    ('BUY EURUSD\n1.1\n1.09\n1.12\nMove SL to entry at TP1', Trade('Buy', 'EURUSD', 1.1, 1.09, [1.12])),
+])
+def test_signals(signal, trade):
+    assert ParseSignal(signal, CONFIG) == trade
+
+@pytest.mark.parametrize('signal', [
+    # no order line or no recognized symbol
+    'Good morning traders',
+    'BUY FOOBAR\nEntry 1\nSL 0.9\nTP 1.1',
+    # missing stop loss or take profit
+    'BUY EURUSD\nEntry 1.1\nSL 1.09',
+    'BUY EURUSD\nEntry 1.1\nTP 1.12',
+    # "NOW" is only the entry of a market execution order
+    'BUY LIMIT EURUSD\nEntry NOW\nSL 1.09\nTP 1.12',
+    'Sell Stop EURUSD\nPrice: now\nStop Loss 1.11\nTP 1.05',
+    'BUY STOP EURUSD\nNOW\n1.09\n1.12',
+    'BUY EURUSD\nEntry 1.1\nSL NOW\nTP 1.12',
+    'BUY EURUSD\nEntry 1.1\nSL 1.09\nTP NOW',
+    'BUY EURUSD\n1.1\n1.09\nNOW',
+])
+def test_invalid_signals(signal):
+    assert ParseSignal(signal, CONFIG) == {}
+
+def test_both_paths_agree():
+    signal = 'SELL STOP XAUUSD\nEntry 1805.50\nSL 1812.00\nTP 1795.00\nTP 1785.00'
+
+    # a trailing comment line sends the signal through the line by line parser
+    assert ParseSignal(signal, CONFIG) == ParseSignal(signal + '\nGood luck', CONFIG)
+
+def test_batch_keeps_the_order():
+    signals = ['BUY EURUSD\nEntry NOW\nSL 1.09\nTP 1.12', 'hello', 'SELL GBPUSD\nEntry 1.3\nSL 1.31\nTP 1.29']
+
+    assert [trade.get('Symbol') for trade in ParseSignals(signals, CONFIG)] == ['EURUSD', None, 'GBPUSD']